@@ -1,32 +1,63 @@
+import logging
+from collections import defaultdict
 from datetime import timedelta
 
-from django.db import transaction
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from ninja import Router
+from core.conditional import collection_stamp, conditional_response
+from core import ratelimit
+from core.renderers import dumps, fast_response
 from users.auth import TokenAuth
-from users.models import Friendship, User
+from users import graph
+from users.models import User
+from users.profiles import profiles
 from users.schemas import UserOut
 
 from .enums import Actions
-from .models import Alarm, AlarmEvent, Group, ManualRing
+from .models import ON_TIME_WINDOW, Alarm, AlarmEvent, AlarmEventRollup, Group, ManualRing
 from .schemas import (
     AddMemberRequest,
+    AddMembersOut,
+    AddMembersRequest,
+    AlarmBatchOut,
+    AlarmBatchRequest,
     AlarmCreate,
     AlarmEventOut,
     AlarmOut,
     AlarmUpdate,
+    BatchCheckInOut,
+    BatchCheckInRequest,
     GroupCreate,
     GroupOut,
     GroupUpdate,
     LeaderboardEntry,
     ManualRingOut,
 )
-from .utils import send_group_push, send_ring_push
+from . import fanout
+from .lookups import (
+    ALARM_FIELDS,
+    current_event,
+    group_alarms,
+    invalidate_events,
+    invalidate_groups,
+    is_member,
+    latest_event,
+    member_ids,
+)
+from .utils import send_group_fanout, send_group_push, send_token_push
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Hot list endpoints render ``.values()`` rows with these fields directly.
+GROUP_FIELDS = tuple(GroupOut.model_fields)
+
 # ==========================================
 # Group CRUD
 # ==========================================
@@ -41,7 +72,14 @@ def create_group(request, payload: GroupCreate):
 
 @router.get("/group/", response=list[GroupOut], auth=TokenAuth())
 def list_groups(request):
-    return list(Group.objects.filter(members=request.auth))
+    groups = Group.objects.filter(members=request.auth)
+    count, latest = collection_stamp(groups)
+    return conditional_response(
+        request,
+        lambda: fast_response(request, list(groups.values(*GROUP_FIELDS))),
+        request.auth.id, count, latest,
+        last_modified=latest,
+    )
 
 
 @router.put(
@@ -60,8 +98,9 @@ def update_group(request, group_id: str, payload: GroupUpdate):
 
     group.save()
 
-    other_members = group.members.exclude(id=request.auth.id)
-    send_group_push(other_members, Actions.GROUP_UPDATED, data={"group_id": str(group.id)})
+    send_group_fanout(
+        group.id, Actions.GROUP_UPDATED, data={"group_id": str(group.id)}, exclude_user_id=request.auth.id
+    )
 
     return 200, group
 
@@ -74,10 +113,19 @@ def update_group(request, group_id: str, payload: GroupUpdate):
 def list_group_members(request, group_id: str):
     group = get_object_or_404(Group, id=group_id)
 
-    if request.auth not in group.members.all():
+    members = member_ids(group.id)
+    if request.auth.id not in members:
         return 403, None
 
-    return 200, list(group.members.all())
+    # Membership changes bump the group's stamp; profile edits bump the members'.
+    count, latest = collection_stamp(group.members.all())
+    last_modified = max(group.updated_at, latest)
+    return conditional_response(
+        request,
+        lambda: fast_response(request, list(profiles(members).values())),
+        group.id, group.updated_at, count, latest,
+        last_modified=last_modified,
+    )
 
 
 @router.post(
@@ -88,8 +136,12 @@ def join_group(request, group_id: str):
 
     group.members.add(request.auth)
 
-    other_members = group.members.exclude(id=request.auth.id)
-    send_group_push(other_members, Actions.GROUP_MEMBER_JOINED, data={"group_id": str(group.id)})
+    send_group_fanout(
+        group.id,
+        Actions.GROUP_MEMBER_JOINED,
+        data={"group_id": str(group.id)},
+        exclude_user_id=request.auth.id,
+    )
 
     return 200, group
 
@@ -108,9 +160,7 @@ def leave_group(request, group_id: str):
 
         Alarm.objects.filter(user=request.auth, group=group).delete()
 
-        remaining = group.members.all()
-        if remaining.exists():
-            send_group_push(remaining, Actions.GROUP_MEMBER_LEFT, data={"group_id": str(group.id)})
+        send_group_fanout(group.id, Actions.GROUP_MEMBER_LEFT, data={"group_id": str(group.id)})
 
         if group.members.count() == 0:
             group.delete()
@@ -134,13 +184,7 @@ def add_member_to_group(request, group_id: str, payload: AddMemberRequest):
         return 404, {"error": "User not found"}
 
     # Verify they are friends
-    is_friend = Friendship.objects.filter(
-        Q(from_user=request.auth, to_user=target)
-        | Q(from_user=target, to_user=request.auth),
-        status=Friendship.Status.ACCEPTED,
-    ).exists()
-
-    if not is_friend:
+    if not graph.are_friends(request.auth.id, target.id):
         return 403, {"error": "You can only add friends to groups"}
 
     group.members.add(target)
@@ -154,6 +198,54 @@ def add_member_to_group(request, group_id: str, payload: AddMemberRequest):
     return 200, group
 
 
+@router.post(
+    "/group/{group_id}/add-members/",
+    response={200: AddMembersOut, 403: dict},
+    auth=TokenAuth(),
+)
+def add_members_to_group(request, group_id: str, payload: AddMembersRequest):
+    group = get_object_or_404(Group, id=group_id)
+
+    member_ids = set(group.members.values_list("id", flat=True))
+    if request.auth.id not in member_ids:
+        return 403, {"error": "You are not a member of this group"}
+
+    requested = list(dict.fromkeys(payload.user_ids))
+    found = {user.id: user for user in User.objects.filter(id__in=requested)}
+    friends = graph.friendships(request.auth.id)
+
+    results, to_add = [], []
+    for user_id in requested:
+        if user_id in member_ids:
+            status = "already_member"
+        elif user_id not in found:
+            status = "not_found"
+        elif user_id not in friends:
+            status = "not_friend"
+        else:
+            status = "added"
+            to_add.append(found[user_id])
+        results.append({"user_id": user_id, "status": status})
+
+    if to_add:
+        group.members.add(*to_add)
+
+        send_group_push(
+            users=to_add,
+            action=Actions.GROUP_MEMBER_ADDED,
+            data={"group_id": str(group.id), "group_name": group.name},
+        )
+        added_ids = {user.id for user in to_add}
+        tokens = [
+            token
+            for user_id, token in fanout.group_devices(group.id)
+            if user_id != request.auth.id and user_id not in added_ids
+        ]
+        send_token_push(tokens, Actions.GROUP_MEMBER_JOINED, data={"group_id": str(group.id)})
+
+    return 200, {"group": group, "results": results}
+
+
 @router.get(
     "/group/{group_id}/alarms/",
     response={200: list[AlarmOut], 403: None},
@@ -162,10 +254,16 @@ def add_member_to_group(request, group_id: str, payload: AddMemberRequest):
 def list_group_alarms(request, group_id: str):
     group = get_object_or_404(Group, id=group_id)
 
-    if request.auth not in group.members.all():
+    if not is_member(group.id, request.auth.id):
         return 403, None
 
-    return 200, list(Alarm.objects.filter(group=group))
+    count, latest = collection_stamp(Alarm.objects.filter(group=group))
+    return conditional_response(
+        request,
+        lambda: fast_response(request, group_alarms(group.id)),
+        group.id, count, latest,
+        last_modified=latest,
+    )
 
 
 @router.get(
@@ -176,30 +274,41 @@ def list_group_alarms(request, group_id: str):
 def group_leaderboard(request, group_id: str):
     group = get_object_or_404(Group, id=group_id)
 
-    if not group.members.filter(id=request.auth.id).exists():
+    if not is_member(group.id, request.auth.id):
         return 403, None
 
-    members = group.members.all()
-    group_alarm_ids = list(Alarm.objects.filter(group=group).values_list("id", flat=True))
-
-    entries = []
-    for member in members:
-        events = list(AlarmEvent.objects.filter(
-            user=member, alarm_id__in=group_alarm_ids
-        ).values("status", "created_at", "checked_in_at"))
-
-        total = len(events)
-        on_time = sum(
-            1 for e in events
-            if e["status"] == AlarmEvent.Status.CHECKED_IN
-            and e["checked_in_at"] is not None
-            and (e["checked_in_at"] - e["created_at"]) <= timedelta(minutes=5)
+    # Events past retention only survive as daily rollups, so both are counted.
+    counts = {user_id: [0, 0] for user_id in member_ids(group.id)}
+    live = (
+        AlarmEvent.objects.filter(alarm__group=group, user_id__in=counts)
+        .values("user_id")
+        .annotate(
+            total=Count("id"),
+            on_time=Count(
+                "id",
+                filter=Q(
+                    status=AlarmEvent.Status.CHECKED_IN,
+                    checked_in_at__lte=F("created_at") + ON_TIME_WINDOW,
+                ),
+            ),
         )
+    )
+    rolled_up = (
+        AlarmEventRollup.objects.filter(alarm__group=group, user_id__in=counts)
+        .values("user_id")
+        .annotate(total=Sum("total_events"), on_time=Sum("on_time_checkins"))
+    )
+    for row in (*live, *rolled_up):
+        counts[row["user_id"]][0] += row["total"]
+        counts[row["user_id"]][1] += row["on_time"]
 
+    entries = []
+    for user_id, profile in profiles(counts).items():
+        total, on_time = counts[user_id]
         entries.append(LeaderboardEntry(
-            user_id=member.id,
-            display_name=member.display_name,
-            username=member.username,
+            user_id=user_id,
+            display_name=profile["display_name"],
+            username=profile["username"],
             total_events=total,
             on_time_checkins=on_time,
             success_rate=round(on_time / total * 100, 1) if total > 0 else 100.0,
@@ -218,7 +327,7 @@ def group_leaderboard(request, group_id: str):
 def create_alarm(request, payload: AlarmCreate):
     group = get_object_or_404(Group, id=payload.group_id)
 
-    if not group.members.filter(id=request.auth.id).exists():
+    if not is_member(group.id, request.auth.id):
         return 403, {
             "error": "You cannot assign an alarm to a group you are not a member of."
         }
@@ -234,9 +343,8 @@ def create_alarm(request, payload: AlarmCreate):
         sound_filename=payload.sound_filename,
     )
 
-    group_members = group.members.exclude(id=request.auth.id)
-    send_group_push(group_members, Actions.ALARM_CREATED,
-        data={"alarm_id": str(alarm.id), "group_id": str(group.id)})
+    send_group_fanout(group.id, Actions.ALARM_CREATED,
+        data={"alarm_id": str(alarm.id), "group_id": str(group.id)}, exclude_user_id=request.auth.id)
 
     return alarm
 
@@ -246,7 +354,228 @@ def list_alarms(request, group_id: str | None = None):
     qs = Alarm.objects.filter(user=request.auth)
     if group_id:
         qs = qs.filter(group_id=group_id)
-    return list(qs)
+    count, latest = collection_stamp(qs)
+    return conditional_response(
+        request,
+        lambda: fast_response(request, list(qs.values(*ALARM_FIELDS))),
+        request.auth.id, group_id, count, latest,
+        last_modified=latest,
+    )
+
+
+# The batch, export and check-in routes are registered before /alarm/{alarm_id}/
+# so their last segment isn't taken for an alarm id.
+
+
+@router.post(
+    "/alarm/batch/",
+    response={200: AlarmBatchOut, 400: dict},
+    auth=TokenAuth(),
+)
+def batch_alarms(request, payload: AlarmBatchRequest):
+    """Create, update and delete many alarms in one transaction, all or nothing."""
+    user = request.auth
+    errors = []
+
+    requested_groups = {item.group_id for item in payload.create}
+    member_of = set(
+        Group.members.through.objects.filter(
+            user_id=user.id, group_id__in=requested_groups
+        ).values_list("group_id", flat=True)
+    )
+    for index, item in enumerate(payload.create):
+        if item.group_id not in member_of:
+            errors.append({
+                "op": "create",
+                "index": index,
+                "error": "You cannot assign an alarm to a group you are not a member of.",
+            })
+
+    targets = {item.id for item in payload.update} | set(payload.delete)
+    owned = {alarm.id: alarm for alarm in Alarm.objects.filter(id__in=targets, user=user)}
+    for op, ids in (("update", [item.id for item in payload.update]), ("delete", payload.delete)):
+        for index, alarm_id in enumerate(ids):
+            if alarm_id not in owned:
+                errors.append({"op": op, "index": index, "error": "Alarm not found."})
+    if set(payload.delete) & {item.id for item in payload.update}:
+        errors.append({"op": "delete", "index": 0, "error": "An alarm cannot be updated and deleted."})
+
+    if errors:
+        return 400, {"errors": errors}
+
+    created = []
+    for item in payload.create:
+        alarm = Alarm(
+            name=item.name,
+            time=item.time.replace(second=0, microsecond=0, tzinfo=None),
+            repeats=item.repeats,
+            is_one_time=item.is_one_time,
+            user=user,
+            group_id=item.group_id,
+            sound_filename=item.sound_filename,
+        )
+        alarm.next_trigger_utc = alarm.calculate_next_trigger()
+        created.append(alarm)
+
+    now = timezone.now()
+    updated, fields = [], {"is_active", "next_trigger_utc", "updated_at"}
+    for item in payload.update:
+        alarm = owned[item.id]
+        alarm.user = user
+        for field, value in item.model_dump(exclude_unset=True, exclude={"id"}).items():
+            if field == "time":
+                value = value.replace(second=0, microsecond=0, tzinfo=None)
+            setattr(alarm, field, value)
+            fields.add(field)
+        alarm.is_active = True
+        alarm.next_trigger_utc = alarm.calculate_next_trigger()
+        alarm.updated_at = now
+        updated.append(alarm)
+
+    deleted = [owned[alarm_id] for alarm_id in dict.fromkeys(payload.delete)]
+
+    with transaction.atomic():
+        Alarm.objects.bulk_create(created)
+        if updated:
+            Alarm.objects.bulk_update(updated, sorted(fields))
+            # Same as a single update: settle each alarm's latest open event.
+            latest_open = (
+                AlarmEvent.objects.filter(
+                    alarm=OuterRef("pk"),
+                    status__in=[AlarmEvent.Status.RINGING, AlarmEvent.Status.EXPIRED],
+                )
+                .order_by("-created_at")
+                .values("id")[:1]
+            )
+            AlarmEvent.objects.filter(
+                id__in=Alarm.objects.filter(id__in=[a.id for a in updated]).values(
+                    event_id=Subquery(latest_open)
+                )
+            ).update(status=AlarmEvent.Status.CHECKED_IN, checked_in_at=timezone.now())
+            invalidate_events([alarm.id for alarm in updated])
+        Alarm.objects.filter(id__in=[alarm.id for alarm in deleted]).delete()
+        # Bulk writes send no signals.
+        invalidate_groups({alarm.group_id for alarm in created + updated})
+
+    by_group = defaultdict(lambda: defaultdict(list))
+    for action, alarms in (
+        (Actions.ALARM_CREATED, created),
+        (Actions.ALARM_UPDATED, updated),
+        (Actions.ALARM_DELETED, deleted),
+    ):
+        for alarm in alarms:
+            by_group[alarm.group_id][action].append(str(alarm.id))
+    for group_id, actions in by_group.items():
+        for action, alarm_ids in actions.items():
+            send_group_fanout(
+                group_id,
+                action,
+                data={"alarm_ids": ",".join(alarm_ids), "group_id": str(group_id)},
+                exclude_user_id=user.id,
+            )
+
+    return 200, {
+        "created": created,
+        "updated": updated,
+        "deleted": [alarm.id for alarm in deleted],
+    }
+
+
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "time",
+    "repeats",
+    "is_one_time",
+    "is_active",
+    "group_id",
+    "sound_filename",
+    "next_trigger_utc",
+)
+
+
+@router.get("/alarm/export/", auth=TokenAuth())
+def export_alarms(request):
+    """Stream the caller's alarms as a JSON array without building it in memory."""
+    rows = (
+        Alarm.objects.filter(user=request.auth)
+        .order_by("time", "id")
+        .values(*EXPORT_FIELDS)
+        .iterator(chunk_size=500)
+    )
+
+    def stream():
+        yield b"["
+        for index, row in enumerate(rows):
+            yield (b"," if index else b"") + dumps(row)
+        yield b"]"
+
+    response = StreamingHttpResponse(stream(), content_type="application/json")
+    response["Content-Disposition"] = 'attachment; filename="alarms.json"'
+    return response
+
+
+@router.post("/alarm/check_in/", response=BatchCheckInOut, auth=TokenAuth())
+def check_in_alarms(request, payload: BatchCheckInRequest):
+    latest = AlarmEvent.objects.filter(alarm=OuterRef("pk")).order_by("-created_at")
+    alarms = Alarm.objects.filter(user=request.auth).annotate(
+        event_id=Subquery(latest.values("id")[:1]),
+        event_status=Subquery(latest.values("status")[:1]),
+    )
+    if payload.all_ringing:
+        alarms = alarms.filter(event_status=AlarmEvent.Status.RINGING)
+        requested = None
+    else:
+        requested = list(dict.fromkeys(payload.alarm_ids))
+        alarms = alarms.filter(id__in=requested)
+    alarms = {
+        alarm["id"]: alarm
+        for alarm in alarms.values("id", "group_id", "event_id", "event_status")
+    }
+
+    candidates = [
+        alarm["event_id"]
+        for alarm in alarms.values()
+        if alarm["event_id"] and alarm["event_status"] != AlarmEvent.Status.CHECKED_IN
+    ]
+    now = timezone.now()
+    with transaction.atomic():
+        # One compare-and-set per event: the rows this request updated are the
+        # ones it won; the rest were checked in concurrently by another request.
+        claimed = {
+            event_id
+            for event_id in candidates
+            if AlarmEvent.objects.filter(id=event_id)
+            .exclude(status=AlarmEvent.Status.CHECKED_IN)
+            .update(status=AlarmEvent.Status.CHECKED_IN, checked_in_at=now)
+        }
+        invalidate_events(alarms)
+
+    results, by_group = [], defaultdict(list)
+    for alarm_id in requested if requested is not None else alarms:
+        alarm = alarms.get(alarm_id)
+        if not alarm or not alarm["event_id"]:
+            status = "not_found"
+        elif alarm["event_id"] in claimed:
+            status = "checked_in"
+            by_group[alarm["group_id"]].append(alarm)
+        else:
+            status = "already_checked_in"
+        event_id = alarm["event_id"] if alarm else None
+        results.append({"alarm_id": alarm_id, "status": status, "event_id": event_id})
+
+    for group_id, checked_in in by_group.items():
+        data_payload = {
+            "alarm_id": str(checked_in[0]["id"]),
+            "event_id": str(checked_in[0]["event_id"]),
+            "alarm_ids": ",".join(str(alarm["id"]) for alarm in checked_in),
+            "event_ids": ",".join(str(alarm["event_id"]) for alarm in checked_in),
+        }
+        send_group_fanout(
+            group_id, Actions.CHECKED_IN, data=data_payload, exclude_user_id=request.auth.id
+        )
+
+    return {"results": results}
 
 
 @router.delete("/alarm/{alarm_id}/", response={204: None}, auth=TokenAuth())
@@ -256,9 +585,8 @@ def delete_alarm(request, alarm_id: str):
     if alarm.user.id != request.auth.id:
         return 403, None
 
-    group_members = alarm.group.members.exclude(id=request.auth.id)
-    send_group_push(group_members, Actions.ALARM_DELETED,
-        data={"alarm_id": str(alarm.id), "group_id": str(alarm.group_id)})
+    send_group_fanout(alarm.group_id, Actions.ALARM_DELETED,
+        data={"alarm_id": str(alarm.id), "group_id": str(alarm.group_id)}, exclude_user_id=request.auth.id)
 
     alarm.delete()
 
@@ -290,9 +618,8 @@ def update_alarm(request, alarm_id: str, payload: AlarmUpdate):
 
     alarm.save()
 
-    group_members = alarm.group.members.exclude(id=request.auth.id)
-    send_group_push(group_members, Actions.ALARM_UPDATED,
-        data={"alarm_id": str(alarm.id), "group_id": str(alarm.group_id)})
+    send_group_fanout(alarm.group_id, Actions.ALARM_UPDATED,
+        data={"alarm_id": str(alarm.id), "group_id": str(alarm.group_id)}, exclude_user_id=request.auth.id)
 
     return alarm
 
@@ -308,47 +635,38 @@ def update_alarm(request, alarm_id: str, payload: AlarmUpdate):
     auth=TokenAuth(),
 )
 def trigger_alarm(request, alarm_id: str):
-    with transaction.atomic():
-        alarm = get_object_or_404(Alarm.objects.select_for_update(), id=alarm_id)
+    alarm = get_object_or_404(Alarm.objects.select_related("user"), id=alarm_id)
 
-        if not alarm.group.members.filter(id=request.auth.id).exists():
-            return 403, {"error": "You are not in this alarm's group"}
+    if not is_member(alarm.group_id, request.auth.id):
+        return 403, {"error": "You are not in this alarm's group"}
 
-        event = (
-            AlarmEvent.objects.filter(alarm=alarm)
-            .select_for_update()
-            .order_by("-created_at")
-            .first()
-        )
-
-        if not event:
-            return 409, {
-                "error": f"{alarm.user.display_name}'s alarm hasn't gone off yet!"
-            }
-        elif event.status == AlarmEvent.Status.CHECKED_IN:
-            return 409, {"error": f"{alarm.user.display_name} already checked in!"}
-        if event.status == AlarmEvent.Status.RINGING:
-            return 409, {"error": "They are currently being rung! Give them a second."}
-        recent_ring = ManualRing.objects.filter(
-            alarm=alarm, created_at__gte=timezone.now() - timedelta(seconds=10)
-        ).exists()
-
-        if recent_ring:
-            return 429, {
-                "error": "This user is already being rung! Give them a second."
-            }
-
-        manual_ring = ManualRing.objects.create(
-            alarm=alarm,
-            ringer=request.auth,
-        )
+    event = current_event(alarm.id)
+    status = event and event["status"]
 
-    success = send_ring_push(user=alarm.user, ringer_name=request.auth.display_name)
+    if not status:
+        return 409, {
+            "error": f"{alarm.user.display_name}'s alarm hasn't gone off yet!"
+        }
+    elif status == AlarmEvent.Status.CHECKED_IN:
+        return 409, {"error": f"{alarm.user.display_name} already checked in!"}
+    if status == AlarmEvent.Status.RINGING:
+        return 409, {"error": "They are currently being rung! Give them a second."}
+
+    # Counted only once the ring would go out, so outsiders and rejected
+    # attempts can't use up the cooldown for the group's members.
+    ratelimit.check(
+        "ring_trigger",
+        f"{alarm.id}:{request.auth.id}",
+        message="This user is already being rung! Give them a second.",
+    )
 
-    if not success:
-        print(
-            f"Failed to ring {alarm.user.display_name}. They may be logged out or deleted the app."
-        )
+    # Delivery, retries and escalation happen in the scheduler (alarms.rings),
+    # which also drops the ring if the owner checks in before it goes out.
+    manual_ring = ManualRing.objects.create(
+        alarm=alarm,
+        ringer=request.auth,
+        next_attempt_at=timezone.now(),
+    )
 
     return 200, manual_ring
 
@@ -361,13 +679,13 @@ def trigger_alarm(request, alarm_id: str):
 def get_latest_event(request, alarm_id: str):
     alarm = get_object_or_404(Alarm, id=alarm_id)
 
-    is_owner = alarm.user == request.auth
-    is_group_member = alarm.group and alarm.group.members.filter(id=request.auth.id).exists()
+    is_owner = alarm.user_id == request.auth.id
+    is_group_member = is_member(alarm.group_id, request.auth.id)
 
     if not is_owner and not is_group_member:
         return 403, {"error": "You do not have access to this alarm"}
 
-    event = AlarmEvent.objects.filter(alarm=alarm).order_by("-created_at").first()
+    event = latest_event(alarm.id)
 
     if not event:
         return 204, None
@@ -381,40 +699,46 @@ def get_latest_event(request, alarm_id: str):
     auth=TokenAuth(),
 )
 def ring_alarm(request, alarm_id: str):
-    with transaction.atomic():
-        alarm = get_object_or_404(Alarm.objects.select_for_update(), id=alarm_id)
-
-        if alarm.user != request.auth:
-            return 403, {"error": "You do not have access to this alarm."}
-
-        recent_threshold = timezone.now() - timedelta(minutes=2)
-        existing_event = AlarmEvent.objects.filter(
-            alarm=alarm,
-            created_at__gte=recent_threshold,
-            status=AlarmEvent.Status.RINGING,
-        ).exists()
-
-        if existing_event:
-            return 409, {"error": "An active event already exists for this alarm."}
-
-        event = AlarmEvent.objects.create(alarm=alarm, user=alarm.user)
+    alarm = get_object_or_404(Alarm.objects.select_related("user"), id=alarm_id)
+
+    if alarm.user_id != request.auth.id:
+        return 403, {"error": "You do not have access to this alarm."}
+
+    now = timezone.now()
+
+    # The scheduler may already have fired the event; the phone's call just confirms it rang.
+    if settings.SERVER_RING_MODE and (ringing := acknowledge_ringing(alarm.id, now)):
+        return 200, {"message": "Alarm event acknowledged.", "event_id": str(ringing)}
+
+    # At most one RINGING event per alarm (event_one_ringing_per_alarm): a stale one
+    # is superseded, a recent one means this is a duplicate ring. Each statement
+    # commits on its own, so no row lock outlives it.
+    if AlarmEvent.objects.filter(
+        alarm=alarm,
+        status=AlarmEvent.Status.RINGING,
+        created_at__lt=now - timedelta(minutes=2),
+    ).update(status=AlarmEvent.Status.EXPIRED):
+        invalidate_events([alarm.id])
+    try:
+        event = AlarmEvent.objects.create(alarm=alarm, user_id=alarm.user_id, acknowledged_at=now)
+    except IntegrityError:
+        if settings.SERVER_RING_MODE and (ringing := acknowledge_ringing(alarm.id, now)):
+            return 200, {"message": "Alarm event acknowledged.", "event_id": str(ringing)}
+        return 409, {"error": "An active event already exists for this alarm."}
+
+    if alarm.is_one_time:
+        Alarm.objects.filter(pk=alarm.pk).update(is_active=False, next_trigger_utc=None, updated_at=now)
+    else:
+        new_trigger = alarm.calculate_next_trigger(now_override=now + timedelta(minutes=2))
+        Alarm.objects.filter(pk=alarm.pk).update(next_trigger_utc=new_trigger, updated_at=now)
+    invalidate_groups([alarm.group_id])
 
-        if alarm.is_one_time:
-            alarm.is_active = False
-            alarm.save(update_fields=["is_active"])
-        else:
-            new_trigger = alarm.calculate_next_trigger(
-                now_override=timezone.now() + timedelta(minutes=2)
-            )
-            Alarm.objects.filter(pk=alarm.pk).update(next_trigger_utc=new_trigger)
-
-    group_members = alarm.group.members.exclude(id=alarm.user.id)
     data_payload = {
         "event_id": str(event.id),
         "alarm_id": str(alarm.id),
         "created_at": event.created_at.isoformat(),
     }
-    send_group_push(group_members, Actions.RINGING, data_payload)
+    send_group_fanout(alarm.group_id, Actions.RINGING, data_payload, exclude_user_id=alarm.user_id)
 
     return 200, {
         "message": "Alarm event created. 5-minute countdown started.",
@@ -422,44 +746,56 @@ def ring_alarm(request, alarm_id: str):
     }
 
 
+def acknowledge_ringing(alarm_id, now):
+    ringing = (
+        AlarmEvent.objects.filter(alarm_id=alarm_id, status=AlarmEvent.Status.RINGING)
+        .values_list("id", flat=True)
+        .first()
+    )
+    if ringing and AlarmEvent.objects.filter(id=ringing, acknowledged_at__isnull=True).update(
+        acknowledged_at=now
+    ):
+        invalidate_events([alarm_id])
+    return ringing
+
+
 @router.post(
     "/alarm/{alarm_id}/check_in/",
     response={200: dict, 404: None, 403: dict, 409: dict},
     auth=TokenAuth(),
 )
 def check_in_alarm(request, alarm_id: str):
-    with transaction.atomic():
-        alarm = get_object_or_404(Alarm.objects.select_for_update(), id=alarm_id)
-
-        if alarm.user != request.auth:
-            return 403, {"error": "You do not have access to this event!"}
+    alarm = get_object_or_404(Alarm.objects.only("id", "name", "user_id", "group_id"), id=alarm_id)
 
-        event = (
-            AlarmEvent.objects.filter(alarm=alarm)
-            .select_for_update()
-            .order_by("-created_at")
-            .first()
-        )
+    if alarm.user_id != request.auth.id:
+        return 403, {"error": "You do not have access to this event!"}
 
-        if not event:
-            return 404, None
-        if event.status == AlarmEvent.Status.CHECKED_IN:
-            return 409, {"error": "Already checked in"}
+    event = AlarmEvent.objects.filter(alarm=alarm).order_by("-created_at").only("id", "status").first()
 
-        event.status = AlarmEvent.Status.CHECKED_IN
-        event.checked_in_at = timezone.now()
-        event.save(update_fields=["status", "checked_in_at"])
+    if not event:
+        return 404, None
+    if event.status == AlarmEvent.Status.CHECKED_IN:
+        return 409, {"error": "Already checked in"}
+
+    # Compare-and-set: only one of several concurrent check-ins (or a racing reap) wins.
+    claimed = (
+        AlarmEvent.objects.filter(id=event.id)
+        .exclude(status=AlarmEvent.Status.CHECKED_IN)
+        .update(status=AlarmEvent.Status.CHECKED_IN, checked_in_at=timezone.now())
+    )
+    if not claimed:
+        return 409, {"error": "Already checked in"}
+    invalidate_events([alarm.id])
 
-    group_members = alarm.group.members.exclude(id=alarm.user.id)
     data_payload = {
         "event_id": str(event.id),
         "alarm_id": str(alarm.id),
     }
 
-    success = send_group_push(
-        users=group_members, action=Actions.CHECKED_IN, data=data_payload
+    send_group_fanout(
+        alarm.group_id, Actions.CHECKED_IN, data=data_payload, exclude_user_id=alarm.user_id
     )
 
-    return 200, {"message": f"Checked in for {event.alarm.name}"}
+    return 200, {"message": f"Checked in for {alarm.name}"}
 
 
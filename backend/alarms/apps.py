@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AlarmsConfig(AppConfig):
     name = 'alarms'
+
+    def ready(self):
+        from . import fanout  # noqa: F401 - registers device index invalidation
+        from . import lookups  # noqa: F401 - registers read cache invalidation
@@ -0,0 +1,92 @@
+"""
+Coalescing for rapid, repeated silent pushes.
+
+Every save of an alarm or group sends a silent "refetch" push to the group.
+The first push for a ``(group, action, target)`` key goes out immediately and
+opens a window; anything arriving for the same key inside the window is merged
+into a single trailing push sent when the window closes. Alert pushes never go
+through here.
+"""
+
+import logging
+import threading
+
+from django.db import connection
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+pushes_saved_total = metrics.counter(
+    "ringsync_push_coalesced_total",
+    "Silent pushes merged into another push instead of being sent.",
+    ["action"],
+)
+trailing_flushes_total = metrics.counter(
+    "ringsync_push_coalesce_flushes_total",
+    "Trailing pushes sent when a coalescing window closed.",
+    ["action"],
+)
+
+
+class _Window:
+    __slots__ = ("timer", "tokens", "action", "data", "merged")
+
+    def __init__(self):
+        self.timer = None
+        self.tokens = set()
+        self.action = None
+        self.data = None
+        self.merged = 0
+
+
+class PushCoalescer:
+    def __init__(self, send):
+        self.send = send
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, tokens, action, data, window_seconds):
+        """Send now if no window is open for ``key``; otherwise merge into the trailing push."""
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None:
+                if window.merged:
+                    pushes_saved_total.inc(action=action.value)
+                window.tokens.update(tokens)
+                window.action, window.data = action, data
+                window.merged += 1
+                return True
+            window = self._windows[key] = _Window()
+            window.timer = threading.Timer(window_seconds, self._close_from_timer, args=(key,))
+            window.timer.start()
+
+        return self.send(list(tokens), action, data)
+
+    def _close(self, key):
+        with self._lock:
+            window = self._windows.pop(key, None)
+        if window is None or not window.merged:
+            return
+        trailing_flushes_total.inc(action=window.action.value)
+        try:
+            self.send(list(window.tokens), window.action, window.data)
+        except Exception:
+            logger.exception("Coalesced push failed", extra={"key": str(key)})
+
+    def _close_from_timer(self, key):
+        try:
+            self._close(key)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Close every open window now, sending pending trailing pushes."""
+        with self._lock:
+            keys = list(self._windows)
+        for key in keys:
+            with self._lock:
+                window = self._windows.get(key)
+            if window is not None:
+                window.timer.cancel()
+                self._close(key)
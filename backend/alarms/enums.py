@@ -6,6 +6,7 @@ class Actions(enum.Enum):
     CHECKED_IN = "alarm_checked_in"
     EXPIRED = "alarm_expired"
     MANUAL_RING = "manual_ring"
+    RING_FAILED = "ring_failed"
     GROUP_MEMBER_ADDED = "group_member_added"
     FRIEND_ACCEPTED = "friend_accepted"
     FRIEND_REQUEST_RECEIVED = "friend_request_received"
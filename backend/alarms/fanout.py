@@ -0,0 +1,88 @@
+"""
+Cached group → active device token index.
+
+Group fan-out pushes read ``(user_id, push_token)`` pairs for every member from
+the cache instead of joining ``UserDevice`` against the membership table on
+each send. Entries are invalidated when devices are registered, deactivated or
+deleted, when membership changes, and when a group or user is deleted.
+
+The index is read by the scheduler as well as the web process, so it goes
+through ``core.cache``: invalidation is repeated on commit, and without a
+shared cache backend ``GROUP_FANOUT_CACHE_TTL`` defaults to seconds.
+"""
+
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.cache import invalidate, read_through
+from users.models import User, UserDevice
+
+from .models import Group
+
+
+def _scope(group_id):
+    return f"group-devices:{group_id}"
+
+
+def group_devices(group_id):
+    """Return ``[(user_id, push_token), ...]`` for the active devices of every member."""
+    return read_through(
+        _scope(group_id),
+        "group_devices",
+        lambda: list(
+            UserDevice.objects.filter(user__group_members=group_id, is_active=True).values_list(
+                "user_id", "push_token"
+            )
+        ),
+        timeout=settings.GROUP_FANOUT_CACHE_TTL,
+    )
+
+
+def group_tokens(group_id, exclude_user_id=None):
+    return [token for user_id, token in group_devices(group_id) if user_id != exclude_user_id]
+
+
+def invalidate_groups(group_ids):
+    invalidate(*(_scope(group_id) for group_id in group_ids))
+
+
+def invalidate_users(user_ids):
+    group_ids = Group.members.through.objects.filter(user_id__in=user_ids).values_list(
+        "group_id", flat=True
+    )
+    invalidate_groups(set(group_ids))
+
+
+@receiver(post_save, sender=UserDevice)
+def invalidate_on_device_change(sender, instance, **kwargs):
+    invalidate_users([instance.user_id])
+
+
+@receiver(post_delete, sender=UserDevice)
+def invalidate_on_device_delete(sender, instance, **kwargs):
+    # Inactive devices are never indexed, so purging them needs no invalidation.
+    if instance.is_active:
+        invalidate_users([instance.user_id])
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def invalidate_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_groups([instance.pk])
+    elif pk_set:
+        invalidate_groups(pk_set)
+    else:
+        invalidate_users([instance.pk])
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_on_group_delete(sender, instance, **kwargs):
+    invalidate_groups([instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_on_user_delete(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
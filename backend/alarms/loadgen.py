@@ -0,0 +1,315 @@
+"""
+Fixtures and replay drivers for the benchmark command.
+
+The morning spike seeds users, groups and alarms whose local times cluster on
+:00/:30 of a few morning hours, then replays a spike against the API in-process
+with the Django test client while the reaper runs and FCM is replaced by a
+stub. The login storm has seeded users log in from many threads at once, as
+after an app release, while another thread keeps reading alarms.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import time as Time
+from datetime import timedelta
+from statistics import median
+from unittest import mock
+
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from firebase_admin import messaging
+from users.models import AuthToken, User, UserDevice, normalize_search_text
+
+from .models import Alarm, AlarmEvent, Group
+from .rings import process_due_rings
+
+TIMEZONES = [
+    ("America/New_York", 30),
+    ("America/Chicago", 15),
+    ("America/Los_Angeles", 20),
+    ("Europe/London", 15),
+    ("Europe/Berlin", 10),
+    ("Asia/Tokyo", 5),
+    ("UTC", 5),
+]
+HOURS = [(6, 25), (7, 45), (8, 30)]
+MINUTES = [(0, 60), (30, 25), (15, 5), (45, 5), (10, 5)]
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+
+class PushStub:
+    """Stand-in for ``messaging.send_each_for_multicast`` that always succeeds."""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+
+    def __call__(self, message, kind):
+        self.calls += 1
+        self.tokens += len(message.tokens)
+        return messaging.BatchResponse(
+            [messaging.SendResponse({"name": "stub"}, None) for _ in message.tokens]
+        )
+
+    @contextmanager
+    def installed(self):
+        with mock.patch("alarms.utils._send_multicast", self):
+            yield self
+
+
+def seed(num_users, rng, group_size=(3, 8), alarms_per_user=(1, 3)):
+    """Create users with devices and tokens, groups and morning alarms. Returns the fixture."""
+    password = make_password(None)
+    users = [
+        User(
+            username=f"bench_{i}",
+            email=f"bench_{i}@example.com",
+            display_name=f"Bench {i}",
+            username_search=f"bench_{i}",
+            display_name_search=normalize_search_text(f"Bench {i}"),
+            timezone=_weighted(rng, TIMEZONES),
+            password=password,
+        )
+        for i in range(num_users)
+    ]
+    User.objects.bulk_create(users)
+
+    tokens = {user.id: uuid.uuid4() for user in users}
+    AuthToken.objects.bulk_create(AuthToken(id=tokens[u.id], user=u) for u in users)
+    UserDevice.objects.bulk_create(
+        UserDevice(user=u, push_token=f"bench-token-{u.id}", device_type="ios") for u in users
+    )
+
+    shuffled = users[:]
+    rng.shuffle(shuffled)
+    groups = []
+    while shuffled:
+        size = rng.randint(*group_size)
+        members, shuffled = shuffled[:size], shuffled[size:]
+        group = Group.objects.create(name=f"Bench group {len(groups)}")
+        group.members.add(*members)
+        groups.append((group, members))
+
+    alarms = []
+    for group, members in groups:
+        for member in members:
+            for _ in range(rng.randint(*alarms_per_user)):
+                alarm = Alarm(
+                    name="Wake up",
+                    time=Time(_weighted(rng, HOURS), _weighted(rng, MINUTES)),
+                    is_one_time=False,
+                    repeats="Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+                    user=member,
+                    group=group,
+                )
+                alarm.next_trigger_utc = alarm.calculate_next_trigger()
+                alarms.append(alarm)
+    Alarm.objects.bulk_create(alarms)
+
+    return {
+        "users": users,
+        "tokens": tokens,
+        "groups": groups,
+        "alarms": alarms,
+        "members": {group.id: members for group, members in groups},
+    }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, elapsed, queries, status):
+        self.latencies[name].append(elapsed)
+        self.queries[name].append(queries)
+        self.statuses[name][status] += 1
+
+    def summary(self, wall_seconds):
+        rows = []
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            queries = self.queries[name]
+            rows.append(
+                {
+                    "endpoint": name,
+                    "requests": len(latencies),
+                    "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+                    "p50_ms": median(latencies) * 1000,
+                    "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+                    "avg_queries": sum(queries) / len(queries),
+                    "max_queries": max(queries),
+                    "statuses": dict(self.statuses[name]),
+                }
+            )
+        return rows
+
+
+class SpikeReplay:
+    """Drive ring → check-in/expire → trigger for every seeded alarm through the API."""
+
+    def __init__(self, fixture, rng, reaper, checkin_rate=0.7, dead_phone_rate=0.1):
+        self.fixture = fixture
+        self.rng = rng
+        self.reaper = reaper
+        self.checkin_rate = checkin_rate
+        self.dead_phone_rate = dead_phone_rate
+        self.client = Client()
+        self.stats = EndpointStats()
+        self.sweeps = []
+        self.ring_attempts = 0
+
+    def call(self, name, method, path, user, **kwargs):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {self.fixture['tokens'][user.id]}"}
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(
+                path, content_type="application/json", **headers, **kwargs
+            )
+            elapsed = time.perf_counter() - start
+        self.stats.record(name, elapsed, len(ctx.captured_queries), response.status_code)
+        return response
+
+    def other_member(self, alarm):
+        others = [m for m in self.fixture["members"][alarm.group_id] if m.id != alarm.user_id]
+        return self.rng.choice(others) if others else None
+
+    def run(self):
+        alarms = sorted(self.fixture["alarms"], key=lambda a: a.time)
+        started = time.perf_counter()
+
+        dead, ringing = [], []
+        for alarm in alarms:
+            if self.rng.random() < self.dead_phone_rate:
+                dead.append(alarm)
+                continue
+            self.call("POST /alarm/{id}/ring/", "post", f"/api/alarms/alarm/{alarm.id}/ring/", alarm.user)
+            ringing.append(alarm)
+
+            watcher = self.other_member(alarm)
+            if watcher:
+                self.call("GET /alarm/{id}/event/", "get", f"/api/alarms/alarm/{alarm.id}/event/", watcher)
+
+        missed = []
+        for alarm in ringing:
+            if self.rng.random() < self.checkin_rate:
+                self.call(
+                    "POST /alarm/{id}/check_in/", "post", f"/api/alarms/alarm/{alarm.id}/check_in/", alarm.user
+                )
+            else:
+                missed.append(alarm)
+
+        # Age the unanswered events and dead phones past the grace period, then reap.
+        past = timezone.now() - timedelta(minutes=6)
+        AlarmEvent.objects.filter(
+            alarm__in=missed, status=AlarmEvent.Status.RINGING
+        ).update(created_at=past)
+        Alarm.objects.filter(id__in=[a.id for a in dead]).update(next_trigger_utc=past)
+        self.sweeps.append(self.reaper.reap_expired_alarms())
+
+        for alarm in missed + dead:
+            ringer = self.other_member(alarm)
+            if ringer:
+                self.call("POST /alarm/{id}/trigger/", "post", f"/api/alarms/alarm/{alarm.id}/trigger/", ringer)
+                self.call("GET /group/{id}/alarms/", "get", f"/api/alarms/group/{alarm.group_id}/alarms/", ringer)
+
+        # Deliver the queued rings the way the scheduler would.
+        while attempted := process_due_rings():
+            self.ring_attempts += attempted
+
+        return time.perf_counter() - started
+
+
+LOGIN_PASSWORD = "bench-password"
+
+
+class LoginStorm:
+    """
+    Log every seeded user in twice with the same device id from
+    ``concurrency`` threads, while one more thread lists alarms.
+    """
+
+    def __init__(self, fixture, rng, concurrency=16):
+        self.fixture = fixture
+        self.rng = rng
+        self.concurrency = concurrency
+        self.stats = EndpointStats()
+        self._lock = threading.Lock()
+
+    def call(self, client, name, method, path, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, content_type="application/json", **kwargs)
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats.record(name, elapsed, len(ctx.captured_queries), response.status_code)
+        return response
+
+    def run(self):
+        users = self.fixture["users"]
+        # The real hash is only set here, so the spike seeding stays fast.
+        User.objects.filter(id__in=[u.id for u in users]).update(password=make_password(LOGIN_PASSWORD))
+        logins = [(user, f"device-{user.id}") for user in users] * 2
+        self.rng.shuffle(logins)
+        pending = iter(logins)
+        done = threading.Event()
+
+        def login_worker():
+            client = Client()
+            try:
+                while True:
+                    with self._lock:
+                        item = next(pending, None)
+                    if item is None:
+                        return
+                    user, device_id = item
+                    self.call(
+                        client,
+                        "POST /users/login/",
+                        "post",
+                        "/api/users/login/",
+                        data={"email": user.email, "password": LOGIN_PASSWORD, "device_id": device_id},
+                    )
+            finally:
+                connection.close()
+
+        def alarm_reader():
+            client = Client()
+            user = users[0]
+            token = self.fixture["tokens"][user.id]
+            try:
+                while not done.is_set():
+                    self.call(
+                        client, "GET /alarm/ (during storm)", "get", "/api/alarms/alarm/",
+                        HTTP_AUTHORIZATION=f"Bearer {token}",
+                    )
+            finally:
+                connection.close()
+
+        limits = {**settings.RATE_LIMITS, "login_ip": (10**9, 300), "login_email": (10**9, 300)}
+        with override_settings(RATE_LIMITS=limits):
+            reader = threading.Thread(target=alarm_reader)
+            workers = [threading.Thread(target=login_worker) for _ in range(self.concurrency)]
+            started = time.perf_counter()
+            reader.start()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            wall = time.perf_counter() - started
+            done.set()
+            reader.join()
+        return wall
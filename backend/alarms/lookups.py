@@ -0,0 +1,129 @@
+"""
+Cached reads for group membership, group alarm lists and each alarm's latest
+event.
+
+Membership and alarm lists live under the group's scope and are invalidated
+together whenever the group, its membership or one of its alarms changes;
+latest events live under the alarm's scope. Signals cover ``save()`` and
+``delete()``. Writes through ``QuerySet.update()``, ``bulk_create()`` or
+``bulk_update()`` send no signals, so those call ``invalidate_groups`` or
+``invalidate_events`` themselves.
+
+Invalidation only reaches other processes through a shared cache. Without one
+the scheduler's writes never clear the web workers' copies, so ``is_member``
+and ``current_event``, which authorize requests and decide ring transitions,
+read the database unless ``SHARED_CACHE`` is set.
+"""
+
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.cache import invalidate, read_through
+from users.models import User
+
+from .models import Alarm, AlarmEvent, Group
+from .schemas import AlarmEventOut, AlarmOut
+
+ALARM_FIELDS = tuple(AlarmOut.model_fields)
+EVENT_FIELDS = tuple(AlarmEventOut.model_fields)
+
+
+def _group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def _event_scope(alarm_id):
+    return f"alarm-event:{alarm_id}"
+
+
+def member_ids(group_id):
+    return read_through(
+        _group_scope(group_id),
+        "group_members",
+        lambda: frozenset(
+            Group.members.through.objects.filter(group_id=group_id).values_list("user_id", flat=True)
+        ),
+    )
+
+
+def is_member(group_id, user_id):
+    if not settings.SHARED_CACHE:
+        return Group.members.through.objects.filter(group_id=group_id, user_id=user_id).exists()
+    return user_id in member_ids(group_id)
+
+
+def group_alarms(group_id):
+    """Return the group's alarms as ``AlarmOut`` rows."""
+    return read_through(
+        _group_scope(group_id),
+        "group_alarms",
+        lambda: list(Alarm.objects.filter(group_id=group_id).values(*ALARM_FIELDS)),
+    )
+
+
+def _load_latest_event(alarm_id):
+    return (
+        AlarmEvent.objects.filter(alarm_id=alarm_id)
+        .order_by("-created_at")
+        .values(*EVENT_FIELDS)
+        .first()
+    )
+
+
+def latest_event(alarm_id):
+    """Return the alarm's most recent event as an ``AlarmEventOut`` row, or ``None``."""
+    return read_through(
+        _event_scope(alarm_id), "latest_event", lambda: _load_latest_event(alarm_id)
+    )
+
+
+def current_event(alarm_id):
+    """``latest_event`` for deciding a ring transition; cached only when the cache is shared."""
+    if not settings.SHARED_CACHE:
+        return _load_latest_event(alarm_id)
+    return latest_event(alarm_id)
+
+
+def invalidate_groups(group_ids):
+    invalidate(*(_group_scope(group_id) for group_id in group_ids))
+
+
+def invalidate_events(alarm_ids):
+    invalidate(*(_event_scope(alarm_id) for alarm_id in alarm_ids))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_on_group_change(sender, instance, **kwargs):
+    invalidate_groups([instance.pk])
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def invalidate_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_groups([instance.pk])
+    elif pk_set:
+        invalidate_groups(pk_set)
+    else:
+        invalidate_groups(instance.group_members.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=User)
+def invalidate_on_user_delete(sender, instance, **kwargs):
+    # The membership rows go with the user without an m2m_changed signal.
+    invalidate_groups(instance.group_members.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Alarm)
+@receiver(post_delete, sender=Alarm)
+def invalidate_on_alarm_change(sender, instance, **kwargs):
+    invalidate_groups([instance.group_id])
+
+
+@receiver(post_save, sender=AlarmEvent)
+@receiver(post_delete, sender=AlarmEvent)
+def invalidate_on_event_change(sender, instance, **kwargs):
+    invalidate_events([instance.alarm_id])
@@ -0,0 +1,71 @@
+"""
+Retention jobs for alarm tables, run from the scheduler's maintenance pass.
+
+Old events aren't archived row by row: before a batch is deleted its events are
+folded into ``AlarmEventRollup`` (one row per alarm, user and UTC day), which
+is all the leaderboard needs from them.
+"""
+
+from collections import defaultdict
+
+from django.db.models import F
+
+from core.retention import cutoff, delete_in_batches
+
+from .models import ON_TIME_WINDOW, AlarmEvent, AlarmEventRollup, ManualRing
+
+
+def _roll_up(event_ids):
+    counts = defaultdict(lambda: [0, 0])
+    events = AlarmEvent.objects.filter(id__in=event_ids).values(
+        "alarm_id", "user_id", "status", "created_at", "checked_in_at"
+    )
+    for event in events:
+        count = counts[(event["alarm_id"], event["user_id"], event["created_at"].date())]
+        count[0] += 1
+        if (
+            event["status"] == AlarmEvent.Status.CHECKED_IN
+            and event["checked_in_at"] is not None
+            and event["checked_in_at"] - event["created_at"] <= ON_TIME_WINDOW
+        ):
+            count[1] += 1
+
+    existing = AlarmEventRollup.objects.filter(
+        alarm_id__in={alarm_id for alarm_id, _, _ in counts},
+        day__in={day for _, _, day in counts},
+    ).select_for_update()
+    for rollup in existing:
+        count = counts.pop((rollup.alarm_id, rollup.user_id, rollup.day), None)
+        if count is not None:
+            AlarmEventRollup.objects.filter(pk=rollup.pk).update(
+                total_events=F("total_events") + count[0],
+                on_time_checkins=F("on_time_checkins") + count[1],
+            )
+    AlarmEventRollup.objects.bulk_create(
+        AlarmEventRollup(
+            alarm_id=alarm_id, user_id=user_id, day=day, total_events=total, on_time_checkins=on_time
+        )
+        for (alarm_id, user_id, day), (total, on_time) in counts.items()
+    )
+
+
+def compact_alarm_events():
+    """Roll up and delete finished events older than the retention period."""
+    before = cutoff("alarm_events")
+    if before is None:
+        return 0
+    old = AlarmEvent.objects.filter(created_at__lt=before).exclude(
+        status=AlarmEvent.Status.RINGING
+    ).order_by("created_at")
+    return delete_in_batches(old, before_delete=_roll_up)
+
+
+def purge_manual_rings():
+    """Delete settled manual rings older than the retention period."""
+    before = cutoff("manual_rings")
+    if before is None:
+        return 0
+    old = ManualRing.objects.filter(created_at__lt=before).exclude(
+        status=ManualRing.Status.PENDING
+    ).order_by("created_at")
+    return delete_in_batches(old)
@@ -0,0 +1,134 @@
+import json
+import random
+
+from alarms.loadgen import LoginStorm, PushStub, SpikeReplay, seed
+from alarms.management.commands.scheduler import Command as SchedulerCommand
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from users.models import AuthToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a morning alarm spike, or a concurrent login storm, against the API "
+        "in-process and reports per-endpoint latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario", choices=("spike", "login"), default="spike", help="Load to replay."
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16, help="Login threads for the login scenario."
+        )
+        parser.add_argument("--users", type=int, default=200, help="Number of users to seed.")
+        parser.add_argument("--seed", type=int, default=1, help="Random seed for fixtures.")
+        parser.add_argument(
+            "--checkin-rate", type=float, default=0.7, help="Share of ringing alarms checked in."
+        )
+        parser.add_argument(
+            "--dead-phone-rate", type=float, default=0.1, help="Share of alarms that never ring."
+        )
+        parser.add_argument("--json", action="store_true", help="Emit the report as JSON.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if options["scenario"] == "login":
+                report = self.run_login_storm(options)
+            else:
+                report = self.run_spike(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+        elif options["scenario"] == "login":
+            self.stdout.write(self.format_login_report(report))
+        else:
+            self.stdout.write(self.format_report(report))
+
+    def run_spike(self, options):
+        rng = random.Random(options["seed"])
+        fixture = seed(options["users"], rng)
+        reaper = SchedulerCommand(stdout=self.stdout, stderr=self.stderr)
+
+        with PushStub().installed() as push:
+            replay = SpikeReplay(
+                fixture,
+                rng,
+                reaper,
+                checkin_rate=options["checkin_rate"],
+                dead_phone_rate=options["dead_phone_rate"],
+            )
+            wall = replay.run()
+
+        return {
+            "users": len(fixture["users"]),
+            "groups": len(fixture["groups"]),
+            "alarms": len(fixture["alarms"]),
+            "wall_seconds": wall,
+            "endpoints": replay.stats.summary(wall),
+            "sweeps": replay.sweeps,
+            "ring_attempts": replay.ring_attempts,
+            "push": {"calls": push.calls, "tokens": push.tokens},
+        }
+
+    def run_login_storm(self, options):
+        rng = random.Random(options["seed"])
+        fixture = seed(options["users"], rng)
+        storm = LoginStorm(fixture, rng, concurrency=options["concurrency"])
+        wall = storm.run()
+        return {
+            "users": len(fixture["users"]),
+            "concurrency": options["concurrency"],
+            "hash_workers": settings.PASSWORD_HASH_WORKERS,
+            "wall_seconds": wall,
+            "endpoints": storm.stats.summary(wall),
+            "tokens": AuthToken.objects.count(),
+        }
+
+    def format_endpoints(self, endpoints):
+        lines = [
+            f"{'endpoint':<28} {'reqs':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'avg q':>6} {'max q':>6}",
+        ]
+        for row in endpoints:
+            lines.append(
+                f"{row['endpoint']:<28} {row['requests']:>6} {row['throughput_rps']:>8.1f}"
+                f" {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+                f" {row['avg_queries']:>6.1f} {row['max_queries']:>6}"
+            )
+        return lines
+
+    def format_login_report(self, report):
+        lines = [
+            f"{report['users']} users logging in twice from {report['concurrency']} threads, "
+            f"{report['hash_workers']} hash workers; storm took {report['wall_seconds']:.2f}s",
+            "",
+            *self.format_endpoints(report["endpoints"]),
+            "",
+        ]
+        for row in report["endpoints"]:
+            statuses = ", ".join(f"{status}: {count}" for status, count in sorted(row["statuses"].items()))
+            lines.append(f"{row['endpoint']}: {statuses}")
+        lines.append(f"Tokens after the storm: {report['tokens']}")
+        return "\n".join(lines)
+
+    def format_report(self, report):
+        lines = [
+            f"Seeded {report['users']} users, {report['groups']} groups, {report['alarms']} alarms; "
+            f"replay took {report['wall_seconds']:.2f}s",
+            "",
+            *self.format_endpoints(report["endpoints"]),
+            "",
+        ]
+        for sweep in report["sweeps"]:
+            lines.append(SchedulerCommand().format_report(sweep))
+        lines.append(f"Ring attempts: {report['ring_attempts']}")
+        lines.append(f"Push stub: {report['push']['calls']} sends, {report['push']['tokens']} tokens")
+        return "\n".join(lines)
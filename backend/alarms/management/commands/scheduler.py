@@ -1,101 +1,657 @@
+import argparse
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
 import time
 from datetime import timedelta
 
 from alarms.enums import Actions
+from alarms.lookups import invalidate_events, invalidate_groups
+from alarms.maintenance import compact_alarm_events, purge_manual_rings
 from alarms.models import Alarm, AlarmEvent
-from alarms.utils import send_group_push
-from django.core.management import BaseCommand
-from django.db import transaction
+from alarms.planning import bucket_occupancy, plan_work
+from alarms.rings import process_due_rings
+from alarms.utils import send_group_fanout
+from core import metrics
+from core.idempotency import purge_expired_keys
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
 from django.utils import timezone
+from users.mail import process_due_emails
+from users.maintenance import (
+    purge_idle_tokens,
+    purge_inactive_devices,
+    purge_outbound_emails,
+    purge_reset_codes,
+)
+
+logger = logging.getLogger(__name__)
+
+GRACE_PERIOD = timedelta(minutes=5)
+
+FIRE_BATCH_SIZE = 200
+
+LATENESS_BUCKETS = (1, 5, 10, 15, 30, 45, 60, 90, 120, 180, 300)
+
+sweep_seconds = metrics.histogram(
+    "ringsync_scheduler_sweep_seconds", "Duration of a full reaper sweep."
+)
+phase_seconds = metrics.histogram(
+    "ringsync_scheduler_phase_seconds", "Time spent per reaper phase.", ["phase"]
+)
+backlog_depth = metrics.gauge(
+    "ringsync_scheduler_backlog", "Rows due at the start of the last sweep.", ["phase"]
+)
+rows_claimed_total = metrics.counter(
+    "ringsync_scheduler_rows_claimed_total", "Rows transitioned by the reaper.", ["phase"]
+)
+lateness_seconds = metrics.histogram(
+    "ringsync_scheduler_lateness_seconds",
+    "Reap time minus the moment the row became due (trigger + grace period).",
+    ["phase"],
+    buckets=LATENESS_BUCKETS,
+)
+push_outcomes_total = metrics.counter(
+    "ringsync_scheduler_push_total", "Missed-alarm group pushes by outcome.", ["outcome"]
+)
+bucket_rows = metrics.gauge(
+    "ringsync_scheduler_bucket_rows", "Rows planned into the current time bucket.", ["phase"]
+)
+rate_overrides_total = metrics.counter(
+    "ringsync_scheduler_rate_overrides_total",
+    "Rows pulled ahead of the work-rate limit to stay inside the SLA.",
+)
+
+maintenance_rows_total = metrics.counter(
+    "ringsync_scheduler_maintenance_rows_total", "Rows removed by maintenance jobs.", ["job"]
+)
+
+PHASES = ("expire_ringing", "catch_missed")
+
+MAINTENANCE_JOBS = {
+    "purge_inactive_devices": purge_inactive_devices,
+    "purge_idempotency_keys": purge_expired_keys,
+    "compact_alarm_events": compact_alarm_events,
+    "purge_manual_rings": purge_manual_rings,
+    "purge_idle_tokens": purge_idle_tokens,
+    "purge_reset_codes": purge_reset_codes,
+    "purge_outbound_emails": purge_outbound_emails,
+}
+
+
+def _quantile(values, q):
+    """Nearest-rank quantile of sorted ``values``; ``None`` when empty."""
+    if not values:
+        return None
+    return values[max(math.ceil(q * len(values)) - 1, 0)]
 
 
 class Command(BaseCommand):
     help = "Runs the background Reaper to catch missed alarms and dead phones."
 
+    ring_poll_seconds = 1.0
+    server_ring = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Lateness of the rows handled since the phase was last reported, so the
+        # sweep summary describes that sweep rather than the whole process.
+        self.sweep_lateness = {phase: [] for phase in PHASES}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="Run a single sweep and exit."
+        )
+        parser.add_argument(
+            "--report",
+            action="store_true",
+            help="Print a per-phase summary after each sweep or bucket.",
+        )
+        parser.add_argument(
+            "--bucket-seconds",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_BUCKET_SECONDS", "60")),
+            help="Length of each planning bucket (at most the 5-minute grace period).",
+        )
+        parser.add_argument(
+            "--spread-seconds",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_SPREAD_SECONDS", "30")),
+            help="Window across which rows due in the same second are spread.",
+        )
+        parser.add_argument(
+            "--max-rate",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_MAX_RATE", "20")),
+            help="Maximum rows processed per second (0 disables the limit).",
+        )
+        parser.add_argument(
+            "--sla-seconds",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_SLA_SECONDS", "60")),
+            help="Latest a row may be processed after it becomes due.",
+        )
+        parser.add_argument(
+            "--occupancy",
+            type=float,
+            metavar="HOURS",
+            help="Print per-bucket occupancy of upcoming triggers for the next HOURS and exit.",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=int(os.environ.get("SCHEDULER_METRICS_PORT", "0")),
+            help="Serve Prometheus metrics on this port (0 disables).",
+        )
+        parser.add_argument(
+            "--metrics-addr",
+            default=os.environ.get("SCHEDULER_METRICS_ADDR", "127.0.0.1"),
+            help="Address to serve metrics on; scrapes need METRICS_TOKEN when it is set.",
+        )
+        parser.add_argument(
+            "--stats-file",
+            default=os.environ.get("SCHEDULER_STATS_FILE", ""),
+            help="Write a JSON summary of the last sweep to this path.",
+        )
+        parser.add_argument(
+            "--ring-poll-seconds",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_RING_POLL_SECONDS", "1")),
+            help="How often pending manual rings are attempted while waiting between rows.",
+        )
+        parser.add_argument(
+            "--server-ring",
+            action=argparse.BooleanOptionalAction,
+            default=settings.SERVER_RING_MODE,
+            help="Fire RINGING events at next_trigger_utc instead of waiting for the phone.",
+        )
+        parser.add_argument(
+            "--maintenance-seconds",
+            type=float,
+            default=float(os.environ.get("SCHEDULER_MAINTENANCE_SECONDS", "3600")),
+            help="Interval between maintenance passes (0 disables).",
+        )
+        parser.add_argument(
+            "--maintenance",
+            action="store_true",
+            help="Run a single maintenance pass, print the rows removed per job and exit.",
+        )
+
     def handle(self, *args, **options):
-        print("Starting the Nudge Reaper...")
+        if options["bucket_seconds"] > GRACE_PERIOD.total_seconds():
+            raise CommandError("--bucket-seconds cannot exceed the 5-minute grace period.")
+        if options["spread_seconds"] > options["sla_seconds"]:
+            raise CommandError("--spread-seconds cannot exceed --sla-seconds.")
+        if options["ring_poll_seconds"] <= 0:
+            raise CommandError("--ring-poll-seconds must be positive.")
 
+        if options["occupancy"]:
+            self.stdout.write(
+                self.format_occupancy(options["occupancy"], options["bucket_seconds"])
+            )
+            return
+
+        if options["maintenance"]:
+            removed = self.run_maintenance()
+            for job, rows in removed.items():
+                self.stdout.write(f"{job}: {rows}")
+            return
+
+        logger.info("Starting the Nudge Reaper...")
+
+        if options["metrics_port"]:
+            metrics.start_http_server(
+                options["metrics_port"], addr=options["metrics_addr"], token=settings.METRICS_TOKEN
+            )
+            logger.info(
+                "Serving scheduler metrics",
+                extra={"addr": options["metrics_addr"], "port": options["metrics_port"]},
+            )
+
+        self.ring_poll_seconds = options["ring_poll_seconds"]
+        self.server_ring = options["server_ring"]
+
+        if options["once"]:
+            self.poll()
+            self.send_emails()
+            self.emit(self.reap_expired_alarms(), options)
+            return
+
+        self.start_email_worker()
+        next_maintenance = time.monotonic()
         while True:
-            self.reap_expired_alarms()
-            time.sleep(60)
+            if options["maintenance_seconds"] and time.monotonic() >= next_maintenance:
+                self.run_maintenance()
+                next_maintenance = time.monotonic() + options["maintenance_seconds"]
+            self.emit(self.run_bucket(options), options)
+
+    def emit(self, stats, options):
+        if options["stats_file"]:
+            self.write_stats(options["stats_file"], stats)
+        if options["report"]:
+            self.stdout.write(self.format_report(stats))
+
+    # ==========================================
+    # Sweeps
+    # ==========================================
 
     def reap_expired_alarms(self):
+        """Process everything currently due in one pass, without pacing."""
+        sweep_start = time.perf_counter()
         now = timezone.now()
-        threshold = now - timedelta(minutes=5)
+        threshold = now - GRACE_PERIOD
+        stats = {"started_at": now.isoformat(), "phases": {}}
+        pushes_before = self.push_totals()
 
         # Phase A: Reap RINGING events older than 5 minutes → EXPIRED
+        phase_start = time.perf_counter()
         abandoned_event_ids = list(
             AlarmEvent.objects.filter(
                 status=AlarmEvent.Status.RINGING, created_at__lte=threshold
             ).values_list("id", flat=True)
         )
-
-        for event_id in abandoned_event_ids:
-            with transaction.atomic():
-                event = (
-                    AlarmEvent.objects.select_for_update(of=("self",))
-                    .select_related("alarm__group", "user")
-                    .filter(id=event_id)
-                    .first()
-                )
-
-                if not event:
-                    continue
-
-                if event.status == AlarmEvent.Status.RINGING:
-                    event.status = AlarmEvent.Status.EXPIRED
-                    event.save(update_fields=["status"])
-
-                    print(
-                        f"[{now}] Reaped abandoned event for {event.user.display_name}"
-                    )
-
-                    transaction.on_commit(
-                        lambda event=event: self.notify_group(str(event.id))
-                    )
+        claimed = sum(self.expire_event(event_id, now) for event_id in abandoned_event_ids)
+        stats["phases"]["expire_ringing"] = self.record_phase(
+            "expire_ringing", time.perf_counter() - phase_start, len(abandoned_event_ids), claimed
+        )
 
         # Phase B: Catch dead phones — alarms that were due but no event was created
+        phase_start = time.perf_counter()
         missed_alarm_ids = list(
             Alarm.objects.filter(
                 is_active=True, next_trigger_utc__lte=threshold
             ).values_list("id", flat=True)
         )
+        claimed = sum(self.catch_missed_alarm(alarm_id, now) for alarm_id in missed_alarm_ids)
+        stats["phases"]["catch_missed"] = self.record_phase(
+            "catch_missed", time.perf_counter() - phase_start, len(missed_alarm_ids), claimed
+        )
+
+        elapsed = time.perf_counter() - sweep_start
+        sweep_seconds.observe(elapsed)
+        stats["duration_seconds"] = round(elapsed, 4)
+        stats["push"] = self.push_totals(since=pushes_before)
+        return stats
+
+    def run_maintenance(self):
+        """
+        Run each maintenance job once; a failing job does not stop the others.
+        Returns ``{job: rows removed}`` for the jobs that finished.
+        """
+        removed = {}
+        for job, func in MAINTENANCE_JOBS.items():
+            try:
+                removed[job] = func()
+            except Exception:
+                logger.exception("Maintenance job failed", extra={"job": job})
+                continue
+            maintenance_rows_total.inc(removed[job], job=job)
+            if removed[job]:
+                logger.info("Maintenance job finished", extra={"job": job, "rows": removed[job]})
+        logger.info("Maintenance pass finished", extra={"rows": removed})
+        return removed
+
+    def run_bucket(self, options):
+        """
+        Pre-fetch every row that becomes due before the bucket ends and work
+        through it at the planned times, then wait for the next bucket.
+        """
+        bucket_start = timezone.now()
+        bucket_end = bucket_start + timedelta(seconds=options["bucket_seconds"])
+        due_before = bucket_end - GRACE_PERIOD
+        pushes_before = self.push_totals()
+
+        events = AlarmEvent.objects.filter(
+            status=AlarmEvent.Status.RINGING, created_at__lt=due_before
+        ).values_list("id", "created_at")
+        alarms = Alarm.objects.filter(
+            is_active=True, next_trigger_utc__lt=due_before
+        ).values_list("id", "next_trigger_utc")
+        items = [(created_at + GRACE_PERIOD, "expire_ringing", pk) for pk, created_at in events]
+        items += [(trigger + GRACE_PERIOD, "catch_missed", pk) for pk, trigger in alarms]
 
-        for alarm_id in missed_alarm_ids:
-            with transaction.atomic():
-                alarm = (
-                    Alarm.objects.select_for_update(of=("self",))
-                    .select_related("group", "user")
-                    .filter(id=alarm_id)
-                    .first()
+        plan, overrides = plan_work(
+            items,
+            now=bucket_start,
+            spread_seconds=options["spread_seconds"],
+            max_rate=options["max_rate"],
+            sla_seconds=options["sla_seconds"],
+        )
+        rate_overrides_total.inc(overrides)
+
+        backlog = {phase: 0 for phase in PHASES}
+        claimed = {phase: 0 for phase in PHASES}
+        work = {phase: 0.0 for phase in PHASES}
+        for item in plan:
+            backlog[item.kind] += 1
+        for phase in PHASES:
+            bucket_rows.set(backlog[phase], phase=phase)
+
+        for item in plan:
+            self.sleep_until(item.planned_at)
+            started = time.perf_counter()
+            if item.kind == "expire_ringing":
+                claimed[item.kind] += self.expire_event(item.key)
+            else:
+                claimed[item.kind] += self.catch_missed_alarm(item.key, timezone.now())
+            work[item.kind] += time.perf_counter() - started
+
+        stats = {
+            "started_at": bucket_start.isoformat(),
+            "phases": {
+                phase: self.record_phase(phase, work[phase], backlog[phase], claimed[phase])
+                for phase in PHASES
+            },
+            "duration_seconds": round(sum(work.values()), 4),
+            "rate_overrides": overrides,
+            "push": self.push_totals(since=pushes_before),
+        }
+        sweep_seconds.observe(sum(work.values()))
+
+        self.sleep_until(bucket_end)
+        return stats
+
+    def sleep_until(self, moment):
+        """Wait for ``moment``, handling time-critical work every poll interval meanwhile."""
+        while True:
+            self.poll()
+            delay = (moment - timezone.now()).total_seconds()
+            if delay <= 0:
+                return
+            time.sleep(min(delay, self.ring_poll_seconds))
+
+    def poll(self):
+        jobs = [process_due_rings]
+        if self.server_ring:
+            jobs.insert(0, self.fire_due_alarms)
+        for job in jobs:
+            try:
+                job()
+            except Exception:
+                logger.exception("Scheduler poll job failed", extra={"job": job.__name__})
+
+    def start_email_worker(self):
+        """
+        Send queued email on a daemon thread. SMTP sends can take seconds each,
+        so they stay off the loop that delivers rings and fires alarms.
+        """
+        thread = threading.Thread(target=self.run_email_worker, name="email-worker", daemon=True)
+        thread.start()
+        return thread
+
+    def run_email_worker(self):
+        while True:
+            if not self.send_emails():
+                time.sleep(self.ring_poll_seconds)
+
+    def send_emails(self):
+        close_old_connections()
+        try:
+            return process_due_emails()
+        except Exception:
+            logger.exception("Scheduler email job failed")
+            return 0
+
+    # ==========================================
+    # Row transitions
+    # ==========================================
+
+    def expire_event(self, event_id, now=None):
+        threshold = (now or timezone.now()) - GRACE_PERIOD
+        event = (
+            AlarmEvent.objects.filter(
+                id=event_id, status=AlarmEvent.Status.RINGING, created_at__lte=threshold
+            )
+            .values("alarm_id", "created_at", "user_id")
+            .first()
+        )
+        if not event:
+            return False
+
+        # Compare-and-set against a racing check-in; whoever flips the status first wins.
+        # The threshold is checked again so a row planned early is never expired early.
+        claimed = AlarmEvent.objects.filter(
+            id=event_id, status=AlarmEvent.Status.RINGING, created_at__lte=threshold
+        ).update(status=AlarmEvent.Status.EXPIRED)
+        if not claimed:
+            return False
+        invalidate_events([event["alarm_id"]])
+
+        self.record_lateness("expire_ringing", event["created_at"] + GRACE_PERIOD)
+        logger.info(
+            "Reaped abandoned event",
+            extra={"event_id": str(event_id), "user_id": str(event["user_id"])},
+        )
+        self.notify_group(str(event_id))
+        return True
+
+    def fire_due_alarms(self, now=None):
+        """
+        Server-driven ring: start RINGING events for alarms whose trigger has
+        passed, in batches. Alarms already past the grace period are left to
+        the dead-phone sweep.
+        """
+        now = now or timezone.now()
+        fired = 0
+        while True:
+            alarms = list(
+                Alarm.objects.select_related("user")
+                .filter(
+                    is_active=True,
+                    next_trigger_utc__lte=now,
+                    next_trigger_utc__gt=now - GRACE_PERIOD,
+                )
+                .order_by("next_trigger_utc")[:FIRE_BATCH_SIZE]
+            )
+            if not alarms:
+                return fired
+            created, advanced = self.fire_alarms(alarms, now)
+            fired += created
+            # Rows that couldn't be advanced are still due; fetching again would return them forever.
+            if len(alarms) < FIRE_BATCH_SIZE or not (created or advanced):
+                return fired
+
+    def fire_alarms(self, alarms, now):
+        """Fire and advance ``alarms``; returns ``(events created, alarms advanced)``."""
+        due = {alarm.id: alarm.next_trigger_utc for alarm in alarms}
+        for alarm in alarms:
+            alarm.updated_at = now
+            if alarm.is_one_time:
+                alarm.is_active, alarm.next_trigger_utc = False, None
+            else:
+                alarm.next_trigger_utc = self.next_trigger_after(alarm, due[alarm.id], now)
+        # One that wouldn't move forward is left alone rather than rung on every poll.
+        alarms = [alarm for alarm in alarms if alarm.is_one_time or alarm.next_trigger_utc]
+        if not alarms:
+            return 0, 0
+
+        with transaction.atomic():
+            # Advance each alarm only if it is still the one read above; an owner's
+            # edit or deactivation in the meantime wins, and that alarm isn't rung.
+            alarms = [
+                alarm
+                for alarm in alarms
+                if Alarm.objects.filter(
+                    id=alarm.id, is_active=True, next_trigger_utc=due[alarm.id]
+                ).update(
+                    is_active=alarm.is_active,
+                    next_trigger_utc=alarm.next_trigger_utc,
+                    updated_at=alarm.updated_at,
                 )
+            ]
+            if not alarms:
+                return 0, 0
+            alarms_by_id = {alarm.id: alarm for alarm in alarms}
+            events = [AlarmEvent(alarm=alarm, user_id=alarm.user_id) for alarm in alarms]
+            # A phone that rang first already holds the alarm's one RINGING slot;
+            # those inserts are skipped and it keeps its own event and push.
+            AlarmEvent.objects.bulk_create(events, ignore_conflicts=True)
+            invalidate_events(alarms_by_id)
+            invalidate_groups({alarm.group_id for alarm in alarms})
+            created = set(
+                AlarmEvent.objects.filter(id__in=[event.id for event in events]).values_list(
+                    "id", flat=True
+                )
+            )
+
+        for event in events:
+            if event.id not in created:
+                continue
+            alarm = alarms_by_id[event.alarm_id]
+            self.record_lateness("fire", due[alarm.id])
+            data_payload = {
+                "event_id": str(event.id),
+                "alarm_id": str(alarm.id),
+                "created_at": event.created_at.isoformat(),
+            }
+            send_group_fanout(
+                alarm.group_id, Actions.RINGING, data_payload, exclude_user_id=alarm.user_id
+            )
+
+        rows_claimed_total.inc(len(created), phase="fire")
+        return len(created), len(alarms)
+
+    def next_trigger_after(self, alarm, due, now):
+        """
+        The repeating alarm's next occurrence after the one due at ``due``, or
+        ``None`` if it wouldn't move forward; advancing to the same instant
+        would have the alarm caught or fired again on every pass.
+        """
+        next_trigger = alarm.calculate_next_trigger(now_override=now + timedelta(minutes=2))
+        if next_trigger is None or next_trigger <= due:
+            logger.error(
+                "Alarm trigger did not advance",
+                extra={"alarm_id": str(alarm.id), "due": due.isoformat()},
+            )
+            return None
+        return next_trigger
+
+    def catch_missed_alarm(self, alarm_id, now):
+        threshold = now - GRACE_PERIOD
+        alarm = (
+            Alarm.objects.select_related("user")
+            .filter(id=alarm_id, is_active=True, next_trigger_utc__lte=threshold)
+            .first()
+        )
+        if not alarm:
+            return False
+
+        due = alarm.next_trigger_utc
+        if alarm.is_one_time:
+            changes = {"is_active": False, "next_trigger_utc": None, "updated_at": now}
+        else:
+            next_trigger = self.next_trigger_after(alarm, due, now)
+            if next_trigger is None:
+                return False
+            changes = {"next_trigger_utc": next_trigger, "updated_at": now}
+
+        with transaction.atomic():
+            # Only advance the alarm if a late ring hasn't already moved it on.
+            claimed = Alarm.objects.filter(
+                id=alarm.id, is_active=True, next_trigger_utc=due
+            ).update(**changes)
+            if not claimed:
+                return False
+            invalidate_groups([alarm.group_id])
 
-                if not alarm:
-                    continue
+            event = AlarmEvent.objects.create(
+                alarm=alarm, user_id=alarm.user_id, status=AlarmEvent.Status.EXPIRED
+            )
+            transaction.on_commit(
+                lambda event_id=str(event.id): self.notify_group(event_id)
+            )
 
-                if (
-                    alarm.is_active
-                    and alarm.next_trigger_utc
-                    and alarm.next_trigger_utc <= threshold
-                ):
-                    event = AlarmEvent.objects.create(
-                        alarm=alarm, user=alarm.user, status=AlarmEvent.Status.EXPIRED
-                    )
+        self.record_lateness("catch_missed", due + GRACE_PERIOD)
+        logger.info(
+            "Caught dead phone",
+            extra={"alarm_id": str(alarm.id), "user_id": str(alarm.user_id)},
+        )
+        return True
 
-                    if alarm.is_one_time:
-                        alarm.is_active = False
-                    else:
-                        alarm.next_trigger_utc = alarm.calculate_next_trigger(
-                            now_override=now + timedelta(minutes=2)
-                        )
+    # ==========================================
+    # Reporting
+    # ==========================================
 
-                    alarm.save(update_fields=["is_active", "next_trigger_utc"])
+    def push_totals(self, since=None):
+        totals = {
+            outcome: push_outcomes_total.value(outcome=outcome)
+            for outcome in ("sent", "failed")
+        }
+        if since:
+            totals = {outcome: totals[outcome] - since[outcome] for outcome in totals}
+        return totals
+
+    def record_phase(self, phase, elapsed, backlog, claimed):
+        phase_seconds.observe(elapsed, phase=phase)
+        backlog_depth.set(backlog, phase=phase)
+        rows_claimed_total.inc(claimed, phase=phase)
+
+        lateness = sorted(self.sweep_lateness[phase])
+        self.sweep_lateness[phase] = []
+        return {
+            "duration_seconds": round(elapsed, 4),
+            "backlog": backlog,
+            "claimed": claimed,
+            "lateness_p50": _quantile(lateness, 0.5),
+            "lateness_p99": _quantile(lateness, 0.99),
+            "lateness_observations": len(lateness),
+        }
 
-                    print(f"[{now}] Caught dead phone for {alarm.user.display_name}")
+    def record_lateness(self, phase, due_at):
+        lateness = max((timezone.now() - due_at).total_seconds(), 0.0)
+        lateness_seconds.observe(lateness, phase=phase)
+        if phase in self.sweep_lateness:
+            self.sweep_lateness[phase].append(lateness)
+
+    def write_stats(self, path, stats):
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as fh:
+            json.dump(stats, fh, indent=2)
+        os.replace(fh.name, path)
+
+    def format_report(self, stats):
+        lines = [f"Sweep at {stats['started_at']} took {stats['duration_seconds']:.3f}s"]
+        for phase in PHASES:
+            phase_stats = stats["phases"][phase]
+            p50, p99 = phase_stats["lateness_p50"], phase_stats["lateness_p99"]
+            lines.append(
+                f"  {phase:<15} {phase_stats['duration_seconds']:.3f}s"
+                f"  backlog={phase_stats['backlog']}  claimed={phase_stats['claimed']}"
+                f"  lateness p50={'-' if p50 is None else f'{p50:.1f}s'}"
+                f" p99={'-' if p99 is None else f'{p99:.1f}s'}"
+            )
+        if stats.get("rate_overrides"):
+            lines.append(f"  rate limit overridden for {stats['rate_overrides']} rows to hold the SLA")
+        lines.append(
+            f"  pushes sent={stats['push']['sent']} failed={stats['push']['failed']}"
+        )
+        return "\n".join(lines)
+
+    def format_occupancy(self, hours, bucket_seconds, top=20):
+        now = timezone.now()
+        due_times = Alarm.objects.filter(
+            is_active=True,
+            next_trigger_utc__gte=now,
+            next_trigger_utc__lt=now + timedelta(hours=hours),
+        ).values_list("next_trigger_utc", flat=True)
+        occupancy = bucket_occupancy(due_times, bucket_seconds)
+        if not occupancy:
+            return f"No active alarms due in the next {hours:g}h."
 
-                    transaction.on_commit(
-                        lambda event_id=str(event.id): self.notify_group(event_id)
-                    )
+        total = sum(occupancy.values())
+        peak = max(occupancy.values())
+        lines = [
+            f"{total} triggers in the next {hours:g}h across {len(occupancy)} "
+            f"{bucket_seconds:g}s buckets (peak {peak}, mean {total / len(occupancy):.1f})",
+        ]
+        for start, count in occupancy.most_common(top):
+            bar = "#" * max(1, round(40 * count / peak))
+            lines.append(f"  {start:%Y-%m-%d %H:%M:%S} {count:>6}  {bar}")
+        return "\n".join(lines)
 
     def notify_group(self, event_id):
         try:
@@ -112,6 +668,7 @@ class Command(BaseCommand):
             "alarm_id": str(event.alarm.id),
         }
 
-        send_group_push(
-            event.alarm.group.members.all(), Actions.EXPIRED, data_payload, silent=False
+        sent = send_group_fanout(
+            event.alarm.group_id, Actions.EXPIRED, data_payload, silent=False
         )
+        push_outcomes_total.inc(outcome="sent" if sent else "failed")
@@ -0,0 +1,121 @@
+import gzip
+import json
+import time
+from datetime import time as Time
+from datetime import timedelta
+
+from alarms.api import ALARM_FIELDS
+from alarms.models import Alarm, Group
+from alarms.schemas import AlarmOut
+from core import renderers
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
+from pydantic import TypeAdapter
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the cost of fetching and rendering an alarm list through the response "
+        "schema and stdlib JSON against .values() rows and the fast renderer, per 1k rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Alarms in the list.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per pipeline.")
+        parser.add_argument("--json", action="store_true", help="Emit the report as JSON.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options["rows"])
+            report = self.run_pipelines(options["rows"], options["repeat"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(self.format_report(report))
+
+    def seed(self, rows):
+        user = User.objects.create(username="bench", email="bench@example.com", display_name="Bench")
+        group = Group.objects.create(name="Bench group")
+        now = timezone.now()
+        Alarm.objects.bulk_create(
+            Alarm(
+                name=f"Alarm {i}",
+                time=Time(i % 24, i % 60),
+                repeats="Mon,Tue,Wed,Thu,Fri",
+                is_one_time=False,
+                user=user,
+                group=group,
+                next_trigger_utc=now + timedelta(minutes=i),
+            )
+            for i in range(rows)
+        )
+
+    def run_pipelines(self, rows, repeat):
+        schema = TypeAdapter(list[AlarmOut])
+        stdlib = JSONRenderer()
+        pipelines = {
+            "models + schema + json": (
+                lambda: list(Alarm.objects.all()),
+                lambda alarms: stdlib.render(
+                    None,
+                    schema.dump_python(schema.validate_python(alarms, from_attributes=True)),
+                    response_status=200,
+                ).encode(),
+            ),
+            "values + fast json": (lambda: list(Alarm.objects.values(*ALARM_FIELDS)), renderers.dumps),
+        }
+        if renderers.msgspec is not None:
+            pipelines["values + msgpack"] = (
+                lambda: list(Alarm.objects.values(*ALARM_FIELDS)),
+                lambda values: renderers.msgspec.msgpack.encode(values, enc_hook=renderers._default),
+            )
+
+        per_1k = 1000 / rows
+        report = {
+            "rows": rows,
+            "encoder": "orjson" if renderers.orjson is not None else "json",
+            "pipelines": [],
+        }
+        for name, (fetch, render) in pipelines.items():
+            fetch_s = render_s = 0.0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                data = fetch()
+                fetched = time.perf_counter()
+                body = render(data)
+                render_s += time.perf_counter() - fetched
+                fetch_s += fetched - started
+            report["pipelines"].append(
+                {
+                    "pipeline": name,
+                    "fetch_ms_per_1k": fetch_s / repeat * 1000 * per_1k,
+                    "render_ms_per_1k": render_s / repeat * 1000 * per_1k,
+                    "bytes": len(body),
+                    "gzip_bytes": len(gzip.compress(body)),
+                }
+            )
+        return report
+
+    def format_report(self, report):
+        lines = [
+            f"{report['rows']} alarms, fast renderer using {report['encoder']}",
+            "",
+            f"{'pipeline':<24} {'fetch ms/1k':>12} {'render ms/1k':>13} {'bytes':>9} {'gzip':>8}",
+        ]
+        for row in report["pipelines"]:
+            lines.append(
+                f"{row['pipeline']:<24} {row['fetch_ms_per_1k']:>12.2f} {row['render_ms_per_1k']:>13.2f}"
+                f" {row['bytes']:>9} {row['gzip_bytes']:>8}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-19 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alarms', '0003_remove_silenced_state'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alarm',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_trigger_utc', 'id'], name='alarm_active_trigger_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alarmevent',
+            index=models.Index(fields=['alarm', 'status', 'created_at'], name='event_alarm_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alarmevent',
+            index=models.Index(condition=models.Q(('status', 'RINGING')), fields=['created_at', 'id'], name='event_ringing_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manualring',
+            index=models.Index(fields=['alarm', 'created_at'], name='manualring_alarm_created_idx'),
+        ),
+    ]
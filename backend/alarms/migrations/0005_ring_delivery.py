@@ -0,0 +1,61 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def close_legacy_rings(apps, schema_editor):
+    # Rings created before the pipeline were sent synchronously; never pick them up.
+    ManualRing = apps.get_model("alarms", "ManualRing")
+    ManualRing.objects.update(status="DELIVERED", attempts=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alarms', '0004_scheduler_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manualring',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='delivered_devices',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='last_error',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='stage',
+            field=models.CharField(choices=[('CRITICAL', 'critical'), ('REPEAT', 'repeat'), ('GROUP_NOTIFIED', 'group_notified')], default='CRITICAL', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='manualring',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'pending'), ('DELIVERED', 'delivered'), ('FAILED', 'failed'), ('CANCELLED', 'cancelled')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='manualring',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['next_attempt_at'], name='manualring_pending_idx'),
+        ),
+        migrations.RunPython(close_legacy_rings, migrations.RunPython.noop),
+    ]
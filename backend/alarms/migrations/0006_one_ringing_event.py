@@ -0,0 +1,33 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def expire_duplicate_ringing(apps, schema_editor):
+    # Keep only the newest RINGING event per alarm; older ones would have been reaped anyway.
+    AlarmEvent = apps.get_model("alarms", "AlarmEvent")
+    ringing = AlarmEvent.objects.filter(status="RINGING")
+    seen = set()
+    stale = []
+    for event_id, alarm_id in ringing.order_by("alarm_id", "-created_at").values_list("id", "alarm_id"):
+        if alarm_id in seen:
+            stale.append(event_id)
+        seen.add(alarm_id)
+    AlarmEvent.objects.filter(id__in=stale).update(status="EXPIRED")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alarms', '0005_ring_delivery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(expire_duplicate_ringing, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alarmevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'RINGING')), fields=('alarm',), name='event_one_ringing_per_alarm'),
+        ),
+    ]
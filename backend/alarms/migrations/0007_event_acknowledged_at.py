@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alarms', '0006_one_ringing_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alarmevent',
+            name='acknowledged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alarms', '0008_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_events', models.PositiveIntegerField(default=0)),
+                ('on_time_checkins', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='alarmevent',
+            index=models.Index(fields=['created_at'], name='event_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='alarmeventrollup',
+            name='alarm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_rollups', to='alarms.alarm'),
+        ),
+        migrations.AddField(
+            model_name='alarmeventrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='alarmeventrollup',
+            constraint=models.UniqueConstraint(fields=('alarm', 'user', 'day'), name='rollup_alarm_user_day'),
+        ),
+    ]
@@ -4,7 +4,7 @@ from users.models import User
 import uuid
 from datetime import datetime, timedelta
 from django.utils import timezone
-from django.db.models.signals import pre_delete, post_save
+from django.db.models.signals import m2m_changed, pre_delete, post_save
 from django.dispatch import receiver
 from django.db.models import Count
 
@@ -32,6 +32,23 @@ class Group(models.Model):
     members = models.ManyToManyField(User, related_name="group_members")
     icon = models.CharField(max_length=20, default="people")
 
+    # Also bumped when membership changes; see touch_groups_on_membership_change.
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def touch_groups_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        groups = Group.objects.filter(pk=instance.pk)
+    elif pk_set:
+        groups = Group.objects.filter(pk__in=pk_set)
+    else:
+        groups = Group.objects.filter(members=instance)
+    groups.update(updated_at=timezone.now())
+
+
 class Alarm(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=100)
@@ -47,6 +64,18 @@ class Alarm(models.Model):
 
     next_trigger_utc = models.DateTimeField(null=True, blank=True, db_index=True)
 
+    # auto_now doesn't apply to QuerySet.update() or bulk_update(); set it there explicitly.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_trigger_utc", "id"],
+                condition=models.Q(is_active=True),
+                name="alarm_active_trigger_idx",
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.is_active:
             self.next_trigger_utc = self.calculate_next_trigger()
@@ -55,7 +84,7 @@ class Alarm(models.Model):
 
         if "update_fields" in kwargs:
             update_fields = set(kwargs["update_fields"])
-            update_fields.add("next_trigger_utc")
+            update_fields.update(("next_trigger_utc", "updated_at"))
             kwargs["update_fields"] = list(update_fields)
 
         super().save(*args, **kwargs)
@@ -67,7 +96,7 @@ class Alarm(models.Model):
         except ZoneInfoNotFoundError:
             user_tz = ZoneInfo("UTC")
 
-        now_user_time = now_override if now_override else timezone.now().astimezone(user_tz)
+        now_user_time = (now_override or timezone.now()).astimezone(user_tz)
         naive_target = datetime.combine(now_user_time.date(), self.time)
 
         target_time_today = timezone.make_aware(naive_target, timezone=user_tz)
@@ -106,6 +135,8 @@ class AlarmEvent(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.RINGING)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
     checked_in_at = models.DateTimeField(null=True, blank=True)
+    # When the owner's phone reported ringing; null for server-fired events it never confirmed.
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
 
     sound_filename = models.CharField(max_length=255, default="default_chime.wav")
 
@@ -115,11 +146,73 @@ class AlarmEvent(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["alarm", "-created_at"]),
+            models.Index(fields=["alarm", "status", "created_at"], name="event_alarm_status_idx"),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status="RINGING"),
+                name="event_ringing_created_idx",
+            ),
+            models.Index(fields=["created_at"], name="event_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["alarm"],
+                condition=models.Q(status="RINGING"),
+                name="event_one_ringing_per_alarm",
+            ),
+        ]
+
+
+# A check-in within this long of the event counts as on time on the leaderboard.
+ON_TIME_WINDOW = timedelta(minutes=5)
+
+
+class AlarmEventRollup(models.Model):
+    """Daily (UTC) event counts per alarm, kept after old events are deleted."""
+
+    alarm = models.ForeignKey(Alarm, on_delete=models.CASCADE, related_name="event_rollups")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    total_events = models.PositiveIntegerField(default=0)
+    on_time_checkins = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["alarm", "user", "day"], name="rollup_alarm_user_day"),
         ]
 
 
 class ManualRing(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "pending"
+        DELIVERED = "DELIVERED", "delivered"
+        FAILED = "FAILED", "failed"
+        CANCELLED = "CANCELLED", "cancelled"
+
+    class Stage(models.TextChoices):
+        CRITICAL = "CRITICAL", "critical"
+        REPEAT = "REPEAT", "repeat"
+        GROUP_NOTIFIED = "GROUP_NOTIFIED", "group_notified"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     alarm = models.ForeignKey(Alarm, on_delete=models.CASCADE, related_name="manual_rings")
     ringer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="rings_sent")
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    stage = models.CharField(max_length=20, choices=Stage.choices, default=Stage.CRITICAL)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    delivered_devices = models.PositiveSmallIntegerField(default=0)
+    last_error = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["alarm", "created_at"], name="manualring_alarm_created_idx"),
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="PENDING"),
+                name="manualring_pending_idx",
+            ),
+        ]
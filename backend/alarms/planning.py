@@ -0,0 +1,70 @@
+"""
+Time-bucket planning for scheduler work.
+
+Alarms cluster on exact minutes, so the rows the reaper must act on become due
+in the same second. Instead of processing them as one burst, the scheduler
+pre-fetches everything due in the next bucket and assigns each row a planned
+time: rows sharing a due second are spread evenly across a jitter window, the
+overall pace is held under a work rate, and no row is planned later than its
+SLA deadline.
+"""
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+@dataclass(frozen=True)
+class PlannedItem:
+    planned_at: datetime
+    due_at: datetime
+    kind: str
+    key: object
+
+
+def plan_work(items, now, spread_seconds, max_rate, sla_seconds):
+    """
+    Plan ``items`` — ``(due_at, kind, key)`` tuples — for execution.
+
+    Overdue rows are treated as due ``now``. Returns ``(plan, overrides)`` where
+    ``plan`` is sorted by ``planned_at`` and ``overrides`` counts rows whose
+    rate-limited slot would have missed the SLA deadline and were pulled in.
+    """
+    clusters = defaultdict(list)
+    for due_at, kind, key in items:
+        effective_due = max(due_at, now)
+        if effective_due.microsecond:
+            # Round up: a row must never be planned before it is due.
+            effective_due = effective_due.replace(microsecond=0) + timedelta(seconds=1)
+        clusters[effective_due].append((due_at, kind, key))
+
+    targets = []
+    for cluster_due, members in clusters.items():
+        step = spread_seconds / len(members)
+        for rank, (due_at, kind, key) in enumerate(sorted(members, key=lambda m: str(m[2]))):
+            targets.append((cluster_due + timedelta(seconds=rank * step), due_at, kind, key))
+    targets.sort(key=lambda t: t[0])
+
+    interval = timedelta(seconds=1 / max_rate) if max_rate else timedelta(0)
+    plan, overrides, previous = [], 0, None
+    for target, due_at, kind, key in targets:
+        planned = target if previous is None else max(target, previous + interval)
+        deadline = max(due_at, now) + timedelta(seconds=sla_seconds)
+        if planned > deadline:
+            planned = deadline
+            overrides += 1
+        plan.append(PlannedItem(planned, due_at, kind, key))
+        previous = planned
+
+    plan.sort(key=lambda item: item.planned_at)
+    return plan, overrides
+
+
+def bucket_occupancy(due_times, bucket_seconds):
+    """Count ``due_times`` per bucket, keyed by each bucket's start."""
+    counts = Counter()
+    for due_at in due_times:
+        epoch = due_at.timestamp()
+        start = epoch - (epoch % bucket_seconds)
+        counts[datetime.fromtimestamp(start, tz=due_at.tzinfo)] += 1
+    return counts
@@ -0,0 +1,183 @@
+"""
+Manual ring delivery.
+
+``trigger_alarm`` only records a pending ``ManualRing``; the scheduler works
+through due rings here, off the request path. Each attempt takes the next step
+of ``LADDER``: the critical alert with backoff retries, a repeat of it, and
+finally an alert to the rest of the group that the ring could not be
+delivered. The first attempt accepted by any of the target's devices marks
+the ring delivered.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core import metrics
+
+from .enums import Actions
+from .models import AlarmEvent, ManualRing
+from .utils import send_group_fanout, send_ring_push
+
+logger = logging.getLogger(__name__)
+
+Stage = ManualRing.Stage
+
+# (stage, seconds to wait after the previous attempt)
+LADDER = (
+    (Stage.CRITICAL, 0),
+    (Stage.CRITICAL, 2),
+    (Stage.CRITICAL, 5),
+    (Stage.CRITICAL, 15),
+    (Stage.REPEAT, 30),
+    (Stage.REPEAT, 60),
+    (Stage.GROUP_NOTIFIED, 0),
+)
+
+# How long a claimed ring is hidden from other workers; a crashed attempt is retried after it.
+CLAIM_SECONDS = 30
+BATCH_SIZE = 100
+
+attempts_total = metrics.counter(
+    "ringsync_ring_attempts_total", "Manual ring delivery attempts.", ["stage", "outcome"]
+)
+rings_total = metrics.counter(
+    "ringsync_rings_total", "Manual rings by final status.", ["status"]
+)
+delivery_seconds = metrics.histogram(
+    "ringsync_ring_delivery_seconds", "Time from trigger to the first accepted ring push."
+)
+
+
+def process_due_rings(now=None):
+    """Attempt every pending ring that is due; returns the number of attempts made."""
+    now = now or timezone.now()
+    ring_ids = list(
+        ManualRing.objects.filter(status=ManualRing.Status.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at")
+        .values_list("id", flat=True)[:BATCH_SIZE]
+    )
+    return sum(attempt_ring(ring_id) for ring_id in ring_ids)
+
+
+def attempt_ring(ring_id):
+    now = timezone.now()
+    ring = (
+        ManualRing.objects.select_related("alarm__user", "ringer")
+        .filter(id=ring_id, status=ManualRing.Status.PENDING, next_attempt_at__lte=now)
+        .first()
+    )
+    if ring is None:
+        return False
+
+    # Claiming moves next_attempt_at past now, so a worker that read the row
+    # before another's claim matches nothing here.
+    claimed = ManualRing.objects.filter(
+        id=ring.id,
+        status=ManualRing.Status.PENDING,
+        attempts=ring.attempts,
+        next_attempt_at__lte=now,
+    ).update(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+    if not claimed:
+        return False
+
+    if _target_checked_in(ring):
+        _finish(ring, ManualRing.Status.CANCELLED, now)
+        return True
+
+    stage, _ = LADDER[ring.attempts]
+    ring.stage = stage
+    ring.attempts += 1
+
+    if stage == Stage.GROUP_NOTIFIED:
+        outcome = "sent" if _notify_group(ring) else "failed"
+        attempts_total.inc(stage=stage, outcome=outcome)
+        _finish(ring, ManualRing.Status.FAILED, now)
+        return True
+
+    ringer_name = ring.ringer.display_name if ring.ringer else "Someone"
+    try:
+        response = send_ring_push(
+            ring.alarm.user_id, ringer_name, repeat=stage == Stage.REPEAT
+        )
+    except Exception as exc:
+        logger.warning(
+            "Ring push failed", exc_info=True, extra={"ring_id": str(ring.id)}
+        )
+        response, ring.last_error = None, type(exc).__name__
+    else:
+        if response is None:
+            # Nothing to retry against; go straight to telling the group.
+            ring.last_error = "no_devices"
+            ring.attempts = len(LADDER) - 1
+        elif response.success_count:
+            ring.delivered_devices = response.success_count
+            attempts_total.inc(stage=stage, outcome="delivered")
+            delivery_seconds.observe((now - ring.created_at).total_seconds())
+            _finish(ring, ManualRing.Status.DELIVERED, now, delivered_at=now)
+            return True
+        else:
+            ring.last_error = next(
+                type(resp.exception).__name__ for resp in response.responses if resp.exception
+            )
+
+    attempts_total.inc(stage=stage, outcome=ring.last_error)
+    _, delay = LADDER[ring.attempts]
+    ring.next_attempt_at = now + timedelta(seconds=delay)
+    ring.save(update_fields=["stage", "attempts", "next_attempt_at", "last_error"])
+    return True
+
+
+def _target_checked_in(ring):
+    latest = (
+        AlarmEvent.objects.filter(alarm_id=ring.alarm_id)
+        .order_by("-created_at")
+        .values_list("status", flat=True)
+        .first()
+    )
+    return latest == AlarmEvent.Status.CHECKED_IN
+
+
+def _notify_group(ring):
+    target = ring.alarm.user
+    data_payload = {
+        "title": "Ring failed",
+        "body": f"We couldn't reach {target.display_name}'s phone. Try them another way!",
+        "alarm_id": str(ring.alarm_id),
+        "ring_id": str(ring.id),
+    }
+    return send_group_fanout(
+        ring.alarm.group_id,
+        Actions.RING_FAILED,
+        data_payload,
+        exclude_user_id=target.id,
+        silent=False,
+    )
+
+
+def _finish(ring, status, now, delivered_at=None):
+    ring.status = status
+    ring.next_attempt_at = None
+    ring.delivered_at = delivered_at
+    ring.save(
+        update_fields=[
+            "status",
+            "stage",
+            "attempts",
+            "next_attempt_at",
+            "delivered_at",
+            "delivered_devices",
+            "last_error",
+        ]
+    )
+    rings_total.inc(status=status)
+    logger.info(
+        "Manual ring finished",
+        extra={
+            "ring_id": str(ring.id),
+            "status": status,
+            "attempts": ring.attempts,
+            "seconds": round((now - ring.created_at).total_seconds(), 3),
+        },
+    )
@@ -1,6 +1,6 @@
 from typing import Optional
 from ninja import Schema
-from pydantic import field_validator, model_validator
+from pydantic import Field, field_validator, model_validator
 import uuid
 from datetime import time as Time
 from datetime import datetime
@@ -99,6 +99,28 @@ class AlarmUpdate(Schema):
         return self
 
 
+class AlarmBatchUpdate(AlarmUpdate):
+    id: uuid.UUID
+
+
+class AlarmBatchRequest(Schema):
+    create: list[AlarmCreate] = Field(default_factory=list, max_length=50)
+    update: list[AlarmBatchUpdate] = Field(default_factory=list, max_length=50)
+    delete: list[uuid.UUID] = Field(default_factory=list, max_length=50)
+
+
+class AlarmBatchError(Schema):
+    op: str
+    index: int
+    error: str
+
+
+class AlarmBatchOut(Schema):
+    created: list[AlarmOut]
+    updated: list[AlarmOut]
+    deleted: list[uuid.UUID]
+
+
 class AlarmEventOut(Schema):
     id: uuid.UUID
     alarm_id: uuid.UUID
@@ -106,6 +128,7 @@ class AlarmEventOut(Schema):
     status: str
     created_at: datetime
     checked_in_at: Optional[datetime] = None
+    acknowledged_at: Optional[datetime] = None
 
 
 class ManualRingOut(Schema):
@@ -113,12 +136,51 @@ class ManualRingOut(Schema):
     alarm_id: uuid.UUID
     ringer_id: Optional[uuid.UUID] = None
     created_at: datetime
+    status: str
+    stage: str
+    attempts: int
+    delivered_at: Optional[datetime] = None
 
 
 class AddMemberRequest(Schema):
     user_id: uuid.UUID
 
 
+class AddMembersRequest(Schema):
+    user_ids: list[uuid.UUID] = Field(..., min_length=1, max_length=50)
+
+
+class AddMemberResult(Schema):
+    user_id: uuid.UUID
+    status: str
+
+
+class AddMembersOut(Schema):
+    group: GroupOut
+    results: list[AddMemberResult]
+
+
+class BatchCheckInRequest(Schema):
+    alarm_ids: list[uuid.UUID] = Field(default_factory=list, max_length=50)
+    all_ringing: bool = False
+
+    @model_validator(mode="after")
+    def validate_target(self):
+        if bool(self.alarm_ids) == self.all_ringing:
+            raise ValueError("Pass either 'alarm_ids' or 'all_ringing', not both.")
+        return self
+
+
+class CheckInResult(Schema):
+    alarm_id: uuid.UUID
+    status: str
+    event_id: Optional[uuid.UUID] = None
+
+
+class BatchCheckInOut(Schema):
+    results: list[CheckInResult]
+
+
 class LeaderboardEntry(Schema):
     user_id: uuid.UUID
     display_name: str
@@ -1,3 +1,1317 @@
-from django.test import TestCase
+import gzip
+import json
+import threading
+import uuid
+from importlib import import_module
+from unittest import mock
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from ninja.renderers import JSONRenderer
+from users.maintenance import purge_inactive_devices
+from users.models import AuthToken, Friendship, User, UserDevice
+from users.profiles import profiles
+
+from . import fanout, lookups, rings
+from .management.commands.scheduler import Command as SchedulerCommand
+from .management.commands.scheduler import lateness_seconds
+from .utils import record_delivery
+from .coalesce import PushCoalescer, pushes_saved_total
+from .enums import Actions
+from .maintenance import compact_alarm_events, purge_manual_rings
+from .models import Alarm, AlarmEvent, AlarmEventRollup, Group, ManualRing
+from .planning import bucket_occupancy, plan_work
+from .schemas import AlarmOut
+
+
+class SchedulerIndexTests(TestCase):
+    """The reaper and state-machine queries must stay on their indexes as history grows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.group = Group.objects.create(name="Morning")
+        cls.group.members.add(cls.user)
+        cls.alarm = Alarm.objects.create(
+            name="Wake", time=time(7, 0), is_one_time=True, user=cls.user, group=cls.group
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f"Expected {index_name} in plan:\n{plan}")
+
+    def test_reaper_ringing_events_use_partial_index(self):
+        threshold = timezone.now() - timedelta(minutes=5)
+        qs = AlarmEvent.objects.filter(
+            status=AlarmEvent.Status.RINGING, created_at__lte=threshold
+        ).values_list("id", flat=True)
+        self.assertUsesIndex(qs, "event_ringing_created_idx")
+
+    def test_reaper_missed_alarms_use_partial_index(self):
+        threshold = timezone.now() - timedelta(minutes=5)
+        qs = Alarm.objects.filter(
+            is_active=True, next_trigger_utc__lte=threshold
+        ).values_list("id", flat=True)
+        self.assertUsesIndex(qs, "alarm_active_trigger_idx")
+
+    def test_ring_existing_event_lookup_uses_composite_index(self):
+        qs = AlarmEvent.objects.filter(
+            alarm=self.alarm,
+            created_at__gte=timezone.now() - timedelta(minutes=2),
+            status=AlarmEvent.Status.RINGING,
+        )
+        self.assertUsesIndex(qs, "event_alarm_status_idx")
+
+    def test_manual_ring_cooldown_uses_composite_index(self):
+        qs = ManualRing.objects.filter(
+            alarm=self.alarm, created_at__gte=timezone.now() - timedelta(seconds=10)
+        )
+        self.assertUsesIndex(qs, "manualring_alarm_created_idx")
+
+
+class PlanWorkTests(SimpleTestCase):
+    now = datetime(2026, 1, 5, 12, 0, tzinfo=dt_timezone.utc)
+
+    def test_same_second_cluster_is_spread_across_window(self):
+        due = self.now + timedelta(seconds=10)
+        items = [(due, "catch_missed", i) for i in range(10)]
+
+        plan, overrides = plan_work(items, self.now, spread_seconds=20, max_rate=0, sla_seconds=60)
+
+        offsets = [(p.planned_at - due).total_seconds() for p in plan]
+        self.assertEqual(offsets, [i * 2.0 for i in range(10)])
+        self.assertEqual(overrides, 0)
+
+    def test_rows_due_mid_second_are_never_planned_early(self):
+        due = self.now + timedelta(seconds=10, microseconds=400_000)
+
+        plan, _ = plan_work([(due, "expire_ringing", "row")], self.now, 0, 0, 60)
+
+        self.assertEqual(plan[0].planned_at, self.now + timedelta(seconds=11))
+
+    def test_rate_limit_never_pushes_past_sla(self):
+        items = [(self.now, "expire_ringing", i) for i in range(100)]
+
+        plan, overrides = plan_work(items, self.now, spread_seconds=0, max_rate=1, sla_seconds=30)
+
+        self.assertTrue(all(p.planned_at <= self.now + timedelta(seconds=30) for p in plan))
+        self.assertEqual(overrides, 69)
+
+    def test_overdue_rows_are_planned_from_now(self):
+        items = [(self.now - timedelta(minutes=3), "catch_missed", "late")]
+
+        plan, _ = plan_work(items, self.now, spread_seconds=10, max_rate=5, sla_seconds=60)
+
+        self.assertEqual(plan[0].planned_at, self.now)
+
+    def test_bucket_occupancy_groups_by_bucket_start(self):
+        times = [self.now, self.now + timedelta(seconds=5), self.now + timedelta(seconds=65)]
+
+        occupancy = bucket_occupancy(times, 60)
+
+        self.assertEqual(occupancy[self.now], 2)
+        self.assertEqual(occupancy[self.now + timedelta(minutes=1)], 1)
+
+
+class GroupFanoutCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name
+            )
+            for name in ("alice", "bob", "carol")
+        ]
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.alice, cls.bob)
+        UserDevice.objects.create(user=cls.alice, push_token="alice-1", device_type="ios")
+        UserDevice.objects.create(user=cls.bob, push_token="bob-1", device_type="android")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fanout_is_served_from_cache(self):
+        self.assertEqual(fanout.group_tokens(self.group.id, exclude_user_id=self.alice.id), ["bob-1"])
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(fanout.group_tokens(self.group.id)), ["alice-1", "bob-1"])
+
+    def test_device_registration_and_deactivation_invalidate(self):
+        fanout.group_tokens(self.group.id)
+        device = UserDevice.objects.create(user=self.bob, push_token="bob-2", device_type="ios")
+        self.assertIn("bob-2", fanout.group_tokens(self.group.id))
+
+        device.is_active = False
+        device.save()
+        self.assertNotIn("bob-2", fanout.group_tokens(self.group.id))
+
+    def test_invalidation_is_repeated_on_commit(self):
+        device = UserDevice.objects.get(push_token="bob-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            device.is_active = False
+            device.save()
+            # A read racing the write caches what it sees before the commit.
+            fanout.group_tokens(self.group.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(fanout.group_tokens(self.group.id), ["alice-1"])
+
+    def test_membership_changes_invalidate_from_either_side(self):
+        UserDevice.objects.create(user=self.carol, push_token="carol-1", device_type="ios")
+        fanout.group_tokens(self.group.id)
+
+        self.carol.group_members.add(self.group)
+        self.assertIn("carol-1", fanout.group_tokens(self.group.id))
+
+        self.group.members.remove(self.carol)
+        self.assertNotIn("carol-1", fanout.group_tokens(self.group.id))
+
+
+def _batch(*exceptions_):
+    return messaging.BatchResponse(
+        [messaging.SendResponse(None if exc else {"name": "ok"}, exc) for exc in exceptions_]
+    )
+
+
+@mock.patch("alarms.api.send_token_push")
+@mock.patch("alarms.api.send_group_push")
+class AddMembersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.member, cls.friend, cls.stranger = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name
+            )
+            for name in ("owner", "member", "friend", "stranger")
+        ]
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.owner, cls.member)
+        for user in (cls.member, cls.friend):
+            Friendship.objects.create(
+                from_user=cls.owner, to_user=user, status=Friendship.Status.ACCEPTED
+            )
+        for user in (cls.owner, cls.member, cls.friend):
+            UserDevice.objects.create(user=user, push_token=f"{user.username}-1", device_type="ios")
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, caller, *users):
+        return self.client.post(
+            f"/api/alarms/group/{self.group.id}/add-members/",
+            {"user_ids": [str(getattr(user, "id", user)) for user in users]},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {AuthToken.objects.create(user=caller).id}",
+        )
+
+    def test_non_member_is_rejected(self, group_push, token_push):
+        response = self.add(self.friend, self.friend)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(self.group.members.filter(id=self.friend.id).exists())
+        group_push.assert_not_called()
+        token_push.assert_not_called()
+
+    def test_reports_a_result_per_user(self, group_push, token_push):
+        unknown = uuid.uuid4()
+
+        response = self.add(self.owner, self.friend, self.member, self.stranger, unknown)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result["user_id"], result["status"]) for result in response.json()["results"]],
+            [
+                (str(self.friend.id), "added"),
+                (str(self.member.id), "already_member"),
+                (str(self.stranger.id), "not_friend"),
+                (str(unknown), "not_found"),
+            ],
+        )
+        self.assertEqual(
+            set(self.group.members.values_list("id", flat=True)),
+            {self.owner.id, self.member.id, self.friend.id},
+        )
+
+    def test_only_existing_members_get_the_joined_push(self, group_push, token_push):
+        self.add(self.owner, self.friend)
+
+        group_push.assert_called_once()
+        self.assertEqual(group_push.call_args.kwargs["users"], [self.friend])
+        token_push.assert_called_once()
+        self.assertEqual(token_push.call_args.args[0], ["member-1"])
+        self.assertEqual(token_push.call_args.args[1], Actions.GROUP_MEMBER_JOINED)
+
+    def test_member_cache_follows_the_add(self, group_push, token_push):
+        self.assertEqual(lookups.member_ids(self.group.id), {self.owner.id, self.member.id})
+
+        self.add(self.owner, self.friend)
+
+        self.assertEqual(
+            lookups.member_ids(self.group.id), {self.owner.id, self.member.id, self.friend.id}
+        )
+        self.assertIn("friend-1", fanout.group_tokens(self.group.id))
+
+
+@override_settings(PUSH_MAX_CONSECUTIVE_FAILURES=3, PUSH_DEVICE_PURGE_DAYS=30)
+class DeviceHealthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="dana", email="dana@example.com", password="pw", display_name="dana"
+        )
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.good = UserDevice.objects.create(user=self.user, push_token="good", device_type="ios")
+        self.flaky = UserDevice.objects.create(user=self.user, push_token="flaky", device_type="ios")
+
+    def test_failure_streak_disables_device_and_success_resets(self):
+        mismatch = messaging.SenderIdMismatchError("wrong sender")
+        for _ in range(2):
+            record_delivery(["good", "flaky"], _batch(None, mismatch))
+        self.flaky.refresh_from_db()
+        self.assertEqual(self.flaky.consecutive_failures, 2)
+        self.assertEqual(self.flaky.last_error, "SenderIdMismatchError")
+        self.assertTrue(self.flaky.is_active)
+
+        record_delivery(["flaky"], _batch(None))
+        self.flaky.refresh_from_db()
+        self.assertEqual(self.flaky.consecutive_failures, 0)
+        self.assertIsNotNone(self.flaky.last_success_at)
+
+        fanout.group_tokens(self.group.id)
+        for _ in range(3):
+            record_delivery(["flaky"], _batch(mismatch))
+        self.flaky.refresh_from_db()
+        self.assertFalse(self.flaky.is_active)
+        self.assertIsNotNone(self.flaky.deactivated_at)
+        self.assertEqual(fanout.group_tokens(self.group.id), ["good"])
+
+    def test_outage_does_not_disable_devices(self):
+        outage = [
+            exceptions.UnavailableError("down"),
+            exceptions.InternalError("oops"),
+            messaging.QuotaExceededError("slow down"),
+        ]
+        for error in outage * 3:
+            record_delivery(["good", "flaky"], _batch(error, error))
+
+        self.assertEqual(UserDevice.objects.filter(is_active=True).count(), 2)
+        self.flaky.refresh_from_db()
+        self.assertEqual(self.flaky.consecutive_failures, 0)
+        self.assertEqual(self.flaky.last_error, "QuotaExceededError")
+        self.assertIsNotNone(self.flaky.last_failure_at)
+
+    def test_unregistered_token_is_disabled_immediately(self):
+        record_delivery(["flaky"], _batch(messaging.UnregisteredError("gone")))
+        self.flaky.refresh_from_db()
+        self.assertFalse(self.flaky.is_active)
+        self.assertEqual(self.flaky.last_error, "UnregisteredError")
+
+    def test_purge_only_removes_long_disabled_devices(self):
+        now = timezone.now()
+        UserDevice.objects.filter(id=self.flaky.id).update(
+            is_active=False, deactivated_at=now - timedelta(days=31)
+        )
+        recent = UserDevice.objects.create(
+            user=self.user,
+            push_token="recent",
+            device_type="ios",
+            is_active=False,
+            deactivated_at=now - timedelta(days=1),
+        )
+        self.assertEqual(purge_inactive_devices(batch_size=1), 1)
+        self.assertEqual(
+            set(UserDevice.objects.values_list("id", flat=True)), {self.good.id, recent.id}
+        )
+
+    def test_devices_disabled_before_health_tracking_are_backfilled(self):
+        UserDevice.objects.filter(id=self.flaky.id).update(is_active=False, deactivated_at=None)
+        migration = import_module("users.migrations.0010_backfill_device_deactivated_at")
+
+        migration.backfill_deactivated_at(django_apps, None)
+
+        self.flaky.refresh_from_db()
+        self.assertIsNotNone(self.flaky.deactivated_at)
+        with mock.patch(
+            "users.maintenance.timezone.now", return_value=timezone.now() + timedelta(days=31)
+        ):
+            self.assertEqual(purge_inactive_devices(), 1)
+
+
+@mock.patch("alarms.rings.send_group_fanout", return_value=True)
+@mock.patch("alarms.rings.send_ring_push")
+class RingPipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.target, cls.ringer = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name
+            )
+            for name in ("sleepy", "ringer")
+        ]
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.target, cls.ringer)
+        cls.alarm = Alarm.objects.create(
+            name="Wake", time=time(7, 0), is_one_time=True, user=cls.target, group=cls.group
+        )
+
+    def setUp(self):
+        self.ring = ManualRing.objects.create(
+            alarm=self.alarm, ringer=self.ringer, next_attempt_at=timezone.now()
+        )
+
+    def run_until_done(self):
+        for _ in range(len(rings.LADDER) + 1):
+            ManualRing.objects.filter(id=self.ring.id, status=ManualRing.Status.PENDING).update(
+                next_attempt_at=timezone.now()
+            )
+            rings.process_due_rings()
+        self.ring.refresh_from_db()
+
+    def test_first_accepted_push_marks_ring_delivered(self, send_ring, notify):
+        send_ring.return_value = _batch(None, exceptions.UnavailableError("down"))
+        self.assertEqual(rings.process_due_rings(), 1)
+        self.ring.refresh_from_db()
+        self.assertEqual(self.ring.status, ManualRing.Status.DELIVERED)
+        self.assertEqual(self.ring.delivered_devices, 1)
+        self.assertIsNotNone(self.ring.delivered_at)
+        send_ring.assert_called_once_with(self.target.id, "ringer", repeat=False)
+
+    def test_failures_climb_the_ladder_then_notify_group(self, send_ring, notify):
+        send_ring.return_value = _batch(exceptions.UnavailableError("down"))
+        self.run_until_done()
+        self.assertEqual(self.ring.status, ManualRing.Status.FAILED)
+        self.assertEqual(self.ring.stage, ManualRing.Stage.GROUP_NOTIFIED)
+        self.assertEqual(self.ring.attempts, len(rings.LADDER))
+        self.assertEqual(self.ring.last_error, "UnavailableError")
+        repeats = [call for call in send_ring.call_args_list if call.kwargs["repeat"]]
+        self.assertEqual(send_ring.call_count, len(rings.LADDER) - 1)
+        self.assertEqual(len(repeats), 2)
+        notify.assert_called_once()
+        self.assertEqual(notify.call_args.kwargs["exclude_user_id"], self.target.id)
+
+    def test_no_devices_escalates_immediately(self, send_ring, notify):
+        send_ring.return_value = None
+        self.run_until_done()
+        self.assertEqual(self.ring.status, ManualRing.Status.FAILED)
+        self.assertEqual(send_ring.call_count, 1)
+        notify.assert_called_once()
+
+    def test_check_in_cancels_pending_ring(self, send_ring, notify):
+        AlarmEvent.objects.create(
+            alarm=self.alarm, user=self.target, status=AlarmEvent.Status.CHECKED_IN
+        )
+        rings.process_due_rings()
+        self.ring.refresh_from_db()
+        self.assertEqual(self.ring.status, ManualRing.Status.CANCELLED)
+        send_ring.assert_not_called()
+
+
+@mock.patch("alarms.rings.send_group_fanout", return_value=True)
+@mock.patch("alarms.rings.send_ring_push")
+class RingClaimRaceTests(TransactionTestCase):
+    def setUp(self):
+        target, ringer = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name
+            )
+            for name in ("sleepy", "ringer")
+        ]
+        group = Group.objects.create(name="Crew")
+        group.members.add(target, ringer)
+        alarm = Alarm.objects.create(
+            name="Wake", time=time(7, 0), is_one_time=True, user=target, group=group
+        )
+        self.ring = ManualRing.objects.create(
+            alarm=alarm, ringer=ringer, next_attempt_at=timezone.now()
+        )
+
+    def test_racing_claimers_attempt_the_ring_once(self, send_ring, notify):
+        send_ring.return_value = _batch(exceptions.UnavailableError("down"))
+        # Both workers have read the due ring before either claims it.
+        read = threading.Barrier(2)
+        update = QuerySet.update
+
+        def claim_after_both_read(queryset, **kwargs):
+            if queryset.model is ManualRing and set(kwargs) == {"next_attempt_at"}:
+                read.wait(timeout=5)
+            return update(queryset, **kwargs)
+
+        results = []
+
+        def worker():
+            try:
+                results.append(rings.attempt_ring(self.ring.id))
+            finally:
+                connection.close()
+
+        with mock.patch.object(QuerySet, "update", claim_after_both_read):
+            threads = [threading.Thread(target=worker) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(results), [False, True])
+        self.assertEqual(send_ring.call_count, 1)
+        self.ring.refresh_from_db()
+        self.assertEqual(self.ring.attempts, 1)
+
+
+@override_settings(RATE_LIMITS={"ring_trigger": (1, 10)})
+class TriggerRateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.target, cls.ringer, cls.other, cls.outsider = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name
+            )
+            for name in ("sleepy", "ringer", "other", "outsider")
+        ]
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.target, cls.ringer, cls.other)
+        cls.alarm = Alarm.objects.create(
+            name="Wake", time=time(7, 0), is_one_time=True, user=cls.target, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def trigger(self, user):
+        return self.client.post(
+            f"/api/alarms/alarm/{self.alarm.id}/trigger/",
+            HTTP_AUTHORIZATION=f"Bearer {AuthToken.objects.create(user=user).id}",
+        )
+
+    def test_rejected_requests_do_not_use_up_the_cooldown(self):
+        self.assertEqual(self.trigger(self.outsider).status_code, 403)
+        self.assertEqual(self.trigger(self.ringer).status_code, 409)
+
+        AlarmEvent.objects.create(
+            alarm=self.alarm, user=self.target, status=AlarmEvent.Status.EXPIRED
+        )
+        self.assertEqual(self.trigger(self.ringer).status_code, 200)
+        self.assertEqual(self.trigger(self.ringer).status_code, 429)
+        self.assertEqual(self.trigger(self.other).status_code, 200)
+
+
+@mock.patch("alarms.api.send_group_fanout", return_value=True)
+class BatchCheckInTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.home, cls.work = Group.objects.create(name="Home"), Group.objects.create(name="Work")
+        for group in (cls.home, cls.work):
+            group.members.add(cls.owner)
+        cls.alarms = [
+            Alarm.objects.create(
+                name=f"Wake {i}", time=time(7, i), is_one_time=True, user=cls.owner, group=group
+            )
+            for i, group in enumerate([cls.home, cls.home, cls.work])
+        ]
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+
+    def setUp(self):
+        self.events = [
+            AlarmEvent.objects.create(alarm=alarm, user=self.owner) for alarm in self.alarms
+        ]
+
+    def check_in(self, **payload):
+        return self.client.post(
+            "/api/alarms/alarm/check_in/",
+            payload,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    def test_all_ringing_checks_in_everything_with_one_push_per_group(self, push):
+        response = self.check_in(all_ringing=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(result["status"] for result in response.json()["results"]), ["checked_in"] * 3
+        )
+        self.assertFalse(AlarmEvent.objects.filter(status=AlarmEvent.Status.RINGING).exists())
+        self.assertEqual(push.call_count, 2)
+        home_push = next(call for call in push.call_args_list if call.args[0] == self.home.id)
+        self.assertEqual(len(home_push.kwargs["data"]["alarm_ids"].split(",")), 2)
+
+        self.assertEqual(self.check_in(all_ringing=True).json()["results"], [])
+
+    def test_explicit_ids_report_per_alarm_status(self, push):
+        self.events[0].status = AlarmEvent.Status.CHECKED_IN
+        self.events[0].save()
+        missing = "00000000-0000-0000-0000-000000000000"
+        response = self.check_in(alarm_ids=[str(self.alarms[0].id), str(self.alarms[2].id), missing])
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, ["already_checked_in", "checked_in", "not_found"])
+        push.assert_called_once()
+
+    def test_rows_won_by_a_concurrent_batch_with_the_same_timestamp_are_not_claimed(self, push):
+        now = timezone.now()
+        first, rest = self.events[0], self.events[1:]
+
+        def other_batch_checks_in_first():
+            AlarmEvent.objects.filter(id=first.id).update(
+                status=AlarmEvent.Status.CHECKED_IN, checked_in_at=now
+            )
+            return now
+
+        with mock.patch("alarms.api.timezone") as api_timezone:
+            api_timezone.now.side_effect = other_batch_checks_in_first
+            response = self.check_in(alarm_ids=[str(self.alarms[0].id), str(self.alarms[1].id)])
+
+        statuses = [result["status"] for result in response.json()["results"]]
+        self.assertEqual(statuses, ["already_checked_in", "checked_in"])
+        push.assert_called_once()
+        self.assertEqual(push.call_args.kwargs["data"]["event_ids"], str(rest[0].id))
+
+    def test_requires_exactly_one_target(self, push):
+        self.assertEqual(self.check_in().status_code, 422)
+        self.assertEqual(
+            self.check_in(alarm_ids=[str(self.alarms[0].id)], all_ringing=True).status_code, 422
+        )
+
+
+@mock.patch("alarms.api.send_group_fanout", return_value=True)
+class AlarmBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.home, cls.work, cls.other = [
+            Group.objects.create(name=name) for name in ("Home", "Work", "Other")
+        ]
+        for group in (cls.home, cls.work):
+            group.members.add(cls.owner)
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+
+    def batch(self, **payload):
+        return self.client.post(
+            "/api/alarms/alarm/batch/",
+            payload,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    def weekday(self, group, minute):
+        return {
+            "name": f"Weekday {minute}",
+            "time": f"07:{minute:02d}:00",
+            "repeats": "Mon,Tue,Wed,Thu,Fri",
+            "is_one_time": False,
+            "group_id": str(group.id),
+        }
+
+    def test_creates_many_alarms_with_one_push_per_group(self, push):
+        response = self.batch(create=[self.weekday(self.home, m) for m in range(10)] + [
+            self.weekday(self.work, 30)
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["created"]), 11)
+        self.assertFalse(Alarm.objects.filter(next_trigger_utc__isnull=True).exists())
+        self.assertEqual(push.call_count, 2)
+        home_push = next(call for call in push.call_args_list if call.args[0] == self.home.id)
+        self.assertEqual(home_push.args[1], Actions.ALARM_CREATED)
+        self.assertEqual(len(home_push.kwargs["data"]["alarm_ids"].split(",")), 10)
+
+    def test_update_and_delete_in_one_call(self, push):
+        keep, drop = [
+            Alarm.objects.create(
+                name=name, time=time(6, 0), is_one_time=True, user=self.owner, group=self.home
+            )
+            for name in ("keep", "drop")
+        ]
+        event = AlarmEvent.objects.create(
+            alarm=keep, user=self.owner, status=AlarmEvent.Status.EXPIRED
+        )
+        response = self.batch(
+            update=[{"id": str(keep.id), "name": "kept", "time": "06:30:00"}],
+            delete=[str(drop.id)],
+        )
+        self.assertEqual(response.status_code, 200)
+        keep.refresh_from_db()
+        event.refresh_from_db()
+        self.assertEqual((keep.name, keep.time), ("kept", time(6, 30)))
+        self.assertEqual(event.status, AlarmEvent.Status.CHECKED_IN)
+        self.assertFalse(Alarm.objects.filter(id=drop.id).exists())
+        self.assertEqual(
+            {call.args[1] for call in push.call_args_list},
+            {Actions.ALARM_UPDATED, Actions.ALARM_DELETED},
+        )
+
+    def test_any_invalid_item_rejects_the_whole_batch(self, push):
+        with self.assertNumQueries(3):
+            response = self.batch(
+                create=[self.weekday(self.home, 0), self.weekday(self.other, 1)],
+                delete=["00000000-0000-0000-0000-000000000000"],
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(e["op"], e["index"]) for e in response.json()["errors"]],
+            [("create", 1), ("delete", 0)],
+        )
+        self.assertFalse(Alarm.objects.exists())
+        push.assert_not_called()
+
+    def test_export_streams_only_my_alarms(self, push):
+        self.batch(create=[self.weekday(self.home, m) for m in range(3)])
+        response = self.client.get(
+            "/api/alarms/alarm/export/", HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertTrue(response.streaming)
+        rows = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([row["time"] for row in rows], ["07:00:00", "07:01:00", "07:02:00"])
+
+
+class HotListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.group = Group.objects.create(name="Home")
+        cls.group.members.add(cls.owner)
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+        cls.alarms = [
+            Alarm.objects.create(
+                name=f"Alarm {minute}",
+                time=time(7, minute),
+                repeats="Mon,Wed",
+                is_one_time=False,
+                user=cls.owner,
+                group=cls.group,
+            )
+            for minute in range(30)
+        ]
+
+    def get(self, path, **headers):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Bearer {self.token}", **headers)
+
+    def test_group_alarms_match_the_response_schema(self):
+        response = self.get(f"/api/alarms/group/{self.group.id}/alarms/")
+
+        self.assertEqual(response.status_code, 200)
+        rendered = JSONRenderer().render(
+            None, [AlarmOut.from_orm(alarm).model_dump() for alarm in self.alarms], response_status=200
+        )
+        self.assertCountEqual(response.json(), json.loads(rendered))
+
+    def test_large_lists_are_gzipped_when_accepted(self):
+        plain = self.get("/api/alarms/alarm/")
+        packed = self.get("/api/alarms/alarm/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(packed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", packed["Vary"])
+        self.assertEqual(json.loads(gzip.decompress(packed.content)), plain.json())
+
+    def test_non_members_are_rejected(self):
+        other = Group.objects.create(name="Other")
+        response = self.get(f"/api/alarms/group/{other.id}/alarms/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_unchanged_list_is_answered_with_304(self):
+        etag = self.get("/api/alarms/alarm/")["ETag"]
+
+        # Token auth and the stamp aggregate; the list itself is never read.
+        with self.assertNumQueries(2):
+            response = self.get("/api/alarms/alarm/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    @mock.patch("alarms.api.send_group_fanout", return_value=True)
+    def test_writes_change_the_etag(self, _fanout):
+        url = f"/api/alarms/group/{self.group.id}/alarms/"
+        etag = self.get(url)["ETag"]
+
+        changes = [
+            lambda: self.client.post(
+                f"/api/alarms/alarm/{self.alarms[0].id}/ring/",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            ),
+            lambda: self.alarms[1].delete(),
+            lambda: Alarm.objects.create(
+                name="New", time=time(6, 0), user=self.owner, group=self.group
+            ),
+        ]
+        for change in changes:
+            change()
+            response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_membership_and_profile_changes_change_member_etag(self):
+        url = f"/api/alarms/group/{self.group.id}/members/"
+        etag = self.get(url)["ETag"]
+        friend = User.objects.create_user(
+            username="friend", email="friend@example.com", password="pw", display_name="Friend"
+        )
+
+        self.group.members.add(friend)
+        added = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(added.status_code, 200)
+
+        friend.display_name = "Renamed"
+        friend.save(update_fields=["display_name"])
+        renamed = self.get(url, HTTP_IF_NONE_MATCH=added["ETag"])
+        self.assertEqual(renamed.status_code, 200)
+        self.assertIn("Renamed", renamed.content.decode())
+
+
+@mock.patch("alarms.api.send_group_fanout", return_value=True)
+@mock.patch("alarms.management.commands.scheduler.send_group_fanout", return_value=True)
+class ReadCacheInvalidationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.friend = [
+            User.objects.create_user(
+                username=name, email=f"{name}@example.com", password="pw", display_name=name.title()
+            )
+            for name in ("owner", "friend")
+        ]
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.owner)
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+
+    def setUp(self):
+        cache.clear()
+        self.alarm = Alarm.objects.create(
+            name="Wake",
+            time=time(7, 0),
+            repeats="Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+            is_one_time=False,
+            user=self.owner,
+            group=self.group,
+        )
+
+    def post(self, path, payload=None):
+        return self.client.post(
+            path,
+            payload or {},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+    def test_membership_is_cached_and_follows_every_kind_of_change(self, *pushes):
+        self.assertEqual(lookups.member_ids(self.group.id), {self.owner.id})
+        with self.assertNumQueries(0):
+            lookups.member_ids(self.group.id)
+
+        self.group.members.add(self.friend)
+        self.assertEqual(lookups.member_ids(self.group.id), {self.owner.id, self.friend.id})
+
+        self.friend.group_members.remove(self.group)
+        self.assertEqual(lookups.member_ids(self.group.id), {self.owner.id})
+
+        self.friend.group_members.add(self.group)
+        self.friend.group_members.clear()
+        self.assertEqual(lookups.member_ids(self.group.id), {self.owner.id})
+
+        self.group.members.add(self.friend)
+        lookups.member_ids(self.group.id)
+        self.friend.delete()
+        stored = Group.members.through.objects.filter(group_id=self.group.id)
+        self.assertEqual(lookups.member_ids(self.group.id), set(stored.values_list("user_id", flat=True)))
+
+    def test_group_alarms_follow_saves_deletes_and_bulk_writes(self, *pushes):
+        Alarm.objects.filter(id=self.alarm.id).update(is_one_time=True, repeats="")
+        self.assertTrue(lookups.group_alarms(self.group.id)[0]["is_active"])
+        with self.assertNumQueries(0):
+            lookups.group_alarms(self.group.id)
+
+        # The ring path deactivates the one-time alarm with QuerySet.update(), which sends no signal.
+        self.post(f"/api/alarms/alarm/{self.alarm.id}/ring/")
+        self.assertFalse(lookups.group_alarms(self.group.id)[0]["is_active"])
+
+        self.post("/api/alarms/alarm/batch/", {"update": [{"id": str(self.alarm.id), "name": "Renamed"}]})
+        self.assertEqual(lookups.group_alarms(self.group.id)[0]["name"], "Renamed")
+
+        self.alarm.delete()
+        self.assertEqual(lookups.group_alarms(self.group.id), [])
+
+    def test_latest_event_follows_ring_check_in_and_expiry(self, *pushes):
+        self.assertIsNone(lookups.latest_event(self.alarm.id))
+
+        self.post(f"/api/alarms/alarm/{self.alarm.id}/ring/")
+        event = lookups.latest_event(self.alarm.id)
+        self.assertEqual(event["status"], AlarmEvent.Status.RINGING)
+        with self.assertNumQueries(0):
+            lookups.latest_event(self.alarm.id)
+
+        self.assertFalse(SchedulerCommand().expire_event(event["id"]))
+        self.assertEqual(lookups.latest_event(self.alarm.id)["status"], AlarmEvent.Status.RINGING)
+
+        SchedulerCommand().expire_event(event["id"], now=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(lookups.latest_event(self.alarm.id)["status"], AlarmEvent.Status.EXPIRED)
+
+        self.post(f"/api/alarms/alarm/{self.alarm.id}/check_in/")
+        self.assertEqual(lookups.latest_event(self.alarm.id)["status"], AlarmEvent.Status.CHECKED_IN)
+
+    def test_decisions_see_writes_made_in_another_process(self, *pushes):
+        self.group.members.add(self.friend)
+        friend_token = str(AuthToken.objects.create(user=self.friend).id)
+        self.post(f"/api/alarms/alarm/{self.alarm.id}/ring/")
+        lookups.latest_event(self.alarm.id)
+        lookups.member_ids(self.group.id)
+
+        # The scheduler and other workers can't invalidate this process's local cache.
+        with mock.patch("alarms.lookups.invalidate"):
+            AlarmEvent.objects.filter(alarm=self.alarm).update(status=AlarmEvent.Status.EXPIRED)
+            self.friend.group_members.remove(self.group)
+        self.assertEqual(lookups.latest_event(self.alarm.id)["status"], AlarmEvent.Status.RINGING)
+
+        trigger = f"/api/alarms/alarm/{self.alarm.id}/trigger/"
+        self.assertEqual(self.post(trigger).status_code, 200)
+        response = self.client.post(trigger, HTTP_AUTHORIZATION=f"Bearer {friend_token}")
+        self.assertEqual(response.status_code, 403)
+
+    def test_server_fired_events_are_visible_to_trigger(self, *pushes):
+        self.assertIsNone(lookups.latest_event(self.alarm.id))
+        lookups.group_alarms(self.group.id)
+        Alarm.objects.filter(id=self.alarm.id).update(
+            next_trigger_utc=timezone.now() - timedelta(seconds=30)
+        )
+
+        self.assertEqual(SchedulerCommand().fire_due_alarms(), 1)
+
+        self.assertEqual(lookups.latest_event(self.alarm.id)["status"], AlarmEvent.Status.RINGING)
+        self.alarm.refresh_from_db()
+        self.assertEqual(
+            lookups.group_alarms(self.group.id)[0]["next_trigger_utc"], self.alarm.next_trigger_utc
+        )
+
+    def test_profiles_follow_user_saves(self, *pushes):
+        self.assertEqual(profiles([self.friend.id])[self.friend.id]["display_name"], "Friend")
+        with self.assertNumQueries(0):
+            profiles([self.friend.id])
+
+        self.friend.display_name = "Pal"
+        self.friend.save(update_fields=["display_name"])
+        self.assertEqual(profiles([self.friend.id])[self.friend.id]["display_name"], "Pal")
+
+
+@override_settings(
+    RETENTION_DAYS={"alarm_events": 90, "manual_rings": 30},
+    RETENTION_BATCH_SIZE=2,
+)
+class RetentionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.owner)
+        cls.alarm = Alarm.objects.create(
+            name="Wake",
+            time=time(7, 0),
+            repeats="Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+            is_one_time=False,
+            user=cls.owner,
+            group=cls.group,
+        )
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+
+    def setUp(self):
+        cache.clear()
+
+    def event(self, days_ago, status, checked_in_after=None):
+        created_at = timezone.now() - timedelta(days=days_ago)
+        event = AlarmEvent.objects.create(alarm=self.alarm, user=self.owner, status=status)
+        AlarmEvent.objects.filter(id=event.id).update(
+            created_at=created_at,
+            checked_in_at=created_at + checked_in_after if checked_in_after else None,
+        )
+        return event
+
+    def leaderboard(self):
+        response = self.client.get(
+            f"/api/alarms/group/{self.group.id}/leaderboard/",
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_old_events_are_rolled_up_and_leaderboard_is_unchanged(self):
+        on_time, late = timedelta(minutes=1), timedelta(minutes=20)
+        for days_ago in (200, 200, 120):
+            self.event(days_ago, AlarmEvent.Status.CHECKED_IN, on_time)
+        self.event(120, AlarmEvent.Status.CHECKED_IN, late)
+        self.event(100, AlarmEvent.Status.EXPIRED)
+        ringing = self.event(100, AlarmEvent.Status.RINGING)
+        recent = self.event(1, AlarmEvent.Status.CHECKED_IN, on_time)
+        before = self.leaderboard()
+
+        self.assertEqual(SchedulerCommand().run_maintenance()["compact_alarm_events"], 5)
+
+        self.assertEqual(
+            set(AlarmEvent.objects.values_list("id", flat=True)), {ringing.id, recent.id}
+        )
+        self.assertEqual(
+            sorted(AlarmEventRollup.objects.values_list("total_events", "on_time_checkins")),
+            [(1, 0), (2, 1), (2, 2)],
+        )
+        self.assertEqual(self.leaderboard(), before)
+        self.assertEqual(before[0]["total_events"], 7)
+        self.assertEqual(before[0]["on_time_checkins"], 4)
+
+    def test_compaction_adds_to_existing_rollups(self):
+        self.event(200, AlarmEvent.Status.EXPIRED)
+        compact_alarm_events()
+        self.event(200, AlarmEvent.Status.CHECKED_IN, timedelta(minutes=1))
+
+        self.assertEqual(compact_alarm_events(), 1)
+
+        rollup = AlarmEventRollup.objects.get()
+        self.assertEqual((rollup.total_events, rollup.on_time_checkins), (2, 1))
+
+    @override_settings(RETENTION_DAYS={"alarm_events": 0, "manual_rings": 0})
+    def test_zero_days_keeps_everything(self):
+        self.event(1000, AlarmEvent.Status.EXPIRED)
+        self.assertEqual(compact_alarm_events(), 0)
+        self.assertEqual(purge_manual_rings(), 0)
+        self.assertEqual(AlarmEvent.objects.count(), 1)
+
+    def test_only_settled_old_rings_are_purged(self):
+        statuses = (ManualRing.Status.DELIVERED, ManualRing.Status.FAILED, ManualRing.Status.PENDING)
+        rings = [
+            ManualRing.objects.create(alarm=self.alarm, ringer=self.owner, status=status)
+            for status in statuses
+        ]
+        ManualRing.objects.update(created_at=timezone.now() - timedelta(days=45))
+        fresh = ManualRing.objects.create(alarm=self.alarm, ringer=self.owner)
+        fresh_done = ManualRing.objects.create(
+            alarm=self.alarm, ringer=self.owner, status=ManualRing.Status.DELIVERED
+        )
+
+        self.assertEqual(purge_manual_rings(), 2)
+
+        self.assertEqual(
+            set(ManualRing.objects.values_list("id", flat=True)),
+            {rings[2].id, fresh.id, fresh_done.id},
+        )
+
+
+@mock.patch("alarms.management.commands.scheduler.send_group_fanout", return_value=True)
+class ServerRingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        cls.group = Group.objects.create(name="Crew")
+        cls.group.members.add(cls.owner)
+        cls.token = str(AuthToken.objects.create(user=cls.owner).id)
+
+    def make_alarm(self, minutes_ago, is_one_time=False):
+        alarm = Alarm.objects.create(
+            name="Wake",
+            time=time(7, 0),
+            is_one_time=is_one_time,
+            repeats="" if is_one_time else "Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+            user=self.owner,
+            group=self.group,
+        )
+        Alarm.objects.filter(id=alarm.id).update(
+            next_trigger_utc=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return alarm
+
+    def test_fires_due_alarms_in_one_batch_and_advances_them(self, push):
+        repeating, one_time = self.make_alarm(0.5), self.make_alarm(1, is_one_time=True)
+        dead, future = self.make_alarm(10), self.make_alarm(-10)
+
+        self.assertEqual(SchedulerCommand().fire_due_alarms(), 2)
+
+        ringing = AlarmEvent.objects.filter(status=AlarmEvent.Status.RINGING)
+        self.assertEqual(
+            set(ringing.values_list("alarm_id", flat=True)), {repeating.id, one_time.id}
+        )
+        self.assertEqual(ringing.filter(acknowledged_at__isnull=True).count(), 2)
+        repeating.refresh_from_db()
+        one_time.refresh_from_db()
+        self.assertGreater(repeating.next_trigger_utc, timezone.now())
+        self.assertFalse(one_time.is_active)
+        self.assertEqual(push.call_count, 2)
+        self.assertFalse(AlarmEvent.objects.filter(alarm__in=[dead, future]).exists())
+
+    def test_owner_edit_during_firing_wins(self, push):
+        disabled, edited, untouched = [self.make_alarm(0.5) for _ in range(3)]
+        new_time = timezone.now() + timedelta(hours=3)
+
+        def owner_edits_meanwhile(alarm, due, now):
+            Alarm.objects.filter(id=disabled.id).update(is_active=False)
+            Alarm.objects.filter(id=edited.id).update(next_trigger_utc=new_time)
+            return due + timedelta(days=1)
+
+        with mock.patch.object(
+            SchedulerCommand, "next_trigger_after", side_effect=owner_edits_meanwhile
+        ):
+            self.assertEqual(SchedulerCommand().fire_due_alarms(), 1)
+
+        disabled.refresh_from_db()
+        edited.refresh_from_db()
+        self.assertFalse(disabled.is_active)
+        self.assertEqual(edited.next_trigger_utc, new_time)
+        self.assertEqual(
+            list(AlarmEvent.objects.values_list("alarm_id", flat=True)), [untouched.id]
+        )
+        self.assertEqual(push.call_count, 1)
+
+    @mock.patch.object(SchedulerCommand, "run_email_worker")
+    @mock.patch("alarms.management.commands.scheduler.process_due_emails")
+    def test_email_is_sent_off_the_ring_loop(self, send, run_email_worker, push):
+        command = SchedulerCommand()
+        command.poll()
+        send.assert_not_called()
+
+        worker = command.start_email_worker()
+        worker.join(timeout=1)
+        run_email_worker.assert_called_once_with()
+        self.assertTrue(worker.daemon)
+
+    def test_sweep_reports_lateness_of_its_own_rows(self, push):
+        lateness_seconds.observe(1000, phase="catch_missed")
+        self.make_alarm(7)
+        command = SchedulerCommand()
+
+        phase = command.reap_expired_alarms()["phases"]["catch_missed"]
+        self.assertEqual(phase["lateness_observations"], 1)
+        self.assertAlmostEqual(phase["lateness_p50"], 120, delta=5)
+        self.assertEqual(phase["lateness_p99"], phase["lateness_p50"])
+
+        phase = command.reap_expired_alarms()["phases"]["catch_missed"]
+        self.assertEqual(phase["lateness_observations"], 0)
+        self.assertIsNone(phase["lateness_p50"])
+
+    def test_dead_phone_east_of_utc_is_caught_once(self, push):
+        tokyo = User.objects.create_user(
+            username="tokyo", email="tokyo@example.com", password="pw", display_name="Tokyo",
+            timezone="Asia/Tokyo",
+        )
+        self.group.members.add(tokyo)
+        # 20:00 UTC is already the next day in Tokyo.
+        now = datetime(2026, 10, 19, 20, 0, tzinfo=dt_timezone.utc)
+        due = now - timedelta(minutes=10)
+        alarm = Alarm.objects.create(
+            name="Wake",
+            time=due.astimezone(ZoneInfo("Asia/Tokyo")).time(),
+            is_one_time=False,
+            repeats="Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+            user=tokyo,
+            group=self.group,
+        )
+        Alarm.objects.filter(id=alarm.id).update(next_trigger_utc=due)
+
+        reaper = SchedulerCommand()
+        self.assertTrue(reaper.catch_missed_alarm(alarm.id, now))
+        self.assertFalse(reaper.catch_missed_alarm(alarm.id, now))
+
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.next_trigger_utc, due + timedelta(days=1))
+        self.assertEqual(AlarmEvent.objects.filter(alarm=alarm).count(), 1)
+
+    def test_server_ring_east_of_utc_fires_once_per_occurrence(self, push):
+        tokyo = User.objects.create_user(
+            username="tokyo", email="tokyo@example.com", password="pw", display_name="Tokyo",
+            timezone="Asia/Tokyo",
+        )
+        now = datetime(2026, 10, 19, 20, 0, tzinfo=dt_timezone.utc)
+        due = now - timedelta(seconds=30)
+        alarm = Alarm.objects.create(
+            name="Wake",
+            time=due.astimezone(ZoneInfo("Asia/Tokyo")).time(),
+            is_one_time=False,
+            repeats="Mon,Tue,Wed,Thu,Fri,Sat,Sun",
+            user=tokyo,
+            group=self.group,
+        )
+        Alarm.objects.filter(id=alarm.id).update(next_trigger_utc=due)
+
+        self.assertEqual(SchedulerCommand().fire_due_alarms(now), 1)
+        AlarmEvent.objects.filter(alarm=alarm).update(status=AlarmEvent.Status.CHECKED_IN)
+        self.assertEqual(SchedulerCommand().fire_due_alarms(now), 0)
+
+        alarm.refresh_from_db()
+        self.assertEqual(alarm.next_trigger_utc, due + timedelta(days=1))
+        self.assertEqual(AlarmEvent.objects.filter(alarm=alarm).count(), 1)
+
+    @mock.patch("alarms.management.commands.scheduler.FIRE_BATCH_SIZE", 1)
+    @mock.patch.object(SchedulerCommand, "next_trigger_after", return_value=None)
+    def test_alarms_that_cannot_advance_do_not_stall_the_loop(self, next_trigger_after, push):
+        self.make_alarm(0.5)
+        self.make_alarm(1)
+
+        self.assertEqual(SchedulerCommand().fire_due_alarms(), 0)
+
+        self.assertFalse(AlarmEvent.objects.exists())
+        push.assert_not_called()
+
+    def test_phone_that_rang_first_keeps_its_event(self, push):
+        alarm = self.make_alarm(0.5)
+        phone_event = AlarmEvent.objects.create(alarm=alarm, user=self.owner)
+
+        self.assertEqual(SchedulerCommand().fire_due_alarms(), 0)
+        self.assertEqual(list(AlarmEvent.objects.values_list("id", flat=True)), [phone_event.id])
+        push.assert_not_called()
+
+    @override_settings(SERVER_RING_MODE=True)
+    @mock.patch("alarms.api.send_group_fanout")
+    def test_ring_call_acknowledges_server_fired_event(self, api_push, push):
+        alarm = self.make_alarm(0.5)
+        SchedulerCommand().fire_due_alarms()
+        event = AlarmEvent.objects.get(alarm=alarm)
+
+        for _ in range(2):
+            response = self.client.post(
+                f"/api/alarms/alarm/{alarm.id}/ring/",
+                HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["event_id"], str(event.id))
+
+        event.refresh_from_db()
+        self.assertIsNotNone(event.acknowledged_at)
+        api_push.assert_not_called()
+
+
+@override_settings(RATE_LIMITS={"ring_trigger": (10_000, 10)})
+@mock.patch("alarms.api.send_group_fanout", return_value=True)
+@mock.patch("alarms.management.commands.scheduler.send_group_fanout", return_value=True)
+class RingStateMachineStressTests(TransactionTestCase):
+    """Ring, check-in, trigger and the reaper racing from many threads on one alarm."""
+
+    THREADS_PER_ROLE = 4
+    ROUNDS = 15
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+        self.members = [
+            User.objects.create_user(
+                username=f"m{i}", email=f"m{i}@example.com", password="pw", display_name=f"m{i}"
+            )
+            for i in range(self.THREADS_PER_ROLE)
+        ]
+        group = Group.objects.create(name="Crew")
+        group.members.add(self.owner, *self.members)
+        self.alarm = Alarm.objects.create(
+            name="Wake", time=time(7, 0), is_one_time=False, user=self.owner, group=group
+        )
+        self.tokens = {
+            user.id: str(AuthToken.objects.create(user=user).id)
+            for user in [self.owner, *self.members]
+        }
+
+    def hammer(self, workers):
+        start = threading.Barrier(len(workers))
+        results, errors = [], []
+
+        def run(user, paths):
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {self.tokens[user.id]}")
+            try:
+                start.wait()
+                for _ in range(self.ROUNDS):
+                    for path in paths:
+                        if path == "reap":
+                            # Expire whatever is ringing right now, ignoring the grace period.
+                            ringing = AlarmEvent.objects.filter(status=AlarmEvent.Status.RINGING)
+                            for event_id in ringing.values_list("id", flat=True):
+                                SchedulerCommand().expire_event(
+                                    event_id, now=timezone.now() + timedelta(minutes=5)
+                                )
+                            continue
+                        response = client.post(path, content_type="application/json")
+                        results.append((path.rsplit("/", 2)[-2], response.status_code))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=worker) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+    def test_concurrent_transitions_stay_consistent(self, *mocks):
+        base = f"/api/alarms/alarm/{self.alarm.id}"
+        ring, check_in, trigger = f"{base}/ring/", f"{base}/check_in/", f"{base}/trigger/"
+        workers = [(self.owner, [ring, check_in]) for _ in range(self.THREADS_PER_ROLE)]
+        workers += [(member, [trigger]) for member in self.members]
+        workers += [(self.owner, ["reap"]) for _ in range(2)]
+
+        results = self.hammer(workers)
+
+        allowed = {"ring": {200, 409}, "check_in": {200, 409}, "trigger": {200, 409}}
+        for action, status in results:
+            self.assertIn(status, allowed[action], msg=f"{action} returned {status}")
+
+        events = AlarmEvent.objects.filter(alarm=self.alarm)
+        self.assertLessEqual(events.filter(status=AlarmEvent.Status.RINGING).count(), 1)
+        self.assertEqual(
+            events.count(), sum(1 for action, status in results if (action, status) == ("ring", 200))
+        )
+        self.assertEqual(
+            events.filter(status=AlarmEvent.Status.CHECKED_IN).count(),
+            sum(1 for action, status in results if (action, status) == ("check_in", 200)),
+        )
+        self.assertEqual(
+            ManualRing.objects.filter(alarm=self.alarm).count(),
+            sum(1 for action, status in results if (action, status) == ("trigger", 200)),
+        )
+
+
+class PushCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+        self.trailing_sent = threading.Event()
+
+        def send(tokens, action, data):
+            self.sent.append((sorted(tokens), action, data))
+            if len(self.sent) > 1:
+                self.trailing_sent.set()
+            return True
+
+        self.coalescer = PushCoalescer(send)
+
+    def test_burst_sends_leading_and_one_trailing_push(self):
+        saved_before = pushes_saved_total.value(action=Actions.ALARM_UPDATED.value)
+        key = ("group", Actions.ALARM_UPDATED.value, "alarm")
+        for i in range(5):
+            self.coalescer.submit(key, [f"t{i % 2}"], Actions.ALARM_UPDATED, {"rev": str(i)}, 0.05)
+
+        self.assertTrue(self.trailing_sent.wait(2))
+        self.assertEqual(self.sent[0], (["t0"], Actions.ALARM_UPDATED, {"rev": "0"}))
+        self.assertEqual(self.sent[1], (["t0", "t1"], Actions.ALARM_UPDATED, {"rev": "4"}))
+        self.assertEqual(
+            pushes_saved_total.value(action=Actions.ALARM_UPDATED.value) - saved_before, 3
+        )
+
+    def test_distinct_keys_are_not_merged(self):
+        self.coalescer.submit(("g", "a", "1"), ["t"], Actions.ALARM_UPDATED, {}, 10)
+        self.coalescer.submit(("g", "a", "2"), ["t"], Actions.ALARM_UPDATED, {}, 10)
+        self.assertEqual(len(self.sent), 2)
+        self.coalescer.flush()
+        self.assertEqual(len(self.sent), 2)
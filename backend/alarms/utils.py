@@ -1,95 +1,211 @@
-from firebase_admin import messaging
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from core import metrics
+from core.firebase import messaging
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
 from users.models import UserDevice
+from alarms import fanout
+from alarms.coalesce import PushCoalescer
 from alarms.enums import Actions
 
+logger = logging.getLogger(__name__)
 
-def send_ring_push(user, ringer_name):
-    devices = UserDevice.objects.filter(user=user, is_active=True)
+# Silent "refetch" pushes that may be merged when they repeat in quick succession.
+COALESCED_ACTIONS = {
+    Actions.ALARM_UPDATED,
+    Actions.GROUP_UPDATED,
+    Actions.GROUP_MEMBER_JOINED,
+    Actions.GROUP_MEMBER_LEFT,
+}
 
-    if not devices.exists():
-        return False
+_coalescer = PushCoalescer(send=lambda tokens, action, data: send_token_push(tokens, action, data))
+
+# Healthy devices get last_success_at refreshed at most this often, to avoid a write per push.
+SUCCESS_STAMP_INTERVAL = timedelta(hours=1)
+
+# Errors that say this token is bad. Only these count toward a device's failure
+# streak; transient server errors (UnavailableError, InternalError,
+# QuotaExceededError, ...) are recorded but don't, so an FCM outage doesn't
+# disable every device.
+TOKEN_ERRORS = frozenset({"UnregisteredError", "SenderIdMismatchError", "InvalidArgumentError"})
+
+devices_disabled_total = metrics.counter(
+    "ringsync_push_devices_disabled_total", "Devices disabled by the push path.", ["reason"]
+)
+
+
+def _send_multicast(message, kind):
+    start = time.perf_counter()
+    try:
+        response = messaging().send_each_for_multicast(message)
+    except Exception:
+        metrics.push_messages_total.inc(len(message.tokens), kind=kind, outcome="error")
+        raise
+    finally:
+        metrics.push_send_seconds.observe(time.perf_counter() - start, kind=kind)
+
+    metrics.push_messages_total.inc(response.success_count, kind=kind, outcome="success")
+    metrics.push_messages_total.inc(response.failure_count, kind=kind, outcome="failure")
+    record_delivery(message.tokens, response)
+    return response
+
+
+def record_delivery(tokens, response):
+    """Update per-device delivery health and disable devices that keep failing."""
+    now = timezone.now()
+    succeeded, failed = [], defaultdict(list)
+    for token, resp in zip(tokens, response.responses):
+        if resp.exception is None:
+            succeeded.append(token)
+        else:
+            failed[type(resp.exception).__name__].append(token)
+
+    if succeeded:
+        UserDevice.objects.filter(push_token__in=succeeded).filter(
+            Q(consecutive_failures__gt=0)
+            | Q(last_success_at__isnull=True)
+            | Q(last_success_at__lt=now - SUCCESS_STAMP_INTERVAL)
+        ).update(last_success_at=now, consecutive_failures=0)
+
+    if not failed:
+        return
+
+    for error, error_tokens in failed.items():
+        streak = F("consecutive_failures") + 1 if error in TOKEN_ERRORS else F("consecutive_failures")
+        UserDevice.objects.filter(push_token__in=error_tokens).update(
+            consecutive_failures=streak,
+            last_failure_at=now,
+            last_error=error,
+        )
+
+    failed_tokens = [
+        token for error in TOKEN_ERRORS.intersection(failed) for token in failed[error]
+    ]
+    disable = {
+        "unregistered": Q(push_token__in=failed.get("UnregisteredError", [])),
+        "failure_streak": Q(
+            push_token__in=failed_tokens,
+            consecutive_failures__gte=settings.PUSH_MAX_CONSECUTIVE_FAILURES,
+        ),
+    }
+    affected_users = set()
+    for reason, condition in disable.items():
+        devices = UserDevice.objects.filter(condition, is_active=True)
+        user_ids = list(devices.values_list("user_id", flat=True))
+        if user_ids:
+            devices.update(is_active=False, deactivated_at=now)
+            devices_disabled_total.inc(len(user_ids), reason=reason)
+            affected_users.update(user_ids)
+
+    if affected_users:
+        fanout.invalidate_users(list(affected_users))
+
+
+def send_ring_push(user_id, ringer_name, repeat=False):
+    """
+    Send a critical ring to every active device of ``user_id``.
+
+    Returns the ``BatchResponse``, or ``None`` when the user has no active
+    devices. Send errors propagate so the ring pipeline can retry them.
+    """
+    tokens = list(
+        UserDevice.objects.filter(user_id=user_id, is_active=True).values_list(
+            "push_token", flat=True
+        )
+    )
 
-    tokens = list(devices.values_list("push_token", flat=True))
+    if not tokens:
+        return None
 
+    fcm = messaging()
     data_payload = {"action": Actions.MANUAL_RING.value, "ringer_name": ringer_name}
+    still = "still " if repeat else ""
 
-    message = messaging.MulticastMessage(
+    message = fcm.MulticastMessage(
         tokens=tokens,
         data=data_payload,
-        apns=messaging.APNSConfig(
+        apns=fcm.APNSConfig(
             headers={"apns-priority": "10", "apns-push-type": "alert"},
-            payload=messaging.APNSPayload(
-                aps=messaging.Aps(
-                    alert=messaging.ApsAlert(title="RING!", body=f"{ringer_name} is ringing your alarm!"),
-                    sound=messaging.CriticalSound(name="default", critical=1, volume=1.0),
+            payload=fcm.APNSPayload(
+                aps=fcm.Aps(
+                    alert=fcm.ApsAlert(title="RING!", body=f"{ringer_name} is {still}ringing your alarm!"),
+                    sound=fcm.CriticalSound(name="default", critical=1, volume=1.0),
                 )
             ),
         ),
-        android=messaging.AndroidConfig(
+        android=fcm.AndroidConfig(
             priority="high",
-            notification=messaging.AndroidNotification(
+            notification=fcm.AndroidNotification(
                 title="RING!",
-                body=f"{ringer_name} is buzzing you!",
+                body=f"{ringer_name} is {still}buzzing you!",
                 channel_id="high_priority_alarms",
             ),
         ),
     )
 
-    try:
-        response = messaging.send_each_for_multicast(message)
-        return response.success_count > 0
-    except Exception as e:
-        print(f"FCM Push Failed: {e}")
-        return False
+    return _send_multicast(message, kind="ring")
 
 
 def send_group_push(users, action, data, silent=True):
-    devices = UserDevice.objects.filter(user__in=users, is_active=True)
+    tokens = list(
+        UserDevice.objects.filter(user__in=users, is_active=True).values_list("push_token", flat=True)
+    )
+    return send_token_push(tokens, action, data, silent=silent)
 
-    if not devices.exists():
-        return False
 
-    tokens = list(devices.values_list("push_token", flat=True))
-    stale_tokens = []
+def send_group_fanout(group_id, action, data, exclude_user_id=None, silent=True):
+    """Push to every member of ``group_id`` using the cached device index."""
+    tokens = fanout.group_tokens(group_id, exclude_user_id=exclude_user_id)
+
+    window = settings.PUSH_COALESCE_WINDOW_SECONDS
+    if silent and window > 0 and action in COALESCED_ACTIONS and tokens:
+        key = (str(group_id), action.value, data.get("alarm_id", str(group_id)))
+        return _coalescer.submit(key, tokens, action, data, window)
 
+    return send_token_push(tokens, action, data, silent=silent)
+
+
+def send_token_push(tokens, action, data, silent=True):
+    if not tokens:
+        return False
+
+    fcm = messaging()
     data_payload = {"action": action.value if isinstance(action, Actions) else action, **data}
 
     if silent:
-        message = messaging.MulticastMessage(
+        message = fcm.MulticastMessage(
             tokens=tokens,
             data=data_payload,
         )
     else:
-        message = messaging.MulticastMessage(
+        message = fcm.MulticastMessage(
             tokens=tokens,
             data=data_payload,
-            apns=messaging.APNSConfig(
+            apns=fcm.APNSConfig(
                 headers={"apns-priority": "10", "apns-push-type": "alert"},
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        alert=messaging.ApsAlert(title=data.get("title", "RingSync"), body=data.get("body", "")),
+                payload=fcm.APNSPayload(
+                    aps=fcm.Aps(
+                        alert=fcm.ApsAlert(title=data.get("title", "RingSync"), body=data.get("body", "")),
                         sound="default",
                     )
                 ),
             ),
-            android=messaging.AndroidConfig(
+            android=fcm.AndroidConfig(
                 priority="high",
-                notification=messaging.AndroidNotification(
+                notification=fcm.AndroidNotification(
                     title=data.get("title", "RingSync"), body=data.get("body", "")
                 ),
             ),
         )
 
     try:
-        response = messaging.send_each_for_multicast(message)
-        for token, resp in zip(tokens, response.responses):
-            if isinstance(resp.exception, messaging.UnregisteredError):
-                stale_tokens.append(token)
-
-        if stale_tokens:
-            UserDevice.objects.filter(push_token__in=stale_tokens).update(is_active=False)
-
+        response = _send_multicast(message, kind="silent" if silent else "alert")
         return response.success_count > 0
-    except Exception as e:
-        print(f"FCM Push Failed: {e}")
+    except Exception:
+        logger.exception("FCM group push failed", extra={"action": data_payload["action"]})
         return False
@@ -1,8 +1,25 @@
 from alarms.api import router as alarms_router
+from core.ratelimit import RateLimited
+from core.renderers import FastRenderer
 from ninja import NinjaAPI
 from users.api import router as users_router
+from users.hashing import HashingBusy
 
-api = NinjaAPI()
+api = NinjaAPI(renderer=FastRenderer())
+
+
+@api.exception_handler(RateLimited)
+def rate_limited(request, exc):
+    response = api.create_response(request, {"error": exc.message}, status=429)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
+@api.exception_handler(HashingBusy)
+def hashing_busy(request, exc):
+    response = api.create_response(request, {"error": exc.message}, status=503)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
 
 
 @api.get("/hello")
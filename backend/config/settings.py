@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 import dj_database_url
@@ -52,6 +53,13 @@ ALLOWED_HOSTS = (
 
 # Application definition
 
+# DJANGO_PROCESS_PROFILE=api runs the JSON API alone: no admin, sessions,
+# messages, static files or CSRF, none of which the API uses (auth is by bearer
+# token, never a cookie). That is fewer apps to import at startup and fewer
+# middleware per request. Migrations and the admin need the full profile.
+PROCESS_PROFILE = os.environ.get("DJANGO_PROCESS_PROFILE", "full").strip().lower()
+API_ONLY = PROCESS_PROFILE == "api"
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -65,6 +73,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
+    "core.idempotency.IdempotencyMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,6 +84,27 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+_CONTEXT_PROCESSORS = [
+    "django.template.context_processors.request",
+    "django.contrib.auth.context_processors.auth",
+    "django.contrib.messages.context_processors.messages",
+]
+
+if API_ONLY:
+    _browser_only = (
+        "django.contrib.admin",
+        "django.contrib.sessions",
+        "django.contrib.messages",
+        "django.contrib.staticfiles",
+    )
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in _browser_only]
+    MIDDLEWARE = [
+        middleware
+        for middleware in MIDDLEWARE
+        if not middleware.startswith(("django.contrib.", "django.middleware.csrf."))
+    ]
+    _CONTEXT_PROCESSORS = ["django.template.context_processors.request"]
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -82,11 +113,7 @@ TEMPLATES = [
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
-            "context_processors": [
-                "django.template.context_processors.request",
-                "django.contrib.auth.context_processors.auth",
-                "django.contrib.messages.context_processors.messages",
-            ],
+            "context_processors": _CONTEXT_PROCESSORS,
         },
     },
 ]
@@ -120,6 +147,11 @@ else:
             conn_health_checks=True,
         )
     }
+    # Take the write lock up front and wait for it, so concurrent requests queue
+    # instead of failing with "database is locked". The test database lives on disk
+    # for the same reason: shared-cache in-memory SQLite cannot wait for locks.
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE", "timeout": 20}
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
 
 
 # Password validation
@@ -163,8 +195,11 @@ AUTH_USER_MODEL = "users.User"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
-# Email (Resend SMTP or any SMTP provider)
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Email (Resend SMTP or any SMTP provider). Mail is queued and sent by the
+# scheduler; point EMAIL_BACKEND at the console or file backend to see it locally.
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_FILE_PATH = os.environ.get("EMAIL_FILE_PATH", str(BASE_DIR / "sent_emails"))
+EMAIL_TIMEOUT = int(os.environ.get("EMAIL_TIMEOUT", "10"))
 EMAIL_HOST = os.environ.get("EMAIL_HOST", "smtp.resend.com")
 EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "587"))
 EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "resend")
@@ -173,3 +208,122 @@ EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = os.environ.get(
     "DEFAULT_FROM_EMAIL", "RingSync <noreply@ringsync.app>"
 )
+
+# Cache: process-local memory unless CACHE_URL names a shared backend
+# (redis://host:6379/0 or memcached://host:11211). Run a shared one with more
+# than one worker, or invalidations won't reach the other processes.
+CACHE_URL = os.environ.get("CACHE_URL", "")
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}
+    }
+elif CACHE_URL.startswith("memcached://"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": CACHE_URL.removeprefix("memcached://"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ringsync",
+            "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))},
+        }
+    }
+# Caches read by both the web and scheduler processes only see each other's
+# invalidations through a shared backend; with local memory they default to a
+# TTL of seconds instead, and membership and ring-state checks skip the cache
+# (see alarms.lookups).
+SHARED_CACHE = bool(CACHE_URL)
+_LOCAL_TTL_DEFAULT = "30"
+_SHARED_TTL_DEFAULT = "3600" if SHARED_CACHE else _LOCAL_TTL_DEFAULT
+READ_CACHE_TTL = int(
+    os.environ.get("READ_CACHE_TTL", "300" if SHARED_CACHE else _LOCAL_TTL_DEFAULT)
+)
+
+# Rate limits: scope -> (requests, window seconds)
+RATE_LIMITS = {
+    "ring_trigger": (1, 10),
+    "login_ip": (int(os.environ.get("LOGIN_RATE_LIMIT_IP", "30")), 300),
+    "login_email": (int(os.environ.get("LOGIN_RATE_LIMIT_EMAIL", "10")), 300),
+    "forgot_password_ip": (int(os.environ.get("FORGOT_PASSWORD_RATE_LIMIT_IP", "10")), 3600),
+    "forgot_password_email": (int(os.environ.get("FORGOT_PASSWORD_RATE_LIMIT_EMAIL", "3")), 900),
+    "user_search": (
+        int(os.environ.get("USER_SEARCH_RATE_LIMIT", "30")),
+        int(os.environ.get("USER_SEARCH_RATE_WINDOW", "10")),
+    ),
+}
+# Only enable behind a proxy that overwrites X-Forwarded-For.
+RATE_LIMIT_TRUST_FORWARDED_FOR = _env_bool("RATE_LIMIT_TRUST_FORWARDED_FOR", False)
+
+# User search
+USER_SEARCH_CACHE_TTL = int(os.environ.get("USER_SEARCH_CACHE_TTL", "30"))
+
+# Friend graph
+FRIEND_GRAPH_CACHE_TTL = int(os.environ.get("FRIEND_GRAPH_CACHE_TTL", _SHARED_TTL_DEFAULT))
+
+# Group push fan-out
+GROUP_FANOUT_CACHE_TTL = int(os.environ.get("GROUP_FANOUT_CACHE_TTL", _SHARED_TTL_DEFAULT))
+PUSH_COALESCE_WINDOW_SECONDS = float(os.environ.get("PUSH_COALESCE_WINDOW_SECONDS", "3"))
+PUSH_MAX_CONSECUTIVE_FAILURES = int(os.environ.get("PUSH_MAX_CONSECUTIVE_FAILURES", "5"))
+PUSH_DEVICE_PURGE_DAYS = int(os.environ.get("PUSH_DEVICE_PURGE_DAYS", "30"))
+
+# Scheduler
+SERVER_RING_MODE = _env_bool("SERVER_RING_MODE", False)
+
+# Data retention: table -> days to keep (0 keeps rows forever). Alarm events are
+# rolled up into daily per-alarm counts before they are deleted.
+RETENTION_DAYS = {
+    "alarm_events": int(os.environ.get("RETENTION_EVENT_DAYS", "90")),
+    "manual_rings": int(os.environ.get("RETENTION_RING_DAYS", "30")),
+    "auth_tokens": int(os.environ.get("RETENTION_TOKEN_IDLE_DAYS", "180")),
+    "password_reset_codes": int(os.environ.get("RETENTION_RESET_CODE_DAYS", "1")),
+    "outbound_emails": int(os.environ.get("RETENTION_EMAIL_DAYS", "7")),
+}
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "500"))
+RETENTION_MAX_SECONDS = float(os.environ.get("RETENTION_MAX_SECONDS", "30"))
+
+# Logins
+# Password hashing pool: worker threads (roughly the cores logins may use) and
+# how many hashes may be running or waiting before logins get a 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "32"))
+# How stale AuthToken.last_used_at may get before a request refreshes it.
+TOKEN_TOUCH_INTERVAL_SECONDS = int(os.environ.get("TOKEN_TOUCH_INTERVAL_SECONDS", "3600"))
+
+# Idempotency keys
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_PATH_PREFIXES = ("/api/alarms/",)
+
+# Responses from fast_response at least this large are gzip/brotli compressed.
+RESPONSE_COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+# Observability
+TESTING = sys.argv[1:2] == ["test"]
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "200"))
+# Requests are logged at DEBUG; slower ones and 5xx responses as warnings.
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "core.jsonlog.JsonFormatter"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "json"},
+        "null": {"class": "logging.NullHandler"},
+    },
+    "loggers": {
+        # Tests check log records with assertLogs; printing them too only buries the results.
+        app: {
+            "handlers": ["null" if TESTING else "console"],
+            "level": os.environ.get("LOG_LEVEL", "INFO"),
+            "propagate": not TESTING,
+        }
+        for app in ("alarms", "core", "users")
+    },
+}
@@ -14,11 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path
+from core.views import metrics_view
 from .api import api
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', api.urls),
+    path('metrics', metrics_view),
 ]
+
+if not settings.API_ONLY:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -0,0 +1,136 @@
+"""
+Read-through caching with versioned keys.
+
+Cached values live under a *scope* such as ``group:<id>`` and a *part* naming
+what is stored (``members``, ``alarms``, ...). Every scope has a version kept in
+the cache, and keys embed it, so ``invalidate(scope)`` drops everything in a
+scope at once by bumping the version; the old entries just expire. Versions
+start from the clock rather than 1, so an evicted version never brings old
+entries back.
+
+``read_through`` lets only one caller per key run the loader. Others wait
+briefly for that caller to fill the key instead of all going to the database
+at once, which is what happens to a group's keys when its alarms go off
+together. ``None`` results are cached like any other value.
+
+This uses the ``default`` cache: process-local memory unless ``CACHE_URL``
+names a shared backend. With local memory, invalidation only reaches the
+process that made the write and other workers serve their copy until
+``READ_CACHE_TTL``; configure a shared backend when running more than one.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+LOCK_SECONDS = 5
+WAIT_SECONDS = 0.02
+WAIT_ATTEMPTS = 25
+
+stampede_waits_total = metrics.counter(
+    "ringsync_cache_stampede_waits_total",
+    "Cache misses that waited for another caller to load the key.",
+    ["cache"],
+)
+
+
+def _version_key(scope):
+    return f"v:{scope}"
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def versions(scopes):
+    """Return ``{scope: version}``, creating versions that don't exist yet."""
+    keys = {_version_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(key, _new_version(), timeout=None)
+            found[key] = cache.get(key, _new_version())
+    return {scope: found[key] for key, scope in keys.items()}
+
+
+def _key(scope, version, part):
+    return f"{scope}:{version}:{part}"
+
+
+def _bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _new_version(), timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Drop every cached value in ``scopes``. The versions are bumped now and again
+    after the current transaction commits, so a read that loaded the old rows
+    while the write was in flight can't leave them cached.
+    """
+    scopes = set(scopes)
+    if scopes:
+        _bump(scopes)
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def read_through(scope, part, load, timeout=None):
+    """Return the cached ``part`` of ``scope``, calling ``load()`` on a miss."""
+    timeout = settings.READ_CACHE_TTL if timeout is None else timeout
+    key = _key(scope, versions([scope])[scope], part)
+    entry = cache.get(key)
+    metrics.record_cache(part, entry is not None)
+    if entry is not None:
+        return entry[0]
+
+    lock = f"{key}:lock"
+    locked = cache.add(lock, 1, timeout=LOCK_SECONDS)
+    if not locked:
+        stampede_waits_total.inc(cache=part)
+        for _ in range(WAIT_ATTEMPTS):
+            time.sleep(WAIT_SECONDS)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        # The loader is slow or died; load without the lock rather than fail.
+
+    try:
+        value = load()
+        cache.set(key, (value,), timeout=timeout)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+def read_many(scopes, part, load, timeout=None):
+    """
+    Batch form of ``read_through`` for one part of many scopes. ``scopes`` maps
+    ids to scopes; ``load(missing_ids)`` returns ``{id: value}``. Ids the loader
+    leaves out are cached as ``None``. There is no stampede lock here.
+    """
+    timeout = settings.READ_CACHE_TTL if timeout is None else timeout
+    scope_versions = versions(scopes.values())
+    keys = {_key(scope, scope_versions[scope], part): ident for ident, scope in scopes.items()}
+    found = cache.get_many(keys)
+    result = {keys[key]: entry[0] for key, entry in found.items()}
+    for ident in scopes:
+        metrics.record_cache(part, ident in result)
+
+    missing = [ident for ident in scopes if ident not in result]
+    if missing:
+        loaded = load(missing)
+        result.update({ident: loaded.get(ident) for ident in missing})
+        missing = set(missing)
+        cache.set_many(
+            {key: (result[ident],) for key, ident in keys.items() if ident in missing},
+            timeout=timeout,
+        )
+    return result
@@ -0,0 +1,77 @@
+"""
+Conditional GET for list endpoints.
+
+A list view first computes a cheap stamp for the rows it would return, usually
+``collection_stamp`` (one ``COUNT``/``MAX(updated_at)`` aggregate), and hands it
+to ``conditional_response`` together with a callable that does the real work.
+A client whose ``If-None-Match`` still matches gets a 304 without the list
+query or any rendering; everyone else gets the rendered response with
+``ETag``, ``Last-Modified`` and ``Cache-Control: private, no-cache``.
+
+``Last-Modified`` is informational only: a newest-timestamp can't see deleted
+rows, so only ``If-None-Match`` ever produces a 304.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags
+
+from . import metrics, renderers
+
+conditional_requests_total = metrics.counter(
+    "ringsync_conditional_requests_total",
+    "List requests by conditional GET outcome.",
+    ["result"],
+)
+
+
+def collection_stamp(queryset, field="updated_at"):
+    """Return ``(row count, newest field value)`` for ``queryset`` in one query."""
+    stamp = queryset.aggregate(count=Count("pk"), latest=Max(field))
+    return stamp["count"], stamp["latest"]
+
+
+def make_etag(request, *parts):
+    # The format is part of the tag so a switch to MessagePack isn't answered with a 304.
+    media_type = renderers.MSGPACK if renderers.wants_msgpack(request) else renderers.JSON
+    digest = hashlib.blake2b(
+        "|".join(map(str, (media_type, *parts))).encode(), digest_size=12
+    ).hexdigest()
+    # Weak, since the same rows may be sent compressed or not.
+    return f'W/"{digest}"'
+
+
+def _matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.removeprefix("W/") == bare for tag in parse_etags(header))
+
+
+def _add_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_response(request, render, *parts, last_modified=None):
+    """
+    Return a 304 if the client's ETag for ``parts`` is current, otherwise
+    ``render()`` with validators attached.
+    """
+    etag = make_etag(request, *parts)
+    if _matches(request, etag):
+        conditional_requests_total.inc(result="not_modified")
+        return _add_validators(HttpResponseNotModified(), etag, last_modified)
+
+    result = "modified" if "If-None-Match" in request.headers else "unconditional"
+    conditional_requests_total.inc(result=result)
+    return _add_validators(render(), etag, last_modified)
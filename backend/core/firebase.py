@@ -0,0 +1,53 @@
+"""
+Lazy access to the Firebase Admin SDK.
+
+``firebase_admin`` and its messaging module pull in the Google API client,
+gRPC and friends, which is most of a process's import time. Nothing needs them
+until the first push, so they are imported and the app initialized then rather
+than at startup; ``migrate``, management commands and web workers that never
+push don't pay for them.
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "ringsync-firebase-adminsdk.json"
+)
+
+_lock = threading.Lock()
+_messaging = None
+
+
+def _initialize():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if firebase_admin._apps:
+        return
+    if os.path.exists(CREDENTIALS_FILE):
+        cred = credentials.Certificate(CREDENTIALS_FILE)
+    elif os.environ.get("FIREBASE_CREDENTIALS"):
+        cred = credentials.Certificate(json.loads(os.environ["FIREBASE_CREDENTIALS"]))
+    else:
+        logger.warning("Firebase credentials not found. Push notifications will fail.")
+        return
+    firebase_admin.initialize_app(cred)
+    logger.info("Firebase Admin SDK initialized.")
+
+
+def messaging():
+    """Return ``firebase_admin.messaging``, initializing the SDK on first use."""
+    global _messaging
+    if _messaging is None:
+        with _lock:
+            if _messaging is None:
+                _initialize()
+                from firebase_admin import messaging as module
+
+                _messaging = module
+    return _messaging
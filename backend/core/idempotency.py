@@ -0,0 +1,148 @@
+"""
+``Idempotency-Key`` support for mutating API requests.
+
+The first request with a given key claims a row in ``IdempotencyKey`` and runs
+normally; its response is stored on the row. A retry with the same key, caller
+and body gets the stored response back without the view running again, so no
+rows are written and no pushes are sent twice. Keys are scoped to the
+``Authorization`` header, method and path, and expire after
+``IDEMPOTENCY_KEY_TTL_HOURS``; the scheduler's maintenance pass purges them.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from . import metrics
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# A claimed key whose request never finished (crashed worker) can be retried after this.
+IN_FLIGHT_TIMEOUT = timedelta(seconds=60)
+
+PURGE_BATCH_SIZE = 1000
+
+requests_total = metrics.counter(
+    "ringsync_idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome.",
+    ["result"],
+)
+
+
+def _digest(*parts):
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _storable(response):
+    # Server errors and rate limits are transient; let the retry run for real.
+    return not response.streaming and response.status_code < 500 and response.status_code != 429
+
+
+def _replay(record):
+    response = HttpResponse(
+        bytes(record.body), status=record.status_code, content_type=record.content_type
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+class IdempotencyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.headers.get(HEADER)
+        if (
+            not key
+            or request.method in SAFE_METHODS
+            or not request.path.startswith(settings.IDEMPOTENCY_PATH_PREFIXES)
+        ):
+            return self.get_response(request)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({"error": f"{HEADER} is too long."}, status=400)
+
+        scope = _digest(
+            request.headers.get("Authorization", ""), request.method, request.path, key
+        )
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        record, early = self.claim(scope, fingerprint)
+        if early is not None:
+            return early
+
+        response = self.get_response(request)
+        if _storable(response):
+            record.status_code = response.status_code
+            record.content_type = response.get("Content-Type", "")
+            record.body = response.content
+            record.save(update_fields=["status_code", "content_type", "body"])
+        else:
+            record.delete()
+        return response
+
+    def claim(self, scope, fingerprint):
+        """Return ``(record, None)`` to run the request, or ``(None, response)`` to answer early."""
+        for _ in range(2):
+            record = IdempotencyKey.objects.filter(key=scope).first()
+            if record is None:
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(key=scope, fingerprint=fingerprint)
+                except IntegrityError:
+                    continue  # a concurrent retry claimed it first
+                requests_total.inc(result="new")
+                return record, None
+
+            now = timezone.now()
+            expired = record.created_at < now - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            abandoned = record.status_code is None and record.created_at < now - IN_FLIGHT_TIMEOUT
+            if expired or abandoned:
+                IdempotencyKey.objects.filter(key=scope, created_at=record.created_at).delete()
+                continue
+
+            if record.fingerprint != fingerprint:
+                requests_total.inc(result="mismatch")
+                return None, JsonResponse(
+                    {"error": f"{HEADER} was already used with a different request."}, status=422
+                )
+            if record.status_code is None:
+                requests_total.inc(result="in_progress")
+                response = JsonResponse(
+                    {"error": "A request with this Idempotency-Key is still in progress."},
+                    status=409,
+                )
+                response["Retry-After"] = "1"
+                return None, response
+
+            requests_total.inc(result="replayed")
+            return None, _replay(record)
+
+        requests_total.inc(result="in_progress")
+        return None, JsonResponse({"error": "Could not claim Idempotency-Key."}, status=409)
+
+
+def purge_expired_keys(batch_size=PURGE_BATCH_SIZE):
+    """Delete keys older than the TTL in batches; returns the number removed."""
+    cutoff = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+    purged = 0
+    while True:
+        keys = list(expired.values_list("key", flat=True)[:batch_size])
+        if not keys:
+            return purged
+        purged += IdempotencyKey.objects.filter(key__in=keys).delete()[0]
+
+
+def replay_hit_rate():
+    """Share of keyed requests answered from a stored response."""
+    replayed = requests_total.value(result="replayed")
+    total = replayed + requests_total.value(result="new")
+    return replayed / total if total else 0.0
@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+# What a web worker does before it can answer its first request.
+COLD_START = "import config.wsgi, config.urls"
+FIRST_PUSH = "from core.firebase import messaging; messaging()"
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``python -X importtime`` output into ``[(module, self_us, cumulative_us)]``,
+    in import order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header
+        rows.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return rows
+
+
+def summarize(rows, top):
+    """Total import time, the slowest modules by self time and totals per top-level package."""
+    packages = defaultdict(int)
+    for module, self_us, _ in rows:
+        packages[module.split(".")[0]] += self_us
+    return {
+        "modules": len(rows),
+        "import_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "slowest_modules": [
+            {"module": module, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+            for module, self_us, cumulative_us in sorted(rows, key=lambda row: -row[1])[:top]
+        ],
+        "packages": [
+            {"package": package, "ms": us / 1000}
+            for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts a fresh interpreter under -X importtime the way a web worker starts, and "
+        "reports wall time and the slowest imports per settings profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=("full", "api"),
+            help="DJANGO_PROCESS_PROFILE to measure; repeat to compare (default: both).",
+        )
+        parser.add_argument("--top", type=int, default=15, help="Rows per table.")
+        parser.add_argument(
+            "--with-push",
+            action="store_true",
+            help="Also load the push SDK, as the first send does.",
+        )
+        parser.add_argument("--json", action="store_true", help="Emit the report as JSON.")
+
+    def handle(self, *args, **options):
+        code = COLD_START + ("; " + FIRST_PUSH if options["with_push"] else "")
+        report = [
+            self.measure(profile, code, options["top"]) for profile in options["profile"] or ("full", "api")
+        ]
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(self.format_report(report))
+
+    def measure(self, profile, code, top):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"),
+            "DJANGO_PROCESS_PROFILE": profile,
+        }
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        return {"profile": profile, "wall_ms": wall_ms, **summarize(parse_importtime(result.stderr), top)}
+
+    def format_report(self, report):
+        lines = []
+        for entry in report:
+            lines += [
+                f"profile {entry['profile']}: {entry['wall_ms']:.0f} ms wall, "
+                f"{entry['import_ms']:.0f} ms importing {entry['modules']} modules",
+                "",
+                f"{'package':<32} {'ms':>8}",
+            ]
+            lines += [f"{row['package']:<32} {row['ms']:>8.1f}" for row in entry["packages"]]
+            lines += ["", f"{'module':<48} {'self ms':>8} {'cum ms':>8}"]
+            lines += [
+                f"{row['module']:<48} {row['self_ms']:>8.1f} {row['cumulative_ms']:>8.1f}"
+                for row in entry["slowest_modules"]
+            ]
+            lines.append("")
+        return "\n".join(lines).rstrip()
@@ -0,0 +1,272 @@
+"""
+Minimal in-process metrics registry.
+
+Metrics live in the memory of the process that records them and are rendered
+in the Prometheus text exposition format. Each web worker and the scheduler
+expose their own view; the scraper aggregates across instances.
+"""
+
+import abc
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        pairs = list(zip(self.labelnames, key))
+        pairs.extend(extra.items())
+        return pairs
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    @abc.abstractmethod
+    def samples(self):
+        """Yield ``(sample_name, label_pairs, value)`` for every series."""
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def snapshot(self, **labels):
+        """Return ``{"count", "sum", "buckets"}`` for one label set, with cumulative buckets."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return {"count": 0, "sum": 0.0, "buckets": []}
+            counts = list(state["counts"])
+            total, total_sum = state["count"], state["sum"]
+        cumulative, running = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative.append((bound, running))
+        return {"count": total, "sum": total_sum, "buckets": cumulative}
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        snap = self.snapshot(**labels)
+        if not snap["count"]:
+            return None
+        rank = q * snap["count"]
+        lower_bound, lower_count = 0.0, 0
+        for bound, cumulative in snap["buckets"]:
+            if cumulative >= rank:
+                if bound == float("inf"):
+                    return lower_bound
+                span = cumulative - lower_count
+                fraction = (rank - lower_count) / span if span else 0
+                return lower_bound + (bound - lower_bound) * fraction
+            lower_bound, lower_count = bound, cumulative
+        return lower_bound
+
+    def samples(self):
+        with self._lock:
+            keys = sorted(self._values)
+        for key in keys:
+            labels = dict(zip(self.labelnames, key))
+            snap = self.snapshot(**labels)
+            for bound, cumulative in snap["buckets"]:
+                yield (
+                    f"{self.name}_bucket",
+                    self._labels(key, le=_format_value(float(bound))),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", self._labels(key), snap["sum"]
+            yield f"{self.name}_count", self._labels(key), snap["count"]
+
+
+def _register(cls, name, documentation, labelnames=(), **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+def render():
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        token = self.server.token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self.send_error(403)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr="127.0.0.1", token=""):
+    """
+    Serve ``render()`` on a daemon thread, for processes without a web server.
+    Only loopback is bound by default; with ``token`` set, scrapes must send it
+    as a bearer token, like the ``/metrics`` view.
+    """
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.token = token
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def reset():
+    """Clear every recorded value. Intended for tests and benchmarks."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        metric.clear()
+
+
+# ==========================================
+# Shared metric definitions
+# ==========================================
+
+http_request_seconds = histogram(
+    "ringsync_http_request_seconds", "API request latency.", ["route", "method", "status"]
+)
+http_db_queries = histogram(
+    "ringsync_http_db_queries",
+    "Database queries issued per API request.",
+    ["route", "method"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+http_db_seconds = histogram(
+    "ringsync_http_db_seconds", "Database time spent per API request.", ["route", "method"]
+)
+slow_queries_total = counter(
+    "ringsync_slow_queries_total", "Queries slower than SLOW_QUERY_THRESHOLD_MS.", ["route"]
+)
+push_send_seconds = histogram(
+    "ringsync_push_send_seconds", "Time spent in FCM multicast sends.", ["kind"]
+)
+push_messages_total = counter(
+    "ringsync_push_messages_total", "Per-token FCM delivery outcomes.", ["kind", "outcome"]
+)
+cache_requests_total = counter(
+    "ringsync_cache_requests_total", "Cache lookups by cache name and result.", ["cache", "result"]
+)
+
+
+def record_cache(cache_name, hit):
+    cache_requests_total.inc(cache=cache_name, result="hit" if hit else "miss")
+
+
+def cache_hit_rate(cache_name):
+    hits = cache_requests_total.value(cache=cache_name, result="hit")
+    misses = cache_requests_total.value(cache=cache_name, result="miss")
+    total = hits + misses
+    return hits / total if total else None
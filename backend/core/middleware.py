@@ -0,0 +1,88 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _route_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return "/" + match.route
+
+
+class _QueryRecorder:
+    """``execute_wrapper`` hook that counts and times every query for one request."""
+
+    def __init__(self, slow_threshold):
+        self.slow_threshold = slow_threshold
+        self.count = 0
+        self.duration = 0.0
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.slow_threshold:
+                self.slow.append((elapsed, sql))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, query count and database time for every request. The
+    per-request log line is DEBUG, except for server errors and requests slower
+    than ``SLOW_REQUEST_THRESHOLD_MS``, which are logged as warnings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        self.slow_request_threshold = settings.SLOW_REQUEST_THRESHOLD_MS / 1000
+
+    def __call__(self, request):
+        recorder = _QueryRecorder(self.slow_threshold)
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        route = _route_label(request)
+        method = request.method
+        metrics.http_request_seconds.observe(
+            elapsed, route=route, method=method, status=response.status_code
+        )
+        metrics.http_db_queries.observe(recorder.count, route=route, method=method)
+        metrics.http_db_seconds.observe(recorder.duration, route=route, method=method)
+
+        for duration, sql in recorder.slow:
+            metrics.slow_queries_total.inc(route=route)
+            logger.warning(
+                "slow query",
+                extra={"route": route, "duration_ms": round(duration * 1000, 2), "sql": sql},
+            )
+
+        slow = elapsed >= self.slow_request_threshold
+        level = logging.WARNING if slow or response.status_code >= 500 else logging.DEBUG
+        logger.log(
+            level,
+            "slow request" if slow else "request",
+            extra={
+                "route": route,
+                "method": method,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 2),
+                "db_queries": recorder.count,
+                "db_ms": round(recorder.duration * 1000, 2),
+            },
+        )
+        return response
@@ -1,3 +1,12 @@
 from django.db import models
 
-# Create your models here.
+
+class IdempotencyKey(models.Model):
+    """A stored response for one ``Idempotency-Key``; ``status_code`` is null while in flight."""
+
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    body = models.BinaryField(default=b"")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,115 @@
+"""
+Fast response rendering.
+
+``FastRenderer`` is the API's renderer. It encodes with orjson when that is
+installed and with compact stdlib JSON otherwise; either way dates, times and
+UUIDs come out exactly as Ninja's ``JSONRenderer`` writes them.
+
+Hot list endpoints skip the response schema altogether: they build plain rows
+from ``.values()`` and return ``fast_response(request, rows)``. Those routes
+answer ``Accept: application/msgpack`` with MessagePack when msgspec is
+installed, and compress large bodies for clients that accept it (brotli when
+the ``brotli`` package is installed, gzip otherwise).
+"""
+
+import json
+import re
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+_encoder = NinjaJSONEncoder()
+
+fast_responses_total = metrics.counter(
+    "ringsync_fast_responses_total",
+    "Responses rendered by fast_response, by format and content encoding.",
+    ["format", "encoding"],
+)
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """Encode ``data`` as compact JSON bytes."""
+    if orjson is not None:
+        # Dates go through Ninja's encoder so the wire format doesn't depend on orjson.
+        return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(data, cls=NinjaJSONEncoder, separators=(",", ":")).encode()
+
+
+class FastRenderer(BaseRenderer):
+    media_type = JSON
+
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+def _accepts(header, coding):
+    return re.search(rf"\b{coding}\b", header) is not None
+
+
+def wants_msgpack(request):
+    return msgspec is not None and MSGPACK in request.headers.get("Accept", "")
+
+
+def compress(request, response):
+    """Compress ``response`` in place if it is large enough and the client accepts it."""
+    if (
+        len(response.content) < settings.RESPONSE_COMPRESS_MIN_BYTES
+        or response.has_header("Content-Encoding")
+    ):
+        return None
+
+    accepted = request.headers.get("Accept-Encoding", "")
+    if brotli is not None and _accepts(accepted, "br"):
+        body, encoding = brotli.compress(response.content), "br"
+    elif _accepts(accepted, "gzip"):
+        body, encoding = compress_string(response.content), "gzip"
+    else:
+        return None
+
+    if len(body) >= len(response.content):
+        return None
+    response.content = body
+    response["Content-Encoding"] = encoding
+    return encoding
+
+
+def fast_response(request, data, status=200):
+    """Render rows a view built itself, without validating them against a schema."""
+    if wants_msgpack(request):
+        body, content_type = msgspec.msgpack.encode(data, enc_hook=_default), MSGPACK
+    else:
+        body, content_type = dumps(data), JSON
+
+    response = HttpResponse(body, status=status, content_type=content_type)
+    patch_vary_headers(response, ("Accept", "Accept-Encoding"))
+    encoding = compress(request, response)
+    fast_responses_total.inc(format=content_type.split("/")[1], encoding=encoding or "identity")
+    return response
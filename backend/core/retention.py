@@ -0,0 +1,45 @@
+"""
+Batched, time-bounded deletes for the scheduler's maintenance pass.
+
+Each table has a retention period in ``settings.RETENTION_DAYS`` (0 keeps rows
+forever). Jobs delete in batches of ``RETENTION_BATCH_SIZE``, each in its own
+short transaction so no lock is held for long, and stop after
+``RETENTION_MAX_SECONDS``; whatever is left goes on the next pass.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+def cutoff(table):
+    """Rows of ``table`` older than this may go; ``None`` if the table is kept forever."""
+    days = settings.RETENTION_DAYS.get(table)
+    if not days:
+        return None
+    return timezone.now() - timedelta(days=days)
+
+
+def delete_in_batches(queryset, before_delete=None):
+    """
+    Delete the rows of ``queryset`` and return how many went. ``before_delete``
+    is called with each batch's primary keys inside the batch's transaction,
+    e.g. to roll the rows up first.
+    """
+    deadline = time.monotonic() + settings.RETENTION_MAX_SECONDS
+    batch_size = settings.RETENTION_BATCH_SIZE
+    removed = 0
+    while time.monotonic() < deadline:
+        with transaction.atomic():
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            if before_delete is not None:
+                before_delete(pks)
+            removed += queryset.model.objects.filter(pk__in=pks).delete()[1].get(
+                queryset.model._meta.label, 0
+            )
+    return removed
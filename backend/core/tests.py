@@ -1,3 +1,273 @@
-from django.test import TestCase
+import threading
+import uuid
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 
-# Create your tests here.
+from alarms.models import Group
+from django.core.cache import cache
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
+from users.models import AuthToken, User
+
+from . import firebase, idempotency, metrics, ratelimit, renderers
+from .cache import invalidate, read_many, read_through
+from .management.commands.importtime import parse_importtime, summarize
+from .models import IdempotencyKey
+
+
+class RequestMetricsTests(TestCase):
+    def test_requests_are_recorded_per_route(self):
+        metrics.reset()
+        self.client.get("/api/hello")
+
+        snap = metrics.http_request_seconds.snapshot(route="/api/hello", method="GET", status=200)
+        self.assertEqual(snap["count"], 1)
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('ringsync_http_request_seconds_count{route="/api/hello",method="GET",status="200"} 1', body)
+        self.assertIn("ringsync_http_db_queries_bucket", body)
+
+    def test_requests_log_at_debug_unless_slow(self):
+        with self.assertLogs("core.middleware", "DEBUG") as logs:
+            self.client.get("/api/hello")
+        self.assertEqual([record.levelname for record in logs.records], ["DEBUG"])
+
+        with override_settings(SLOW_REQUEST_THRESHOLD_MS=0):
+            with self.assertLogs("core.middleware", "DEBUG") as logs:
+                Client().get("/api/hello")
+        self.assertEqual([record.getMessage() for record in logs.records], ["slow request"])
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+
+    def test_scheduler_metrics_server_binds_loopback_and_checks_the_token(self):
+        server = metrics.start_http_server(0, token="secret")
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address
+        self.assertEqual(host, "127.0.0.1")
+
+        url = f"http://{host}:{port}/metrics"
+        with self.assertRaises(HTTPError) as denied:
+            urlopen(url, timeout=5)
+        self.assertEqual(denied.exception.code, 403)
+        with urlopen(Request(url, headers={"Authorization": "Bearer secret"}), timeout=5) as response:
+            self.assertIn("ringsync_http_request_seconds", response.read().decode())
+
+    def test_metric_subclasses_must_define_samples(self):
+        with self.assertRaises(TypeError):
+            metrics.Metric("test_untyped", "test")
+
+    def test_histogram_quantile_interpolates_within_bucket(self):
+        hist = metrics.Histogram("test_latency", "test", buckets=(1.0, 2.0))
+        for value in (0.5, 1.5, 1.5, 1.5):
+            hist.observe(value)
+        self.assertAlmostEqual(hist.quantile(0.5), 1 + 1 / 3)
+
+
+@override_settings(
+    RATE_LIMITS={"test": (2, 60), "login_ip": (100, 60), "login_email": (2, 300)}
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_per_identity_and_reports_time_to_reset(self):
+        self.assertEqual(ratelimit.hit("test", "a"), 0)
+        self.assertEqual(ratelimit.hit("test", "a"), 0)
+        self.assertEqual(ratelimit.hit("test", "b"), 0)
+        self.assertEqual(ratelimit.hit("test", "a"), 60)
+
+    def test_window_restarts_after_it_expires(self):
+        with mock.patch("core.ratelimit.time.time", return_value=1000.0):
+            ratelimit.hit("test", "a")
+            ratelimit.hit("test", "a")
+        with mock.patch("core.ratelimit.time.time", return_value=1045.0):
+            self.assertEqual(ratelimit.hit("test", "a"), 15)
+        cache.delete("ratelimit:test:a")
+        self.assertEqual(ratelimit.hit("test", "a"), 0)
+
+    def test_limited_route_returns_429_with_retry_after(self):
+        User.objects.create_user(
+            username="sam", email="sam@example.com", password="pw", display_name="Sam"
+        )
+        payload = {"email": "Sam@example.com", "password": "wrong"}
+        for _ in range(2):
+            response = self.client.post("/api/users/login/", payload, content_type="application/json")
+            self.assertEqual(response.status_code, 401)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(
+                "/api/users/login/",
+                {"email": "sam@example.com", "password": "pw"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response["Retry-After"]), range(1, 301))
+        self.assertIn("error", response.json())
+
+
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="sam", email="sam@example.com", password="pw", display_name="Sam"
+        )
+        cls.token = str(AuthToken.objects.create(user=cls.user).id)
+
+    def create_group(self, key, name="Crew", token=None):
+        return self.client.post(
+            "/api/alarms/group/",
+            {"name": name},
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {token or self.token}",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_stored_response_without_running_the_view(self):
+        first = self.create_group("abc")
+        self.assertEqual(first.status_code, 200)
+
+        with self.assertNumQueries(1):
+            retry = self.create_group("abc")
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Group.objects.count(), 1)
+
+        self.assertEqual(self.create_group("def").status_code, 200)
+        self.assertEqual(Group.objects.count(), 2)
+
+    def test_key_is_scoped_to_the_caller_and_bound_to_the_body(self):
+        self.create_group("abc")
+        self.assertEqual(self.create_group("abc", name="Other").status_code, 422)
+
+        other = User.objects.create_user(
+            username="kim", email="kim@example.com", password="pw", display_name="Kim"
+        )
+        other_token = str(AuthToken.objects.create(user=other).id)
+        self.assertNotIn("Idempotent-Replayed", self.create_group("abc", token=other_token))
+        self.assertEqual(Group.objects.count(), 2)
+
+    def test_in_flight_key_is_rejected_and_expired_keys_are_purged(self):
+        self.create_group("abc")
+        IdempotencyKey.objects.update(status_code=None)
+        response = self.create_group("abc")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Retry-After"], "1")
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(idempotency.purge_expired_keys(), 1)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class FastRendererTests(SimpleTestCase):
+    row = {
+        "id": uuid.uuid4(),
+        "time": time(7, 30),
+        "next_trigger_utc": datetime(2026, 1, 5, 7, 30, 0, 123456, tzinfo=dt_timezone.utc),
+        "repeats": "Mon",
+        "is_active": True,
+    }
+
+    def test_output_matches_the_default_renderer(self):
+        expected = JSONRenderer().render(None, [self.row], response_status=200)
+        compact = expected.replace(", ", ",").replace(": ", ":")
+        self.assertEqual(renderers.dumps([self.row]).decode(), compact)
+
+    @override_settings(RESPONSE_COMPRESS_MIN_BYTES=1024)
+    def test_only_large_bodies_are_compressed(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        with mock.patch.object(renderers, "brotli", None):
+            small = renderers.fast_response(request, [self.row])
+            large = renderers.fast_response(request, [self.row] * 50)
+
+        self.assertFalse(small.has_header("Content-Encoding"))
+        self.assertEqual(large["Content-Encoding"], "gzip")
+        self.assertEqual(large["Vary"], "Accept, Accept-Encoding")
+
+    def test_msgpack_needs_msgspec(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT="application/msgpack")
+        with mock.patch.object(renderers, "msgspec", None):
+            response = renderers.fast_response(request, [self.row])
+        self.assertEqual(response["Content-Type"], "application/json")
+
+
+class ReadThroughCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_values_including_none_are_cached_until_invalidated(self):
+        load = mock.Mock(return_value=None)
+
+        self.assertIsNone(read_through("thing:1", "part", load))
+        self.assertIsNone(read_through("thing:1", "part", load))
+        self.assertEqual(load.call_count, 1)
+
+        invalidate("thing:1")
+        read_through("thing:1", "part", load)
+        read_through("thing:2", "part", load)
+        self.assertEqual(load.call_count, 3)
+
+    def test_evicted_version_does_not_revive_old_entries(self):
+        read_through("thing:1", "part", lambda: "old")
+        cache.delete("v:thing:1")
+
+        self.assertEqual(read_through("thing:1", "part", lambda: "new"), "new")
+
+    def test_concurrent_miss_waits_for_the_loader(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_load():
+            started.set()
+            release.wait(2)
+            return "loaded"
+
+        loader = threading.Thread(target=read_through, args=("thing:1", "part", slow_load))
+        loader.start()
+        started.wait(2)
+        threading.Timer(0.1, release.set).start()
+
+        second_load = mock.Mock(return_value="duplicate")
+        self.assertEqual(read_through("thing:1", "part", second_load), "loaded")
+        loader.join()
+        second_load.assert_not_called()
+
+    def test_read_many_loads_only_the_misses(self):
+        read_through("thing:1", "part", lambda: "cached")
+        load = mock.Mock(return_value={2: "loaded"})
+
+        found = read_many({1: "thing:1", 2: "thing:2", 3: "thing:3"}, "part", load)
+
+        self.assertEqual(found, {1: "cached", 2: "loaded", 3: None})
+        load.assert_called_once_with([2, 3])
+
+
+class ColdStartTests(SimpleTestCase):
+    def test_push_sdk_is_initialized_once_on_first_use(self):
+        with mock.patch.object(firebase, "_messaging", None), mock.patch.object(
+            firebase, "_initialize"
+        ) as initialize:
+            first = firebase.messaging()
+            self.assertIs(firebase.messaging(), first)
+        initialize.assert_called_once_with()
+        self.assertTrue(hasattr(first, "send_each_for_multicast"))
+
+    def test_importtime_output_is_summarized_by_package(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       300 |        300 |     django.utils",
+            "import time:       200 |        500 |   django",
+            "import time:      1000 |       1000 | firebase_admin",
+            "unrelated warning",
+        ])
+        rows = parse_importtime(stderr)
+        self.assertEqual(rows[0], ("django.utils", 300, 300))
+
+        summary = summarize(rows, top=1)
+        self.assertEqual(summary["modules"], 3)
+        self.assertEqual(summary["import_ms"], 1.5)
+        self.assertEqual(summary["packages"], [{"package": "firebase_admin", "ms": 1.0}])
+        self.assertEqual(summary["slowest_modules"][0]["module"], "firebase_admin")
@@ -1,8 +1,3 @@
-import random
-import uuid
-
-from django.contrib.auth import authenticate
-from django.core.mail import send_mail
 from django.db import transaction
 from django.db.models import Q
 from ninja import Router
@@ -10,14 +5,21 @@ from ninja.errors import HttpError
 
 from alarms.enums import Actions
 from alarms.utils import send_group_push
-
-from .auth import TokenAuth
-from .models import AuthToken, Friendship, PasswordResetCode, User, UserDevice
+from core import ratelimit
+from core.conditional import collection_stamp, conditional_response
+from core.ratelimit import rate_limit
+from core.renderers import fast_response
+
+from . import graph, hashing, mail, search
+from .profiles import profiles
+from .auth import TokenAuth, issue_token
+from .models import Friendship, PasswordResetCode, User, UserDevice
 from .schemas import (
     DeviceCreate,
     FriendOut,
     FriendRequestCreate,
     FriendRequestOut,
+    FriendSuggestionOut,
     PasswordResetConfirm,
     PasswordResetRequest,
     TokenOut,
@@ -31,6 +33,15 @@ from .schemas import (
 
 router = Router()
 
+FRIEND_FIELDS = tuple(UserSearchOut.model_fields)
+
+LOGIN_LIMITED = "Too many login attempts. Try again later."
+RESET_LIMITED = "Too many reset requests. Try again later."
+
+
+def by_email(request, payload, **kwargs):
+    return payload.email.strip().lower()
+
 
 @router.post("/user/", response=UserOut)
 def create_user(request, payload: UserCreate):
@@ -76,32 +87,25 @@ def update_user(request, payload: UserUpdate):
     return user
 
 
-@router.post("/login/", response=TokenOut)
+@router.post("/login/", response={200: TokenOut, 429: dict})
+@rate_limit("login_ip", key=ratelimit.by_ip, message=LOGIN_LIMITED)
+@rate_limit("login_email", key=by_email, message=LOGIN_LIMITED)
 def login_user(request, payload: UserLogin):
-    user = authenticate(username=payload.email, password=payload.password)
+    user = hashing.authenticate(payload.email, payload.password)
 
     if user is not None:
-        token = str(uuid.uuid4())
-        AuthToken.objects.create(id=token, user=user)
-        return {"token": token}
+        return {"token": str(issue_token(user, payload.device_id or ""))}
     else:
         raise HttpError(401, "Invalid email or password")
 
 
-@router.post("/forgot-password/", response={200: dict})
+@router.post("/forgot-password/", response={200: dict, 429: dict})
+@rate_limit("forgot_password_ip", key=ratelimit.by_ip, message=RESET_LIMITED)
+@rate_limit("forgot_password_email", key=by_email, message=RESET_LIMITED)
 def forgot_password(request, payload: PasswordResetRequest):
-    user = User.objects.filter(email=payload.email).first()
-    if user:
-        PasswordResetCode.objects.filter(user=user, used=False).update(used=True)
-        code = f"{random.randint(0, 999999):06d}"
-        PasswordResetCode.objects.create(user=user, code=code)
-        send_mail(
-            subject="Your RingSync reset code",
-            message=f"Your password reset code is: {code}\n\nThis code expires in 10 minutes.",
-            from_email=None,
-            recipient_list=[user.email],
-            fail_silently=True,
-        )
+    # Only queue the address: the lookup, the code and the send happen in the
+    # scheduler, so the response takes the same time whether or not it is registered.
+    mail.enqueue_password_reset(payload.email)
     return 200, {"message": "If that email is registered, a reset code has been sent."}
 
 
@@ -134,7 +138,14 @@ def reset_password(request, payload: PasswordResetConfirm):
 def register_device(request, payload: DeviceCreate):
     device, created = UserDevice.objects.update_or_create(
         push_token=payload.push_token,
-        defaults={"user": request.auth, "device_type": payload.device_type, "is_active": True},
+        defaults={
+            "user": request.auth,
+            "device_type": payload.device_type,
+            "is_active": True,
+            "consecutive_failures": 0,
+            "last_error": "",
+            "deactivated_at": None,
+        },
     )
 
     return 200, {"message": "Device registered successfully", "device_id": str(device.id), "created": created}
@@ -145,14 +156,10 @@ def register_device(request, payload: DeviceCreate):
 # ==========================================
 
 
-@router.get("/search/", response=list[UserSearchOut], auth=TokenAuth())
-def search_users(request, q: str = ""):
-    if len(q) < 2:
-        return []
-    return list(
-        User.objects.filter(username__icontains=q)
-        .exclude(id=request.auth.id)[:20]
-    )
+@router.get("/search/", response={200: list[UserSearchOut], 429: dict}, auth=TokenAuth())
+@rate_limit("user_search", message="Too many searches. Slow down a little.")
+def search_users(request, q: str = "", boost_friends: bool = True):
+    return 200, search.search_users(request.auth, q, boost_friends=boost_friends)
 
 
 @router.post(
@@ -168,6 +175,9 @@ def send_friend_request(request, payload: FriendRequestCreate):
     if not to_user:
         return 409, {"error": "User not found"}
 
+    if graph.are_friends(request.auth.id, to_user.id):
+        return 409, {"error": "Already friends"}
+
     with transaction.atomic():
         # Check if already friends or request already sent
         existing = Friendship.objects.filter(
@@ -200,15 +210,46 @@ def send_friend_request(request, payload: FriendRequestCreate):
 
 @router.get("/friends/", response=list[FriendOut], auth=TokenAuth())
 def list_friends(request):
-    friendships = Friendship.objects.filter(
-        Q(from_user=request.auth) | Q(to_user=request.auth),
-        status=Friendship.Status.ACCEPTED,
-    ).select_related("from_user", "to_user")
-
-    return [
-        {"friendship_id": f.id, "user": f.get_friend(request.auth)}
-        for f in friendships
-    ]
+    friendships = graph.friendships(request.auth.id)
+    friends = User.objects.filter(id__in=friendships)
+    # The friendship ids cover adds and removals; updated_at covers profile edits.
+    _, latest = collection_stamp(friends)
+
+    def render():
+        found = profiles(friendships)
+        rows = [
+            {"friendship_id": friendship_id, "user": {field: row[field] for field in FRIEND_FIELDS}}
+            for friend_id, friendship_id in friendships.items()
+            if (row := found.get(friend_id))
+        ]
+        return fast_response(request, rows)
+
+    return conditional_response(
+        request, render, request.auth.id, sorted(map(str, friendships.values())), latest,
+        last_modified=latest,
+    )
+
+
+@router.get("/friends/suggestions/", response=list[FriendSuggestionOut], auth=TokenAuth())
+def suggest_friends(request, limit: int = 10):
+    mutuals = graph.friends_of_friends(request.auth.id)
+    if not mutuals:
+        return []
+
+    pending = Friendship.objects.filter(
+        Q(from_user=request.auth, to_user_id__in=mutuals)
+        | Q(to_user=request.auth, from_user_id__in=mutuals),
+        status=Friendship.Status.PENDING,
+    ).values_list("from_user_id", "to_user_id")
+    for pair in pending:
+        for user_id in pair:
+            mutuals.pop(user_id, None)
+
+    top = dict(mutuals.most_common(min(max(limit, 1), 50)))
+    users = User.objects.filter(id__in=top).only("id", "username", "display_name")
+    suggestions = [{"user": user, "mutual_friends": top[user.id]} for user in users]
+    suggestions.sort(key=lambda s: (-s["mutual_friends"], s["user"].username))
+    return suggestions
 
 
 @router.get("/friends/pending/", response=list[FriendRequestOut], auth=TokenAuth())
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from . import graph  # noqa: F401 - registers friend graph invalidation
+        from . import profiles  # noqa: F401 - registers profile cache invalidation
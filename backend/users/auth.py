@@ -1,11 +1,73 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core import metrics
+from core.retention import cutoff
+
 from .models import AuthToken
 from ninja.security import HttpBearer
 
+TOKEN_CREATE_ATTEMPTS = 3
+
+tokens_issued_total = metrics.counter(
+    "ringsync_login_tokens_total", "Tokens handed out at login.", ["outcome"]
+)
+
 
 class TokenAuth(HttpBearer):
     def authenticate(self, request, token):
         try:
-            auth_token = AuthToken.objects.get(id=token)
-            return auth_token.user
+            auth_token = AuthToken.objects.select_related("user").get(id=token)
         except AuthToken.DoesNotExist:
             return None
+
+        # Idle-token retention only needs a coarse timestamp; skip the write on most requests.
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.TOKEN_TOUCH_INTERVAL_SECONDS)
+        if auth_token.last_used_at < stale:
+            AuthToken.objects.filter(id=auth_token.id, last_used_at__lt=stale).update(
+                last_used_at=now
+            )
+        return auth_token.user
+
+
+def issue_token(user, device_id=""):
+    """
+    Return a token id for ``user``. A device that logs in again gets its
+    existing token back while it is within the idle retention period, rather
+    than another row; logins without a device id always get a new token.
+    """
+    if not device_id:
+        tokens_issued_total.inc(outcome="created")
+        return AuthToken.objects.create(user=user).id
+
+    now = timezone.now()
+    tokens = AuthToken.objects.filter(user=user, device_id=device_id)
+    idle_before = cutoff("auth_tokens")
+    reusable = tokens if idle_before is None else tokens.filter(last_used_at__gte=idle_before)
+    token_id = reusable.values_list("id", flat=True).first()
+    if token_id is not None:
+        tokens.filter(id=token_id).update(last_used_at=now)
+        tokens_issued_total.inc(outcome="reused")
+        return token_id
+
+    for attempt in range(TOKEN_CREATE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                tokens.delete()
+                token = AuthToken.objects.create(user=user, device_id=device_id, last_used_at=now)
+        except IntegrityError:
+            if attempt == TOKEN_CREATE_ATTEMPTS - 1:
+                raise
+            # A concurrent login from the same device created it first. If that
+            # token is already gone again too, try the create once more.
+            token_id = tokens.values_list("id", flat=True).first()
+            if token_id is not None:
+                tokens_issued_total.inc(outcome="reused")
+                return token_id
+            continue
+        tokens_issued_total.inc(outcome="created")
+        return token.id
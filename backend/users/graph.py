@@ -0,0 +1,87 @@
+"""
+Cached friend graph.
+
+Each user's accepted friendships are cached as a ``{friend_id: friendship_id}``
+adjacency map, so friendship checks are set lookups and friend lists need one
+query for the user rows. Entries are invalidated for both ends whenever a
+``Friendship`` row is saved or deleted, through ``core.cache`` like every
+other cached read.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import invalidate as invalidate_scopes
+from core.cache import read_many, read_through
+
+from .models import Friendship
+
+
+def _scope(user_id):
+    return f"friend-graph:{user_id}"
+
+
+def _load_many(user_ids):
+    adjacency = {user_id: {} for user_id in user_ids}
+    for friendship_id, from_id, to_id in Friendship.objects.filter(
+        Q(from_user_id__in=user_ids) | Q(to_user_id__in=user_ids),
+        status=Friendship.Status.ACCEPTED,
+    ).values_list("id", "from_user_id", "to_user_id"):
+        if from_id in adjacency:
+            adjacency[from_id][to_id] = friendship_id
+        if to_id in adjacency:
+            adjacency[to_id][from_id] = friendship_id
+    return adjacency
+
+
+def friendships(user_id):
+    """Return the ``{friend_id: friendship_id}`` map for ``user_id``."""
+    return read_through(
+        _scope(user_id),
+        "friend_graph",
+        lambda: _load_many([user_id])[user_id],
+        timeout=settings.FRIEND_GRAPH_CACHE_TTL,
+    )
+
+
+def friendships_many(user_ids):
+    """Batch form of ``friendships``: one cache round trip and at most one query."""
+    return read_many(
+        {user_id: _scope(user_id) for user_id in user_ids},
+        "friend_graph",
+        _load_many,
+        timeout=settings.FRIEND_GRAPH_CACHE_TTL,
+    )
+
+
+def friend_ids(user_id):
+    return set(friendships(user_id))
+
+
+def are_friends(user_id, other_id):
+    return other_id in friendships(user_id)
+
+
+def friends_of_friends(user_id):
+    """Return a ``Counter`` of second-degree user ids weighted by mutual friends."""
+    direct = friendships(user_id)
+    mutuals = Counter()
+    for adjacency in friendships_many(direct).values():
+        mutuals.update(adjacency.keys())
+    for excluded in [user_id, *direct]:
+        mutuals.pop(excluded, None)
+    return mutuals
+
+
+def invalidate(*user_ids):
+    invalidate_scopes(*(_scope(user_id) for user_id in user_ids))
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friend_graph(sender, instance, **kwargs):
+    invalidate(instance.from_user_id, instance.to_user_id)
@@ -0,0 +1,104 @@
+"""
+Password checks on a bounded executor.
+
+PBKDF2 is slow on purpose, and a login storm after an app release would
+otherwise have every request thread hashing at once while alarm requests wait
+for CPU. Hashes run on a process-wide pool of ``PASSWORD_HASH_WORKERS``
+threads (hashlib releases the GIL, so that is also how many cores hashing can
+take), and at most ``PASSWORD_HASH_QUEUE`` may be running or waiting. Past
+that, ``HashingBusy`` turns the login into a 503 with ``Retry-After`` instead
+of queueing it behind the storm.
+
+Only the hashing runs on the pool; database reads and writes stay on the
+request thread.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+from core import metrics
+
+from .models import User
+
+RETRY_AFTER_SECONDS = 5
+
+hash_seconds = metrics.histogram(
+    "ringsync_password_hash_seconds", "Password hashing time, including the wait for a worker."
+)
+busy_total = metrics.counter(
+    "ringsync_password_hash_busy_total", "Logins turned away because the hashing queue was full."
+)
+
+
+class HashingBusy(Exception):
+    retry_after = RETRY_AFTER_SECONDS
+    message = "Too many logins right now. Try again shortly."
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _pool():
+    global _executor, _slots
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_QUEUE)
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+                )
+    return _executor, _slots
+
+
+def run(func, *args):
+    """Run ``func(*args)`` on the hashing pool and wait for it; raise ``HashingBusy`` if full."""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        busy_total.inc()
+        raise HashingBusy()
+    start = time.perf_counter()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result()
+    finally:
+        hash_seconds.observe(time.perf_counter() - start)
+
+
+def _check(password, encoded):
+    """Return ``(matches, needs_rehash)``, like ``check_password`` without the setter."""
+    if not check_password(password, encoded):
+        return False, False
+    hasher = identify_hasher(encoded)
+    preferred = get_hasher("default")
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def authenticate(email, password):
+    """
+    Return the active user with these credentials, or ``None``. A hash made
+    with an outdated algorithm or work factor is replaced on success.
+    """
+    user = User.objects.filter(**{User.USERNAME_FIELD: email}).first()
+    if user is None or not user.is_active:
+        # Hash anyway so the response time doesn't reveal whether the account exists.
+        run(make_password, password)
+        return None
+
+    matches, needs_rehash = run(_check, password, user.password)
+    if not matches:
+        return None
+    if needs_rehash:
+        user.password = run(make_password, password)
+        user.save(update_fields=["password"])
+    return user
@@ -0,0 +1,153 @@
+"""
+Queued outbound email.
+
+Requests only insert an ``OutboundEmail`` row; the scheduler sends due rows
+here in batches over a single connection to ``EMAIL_BACKEND``, on a thread of
+its own so a slow SMTP server never holds up a request or a ring. The handshake
+is paid once per batch rather than per message, and not at all for a batch with
+nothing to send. Failed sends are retried with backoff, then marked failed; every
+outcome is counted in ``ringsync_emails_total``.
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from core import metrics
+
+from .models import OutboundEmail, PasswordResetCode, User
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before each retry; the send after the last one is final.
+RETRY_DELAYS = (10, 60, 300, 900)
+
+# How long a claimed email is hidden from other workers; a crashed batch is retried after it.
+CLAIM_SECONDS = 60
+BATCH_SIZE = 50
+
+RESET_SUBJECT = "Your RingSync reset code"
+RESET_BODY = "Your password reset code is: {code}\n\nThis code expires in 10 minutes."
+
+emails_total = metrics.counter(
+    "ringsync_emails_total", "Outbound email send attempts by outcome.", ["kind", "outcome"]
+)
+delivery_seconds = metrics.histogram(
+    "ringsync_email_delivery_seconds", "Time from queueing an email to handing it to the backend."
+)
+
+
+def enqueue(to, subject, body):
+    return OutboundEmail.objects.create(to=to, subject=subject, body=body)
+
+
+def enqueue_password_reset(email):
+    return OutboundEmail.objects.create(kind=OutboundEmail.Kind.PASSWORD_RESET, to=email)
+
+
+def process_due_emails(now=None):
+    """Send every due email over one backend connection; returns the number attempted."""
+    now = now or timezone.now()
+    due = list(
+        OutboundEmail.objects.filter(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at")[:BATCH_SIZE]
+    )
+    claimed = [
+        email
+        for email in due
+        if OutboundEmail.objects.filter(
+            id=email.id,
+            status=OutboundEmail.Status.PENDING,
+            attempts=email.attempts,
+            next_attempt_at__lte=now,
+        ).update(next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+    ]
+    if not claimed:
+        return 0
+
+    outgoing = []
+    for email in claimed:
+        try:
+            message = _render(email)
+        except Exception as exc:
+            logger.warning("Email render failed", exc_info=True, extra={"email_id": str(email.id)})
+            _retry(email, exc, now)
+            continue
+        if message is None:
+            email.attempts += 1
+            _finish(email, OutboundEmail.Status.SKIPPED)
+        else:
+            outgoing.append((email, message))
+    if not outgoing:
+        # Nothing to hand to the backend, so don't pay for a connection.
+        return len(claimed)
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning("Email backend unavailable", exc_info=True)
+        for email, _ in outgoing:
+            _retry(email, exc, now)
+        return len(claimed)
+
+    try:
+        for email, message in outgoing:
+            _send(email, message, connection, now)
+    finally:
+        connection.close()
+    return len(claimed)
+
+
+def _send(email, message, connection, now):
+    try:
+        message.connection = connection
+        message.send()
+    except Exception as exc:
+        logger.warning("Email send failed", exc_info=True, extra={"email_id": str(email.id)})
+        _retry(email, exc, now)
+        return
+
+    email.attempts += 1
+    sent_at = timezone.now()
+    delivery_seconds.observe((sent_at - email.created_at).total_seconds())
+    _finish(email, OutboundEmail.Status.SENT, sent_at=sent_at)
+
+
+def _render(email):
+    if email.kind == OutboundEmail.Kind.PASSWORD_RESET:
+        user = User.objects.filter(email=email.to).first()
+        if user is None:
+            return None
+        # The code is made here rather than in the request, so its 10 minutes start now.
+        PasswordResetCode.objects.filter(user=user, used=False).update(used=True)
+        code = f"{random.SystemRandom().randint(0, 999999):06d}"
+        PasswordResetCode.objects.create(user=user, code=code)
+        return EmailMessage(RESET_SUBJECT, RESET_BODY.format(code=code), to=[user.email])
+    return EmailMessage(email.subject, email.body, to=[email.to])
+
+
+def _retry(email, exc, now):
+    email.attempts += 1
+    email.last_error = type(exc).__name__[:64]
+    if email.attempts > len(RETRY_DELAYS):
+        _finish(email, OutboundEmail.Status.FAILED)
+        return
+    emails_total.inc(kind=email.kind, outcome="retry")
+    email.next_attempt_at = now + timedelta(seconds=RETRY_DELAYS[email.attempts - 1])
+    email.save(update_fields=["attempts", "next_attempt_at", "last_error"])
+
+
+def _finish(email, status, sent_at=None):
+    email.status = status
+    email.sent_at = sent_at
+    email.save(update_fields=["status", "attempts", "sent_at", "last_error"])
+    emails_total.inc(kind=email.kind, outcome=status.lower())
+    if status == OutboundEmail.Status.FAILED:
+        logger.error(
+            "Email failed",
+            extra={"email_id": str(email.id), "attempts": email.attempts, "error": email.last_error},
+        )
@@ -0,0 +1,53 @@
+"""
+Periodic cleanup for user-owned tables, run from the scheduler's maintenance pass.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.retention import cutoff, delete_in_batches
+
+from .models import AuthToken, OutboundEmail, PasswordResetCode, UserDevice
+
+PURGE_BATCH_SIZE = 500
+
+
+def purge_inactive_devices(batch_size=PURGE_BATCH_SIZE):
+    """Delete devices disabled for longer than ``PUSH_DEVICE_PURGE_DAYS``, in batches."""
+    cutoff = timezone.now() - timedelta(days=settings.PUSH_DEVICE_PURGE_DAYS)
+    stale = UserDevice.objects.filter(is_active=False, deactivated_at__lt=cutoff)
+    purged = 0
+    while True:
+        ids = list(stale.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return purged
+        purged += UserDevice.objects.filter(id__in=ids).delete()[0]
+
+
+def purge_idle_tokens():
+    """Delete auth tokens that haven't been used within the retention period."""
+    before = cutoff("auth_tokens")
+    if before is None:
+        return 0
+    return delete_in_batches(AuthToken.objects.filter(last_used_at__lt=before))
+
+
+def purge_reset_codes():
+    """Delete password reset codes older than the retention period, used or not."""
+    before = cutoff("password_reset_codes")
+    if before is None:
+        return 0
+    return delete_in_batches(PasswordResetCode.objects.filter(created_at__lt=before))
+
+
+def purge_outbound_emails():
+    """Delete sent, skipped and failed emails older than the retention period."""
+    before = cutoff("outbound_emails")
+    if before is None:
+        return 0
+    done = OutboundEmail.objects.filter(created_at__lt=before).exclude(
+        status=OutboundEmail.Status.PENDING
+    )
+    return delete_in_batches(done)
@@ -0,0 +1,21 @@
+# Generated by Django 6.1.2 on 2026-10-19 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_passwordresetcode'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['from_user', 'status'], name='friendship_from_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['to_user', 'status'], name='friendship_to_status_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.1.2 on 2026-10-19 05:56
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalize(value):
+    return unicodedata.normalize("NFKC", value or "").casefold().strip()
+
+
+def backfill_search_columns(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    users = list(User.objects.only("id", "username", "display_name"))
+    for user in users:
+        user.username_search = _normalize(user.username)
+        user.display_name_search = _normalize(user.display_name)
+    User.objects.bulk_update(users, ["username_search", "display_name_search"], batch_size=500)
+
+
+TRIGRAM_INDEXES = [
+    ("users_user_username_trgm", "username_search"),
+    ("users_user_display_name_trgm", "display_name_search"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_user USING gin ("{column}" gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_friendship_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='display_name_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdevice',
+            name='consecutive_failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userdevice',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userdevice',
+            name='last_error',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='userdevice',
+            name='last_failure_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userdevice',
+            name='last_success_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userdevice',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deactivated_at'], name='userdevice_inactive_idx'),
+        ),
+    ]
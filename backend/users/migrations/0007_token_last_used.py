@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authtoken',
+            name='last_used_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='passwordresetcode',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.1.2 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_token_last_used'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authtoken',
+            name='device_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='authtoken',
+            constraint=models.UniqueConstraint(condition=models.Q(('device_id', ''), _negated=True), fields=('user', 'device_id'), name='authtoken_one_per_device'),
+        ),
+    ]
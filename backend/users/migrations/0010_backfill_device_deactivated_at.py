@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def backfill_deactivated_at(apps, schema_editor):
+    # Devices disabled before 0005 have no deactivated_at, so the purge never
+    # matched them. Start their retention period now.
+    UserDevice = apps.get_model("users", "UserDevice")
+    UserDevice.objects.filter(is_active=False, deactivated_at__isnull=True).update(
+        deactivated_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_outbound_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_deactivated_at, migrations.RunPython.noop),
+    ]
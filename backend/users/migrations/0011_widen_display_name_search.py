@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_backfill_device_deactivated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='display_name_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=150),
+        ),
+    ]
@@ -1,24 +1,77 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+import unicodedata
 import uuid
 
 
+def normalize_search_text(value):
+    return unicodedata.normalize("NFKC", value or "").casefold().strip()
+
+
+PROFILE_FIELDS = {"username", "display_name", "timezone", "email"}
+
+# NFKC and casefolding can lengthen text ("ß" -> "ss", "ﬃ" -> "ffi"), so the
+# search columns are wider than display_name and values are cut to fit.
+SEARCH_COLUMN_LENGTH = 150
+
+
 class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(max_length=254, unique=True, blank=False)
     display_name = models.CharField(max_length=50)
     timezone = models.CharField(max_length=50, default="UTC")
 
+    # Normalized copies of username/display_name backing the search indexes.
+    username_search = models.CharField(
+        max_length=SEARCH_COLUMN_LENGTH, default="", editable=False, db_index=True
+    )
+    display_name_search = models.CharField(
+        max_length=SEARCH_COLUMN_LENGTH, default="", editable=False, db_index=True
+    )
+
+    # Bumped when a profile field shown in member and friend lists changes.
+    updated_at = models.DateTimeField(auto_now=True)
+
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "display_name"]
 
+    def save(self, *args, **kwargs):
+        self.username_search = normalize_search_text(self.username)[:SEARCH_COLUMN_LENGTH]
+        self.display_name_search = normalize_search_text(self.display_name)[:SEARCH_COLUMN_LENGTH]
+
+        if kwargs.get("update_fields") is not None:
+            update_fields = set(kwargs["update_fields"])
+            if "username" in update_fields:
+                update_fields.add("username_search")
+            if "display_name" in update_fields:
+                update_fields.add("display_name_search")
+            if update_fields & PROFILE_FIELDS:
+                update_fields.add("updated_at")
+            kwargs["update_fields"] = list(update_fields)
+
+        super().save(*args, **kwargs)
+
 
 class AuthToken(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed at most every TOKEN_TOUCH_INTERVAL_SECONDS; idle tokens are purged by retention.
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Set by clients that send one at login; each device then keeps a single token.
+    device_id = models.CharField(max_length=64, blank=True, default="")
 
     user = models.ForeignKey(to=User, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "device_id"],
+                condition=~models.Q(device_id=""),
+                name="authtoken_one_per_device",
+            ),
+        ]
+
 
 class Friendship(models.Model):
     class Status(models.TextChoices):
@@ -33,6 +86,10 @@ class Friendship(models.Model):
 
     class Meta:
         unique_together = [("from_user", "to_user")]
+        indexes = [
+            models.Index(fields=["from_user", "status"], name="friendship_from_status_idx"),
+            models.Index(fields=["to_user", "status"], name="friendship_to_status_idx"),
+        ]
         constraints = [
             models.CheckConstraint(
                 condition=~models.Q(from_user=models.F("to_user")),
@@ -48,7 +105,7 @@ class PasswordResetCode(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reset_codes")
     code = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     used = models.BooleanField(default=False)
 
     def is_expired(self):
@@ -57,6 +114,46 @@ class PasswordResetCode(models.Model):
         return timezone.now() > self.created_at + timedelta(minutes=10)
 
 
+class OutboundEmail(models.Model):
+    """
+    An email waiting for the scheduler to send it. Password reset emails are
+    queued with just the address; the account lookup and the code happen at
+    send time, so the request does the same work whether the account exists.
+    """
+
+    class Kind(models.TextChoices):
+        MESSAGE = "MESSAGE", "message"
+        PASSWORD_RESET = "PASSWORD_RESET", "password_reset"
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "pending"
+        SENT = "SENT", "sent"
+        FAILED = "FAILED", "failed"
+        SKIPPED = "SKIPPED", "skipped"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.MESSAGE)
+    to = models.EmailField()
+    subject = models.CharField(max_length=255, blank=True, default="")
+    body = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="PENDING"),
+                name="outboundemail_pending_idx",
+            ),
+        ]
+
+
 class UserDevice(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="devices")
@@ -64,3 +161,19 @@ class UserDevice(models.Model):
     device_type = models.CharField(max_length=10, choices=[("ios", "iOS"), ("android", "Android")])
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # Delivery health, maintained by the push helpers in alarms.utils.
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_failure_at = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    last_error = models.CharField(max_length=64, blank=True, default="")
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deactivated_at"],
+                condition=models.Q(is_active=False),
+                name="userdevice_inactive_idx",
+            ),
+        ]
@@ -0,0 +1,39 @@
+"""
+Cached public profiles.
+
+Member and friend lists are assembled from ids the caller already has, so the
+user rows come from here: one ``get_many`` round trip, and one query for
+whatever missed. Entries are invalidated when a user is saved or deleted.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.cache import invalidate, read_many
+
+from .models import User
+from .schemas import UserOut
+
+PROFILE_FIELDS = tuple(UserOut.model_fields)
+
+
+def _scope(user_id):
+    return f"user:{user_id}"
+
+
+def profiles(user_ids):
+    """Return ``{user_id: row}`` with the ``UserOut`` fields of each user."""
+
+    def load(missing):
+        return {
+            row["id"]: row for row in User.objects.filter(id__in=missing).values(*PROFILE_FIELDS)
+        }
+
+    found = read_many({user_id: _scope(user_id) for user_id in user_ids}, "user_profiles", load)
+    return {user_id: row for user_id, row in found.items() if row is not None}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidate(_scope(instance.pk))
@@ -1,5 +1,5 @@
 from ninja import Schema
-from pydantic import field_validator
+from pydantic import Field, field_validator
 import uuid
 import re
 from typing import Optional
@@ -44,6 +44,7 @@ class UserUpdate(Schema):
 class UserLogin(Schema):
     email: str
     password: str
+    device_id: Optional[str] = Field(default=None, max_length=64)
 
 
 class TokenOut(Schema):
@@ -70,6 +71,11 @@ class FriendOut(Schema):
     user: UserSearchOut
 
 
+class FriendSuggestionOut(Schema):
+    user: UserSearchOut
+    mutual_friends: int
+
+
 class FriendRequestOut(Schema):
     id: uuid.UUID
     from_user: UserSearchOut
@@ -0,0 +1,82 @@
+"""
+User search backed by the normalized ``*_search`` columns.
+
+On Postgres those columns carry ``pg_trgm`` GIN indexes, so substring matches
+stay indexed. Other databases fall back to prefix matching via range scans on
+the plain b-tree indexes. Exact matches rank first, then prefixes, then
+substrings; friends and friends-of-friends are boosted within each tier.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from core import metrics
+
+from . import graph
+from .models import User, normalize_search_text
+
+MIN_QUERY_LENGTH = 2
+RESULT_LIMIT = 20
+
+# Sorts after every other code point, so ``[q, q + _PREFIX_END)`` is a prefix range.
+_PREFIX_END = "\U0010ffff"
+
+
+def _match_filter(q):
+    if connection.vendor == "postgresql":
+        return Q(username_search__contains=q) | Q(display_name_search__contains=q)
+    upper = q + _PREFIX_END
+    return Q(username_search__gte=q, username_search__lt=upper) | Q(
+        display_name_search__gte=q, display_name_search__lt=upper
+    )
+
+
+def search_users(user, raw_query, boost_friends=True):
+    q = normalize_search_text(raw_query)
+    if len(q) < MIN_QUERY_LENGTH:
+        return []
+
+    cache_key = f"user-search:{user.id}:{int(boost_friends)}:{q}"
+    results = cache.get(cache_key)
+    metrics.record_cache("user_search", results is not None)
+    if results is not None:
+        return results
+
+    match_rank = Case(
+        When(Q(username_search=q) | Q(display_name_search=q), then=Value(0)),
+        When(
+            Q(username_search__startswith=q) | Q(display_name_search__startswith=q),
+            then=Value(1),
+        ),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    qs = (
+        User.objects.filter(_match_filter(q))
+        .exclude(id=user.id)
+        .annotate(match_rank=match_rank)
+    )
+    ordering = ["match_rank"]
+
+    if boost_friends:
+        friend_ids = graph.friend_ids(user.id)
+        second_degree = set(graph.friends_of_friends(user.id))
+        qs = qs.annotate(
+            social_rank=Case(
+                When(id__in=friend_ids, then=Value(0)),
+                When(id__in=second_degree, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+        )
+        ordering.append("social_rank")
+
+    qs = qs.annotate(name_length=Length("username_search")).order_by(
+        *ordering, "name_length", "username_search"
+    )
+    results = list(qs.values("id", "username", "display_name")[:RESULT_LIMIT])
+    cache.set(cache_key, results, timeout=settings.USER_SEARCH_CACHE_TTL)
+    return results
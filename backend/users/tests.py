@@ -1,3 +1,431 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core import mail as outbox
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import IntegrityError
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import graph, hashing, mail, search
+from .auth import issue_token
+from .maintenance import purge_idle_tokens, purge_outbound_emails, purge_reset_codes
+from .models import AuthToken, Friendship, OutboundEmail, PasswordResetCode, User
+
+
+class FriendshipIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(
+            username="alice", email="alice@example.com", password="pw", display_name="Alice"
+        )
+        cls.bob = User.objects.create_user(
+            username="bob", email="bob@example.com", password="pw", display_name="Bob"
+        )
+
+    def test_friend_list_uses_both_direction_indexes(self):
+        plan = Friendship.objects.filter(
+            Q(from_user=self.alice) | Q(to_user=self.alice),
+            status=Friendship.Status.ACCEPTED,
+        ).explain()
+        self.assertIn("friendship_from_status_idx", plan)
+        self.assertIn("friendship_to_status_idx", plan)
+
+    def test_pending_requests_use_to_user_index(self):
+        plan = Friendship.objects.filter(
+            to_user=self.alice, status=Friendship.Status.PENDING
+        ).explain()
+        self.assertIn("friendship_to_status_idx", plan)
+
+
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def make(username, display_name):
+            return User.objects.create_user(
+                username=username,
+                email=f"{username}@example.com",
+                password="pw",
+                display_name=display_name,
+            )
+
+        cls.me = make("searcher", "Searcher")
+        cls.friend = make("samantha", "Sam Friend")
+        cls.stranger = make("sam", "Stranger")
+        cls.other = make("samuel", "Samuel")
+        cls.fof = make("samwise", "Wise")
+        Friendship.objects.create(
+            from_user=cls.me, to_user=cls.friend, status=Friendship.Status.ACCEPTED
+        )
+        Friendship.objects.create(
+            from_user=cls.friend, to_user=cls.fof, status=Friendship.Status.ACCEPTED
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def usernames(self, q, **kwargs):
+        return [row["username"] for row in search.search_users(self.me, q, **kwargs)]
+
+    def test_exact_match_ranks_first_then_social_boost(self):
+        self.assertEqual(self.usernames("Sam"), ["sam", "samantha", "samwise", "samuel"])
+
+    def test_without_boost_prefix_matches_order_by_length(self):
+        self.assertEqual(
+            self.usernames("sam", boost_friends=False), ["sam", "samuel", "samwise", "samantha"]
+        )
+
+    def test_matches_display_name_and_excludes_self(self):
+        self.assertEqual(self.usernames("wise"), ["samwise"])
+        self.assertEqual(self.usernames("searcher"), [])
+
+    def test_normalized_column_follows_partial_saves(self):
+        self.other.display_name = "Zed"
+        self.other.save(update_fields=["display_name"])
+        self.assertEqual(self.usernames("zed"), ["samuel"])
+
+    def test_expanding_display_names_fit_the_search_column(self):
+        limit = User._meta.get_field("display_name_search").max_length
+
+        self.other.display_name = "\ufb03" * 50  # each "ﬃ" ligature normalizes to "ffi"
+        self.other.save(update_fields=["display_name"])
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.display_name_search, "ffi" * 50)
+
+        self.other.display_name = "\ufdfa" * 50  # 18 characters each after NFKC
+        self.other.save(update_fields=["display_name"])
+        self.other.refresh_from_db()
+        self.assertEqual(len(self.other.display_name_search), limit)
+
+
+class FriendGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f"user{i}", email=f"user{i}@example.com", password="pw", display_name=f"U{i}"
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def befriend(self, a, b):
+        return Friendship.objects.create(
+            from_user=a, to_user=b, status=Friendship.Status.ACCEPTED
+        )
+
+    def test_accept_and_remove_invalidate_both_ends(self):
+        a, b = self.users[:2]
+        self.assertFalse(graph.are_friends(a.id, b.id))
+
+        request = Friendship.objects.create(from_user=a, to_user=b)
+        self.assertFalse(graph.are_friends(b.id, a.id))
+
+        request.status = Friendship.Status.ACCEPTED
+        request.save(update_fields=["status"])
+        self.assertTrue(graph.are_friends(a.id, b.id))
+        self.assertTrue(graph.are_friends(b.id, a.id))
+
+        request.delete()
+        self.assertFalse(graph.are_friends(a.id, b.id))
+        self.assertFalse(graph.are_friends(b.id, a.id))
+
+    def test_friendship_check_is_served_from_cache(self):
+        a, b = self.users[:2]
+        self.befriend(a, b)
+        graph.friendships(a.id)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(graph.are_friends(a.id, b.id))
+
+    def test_friends_of_friends_weighted_by_mutuals(self):
+        a, b, c, d = self.users
+        self.befriend(a, b)
+        self.befriend(a, c)
+        self.befriend(b, d)
+        self.befriend(c, d)
+
+        self.assertEqual(graph.friends_of_friends(a.id), {d.id: 2})
+
+    def test_second_degree_lookup_loads_missing_friends_in_one_query(self):
+        a, b, c, d = self.users
+        self.befriend(a, b)
+        self.befriend(a, c)
+        self.befriend(b, d)
+        graph.friendships(a.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(graph.friends_of_friends(a.id), {d.id: 1})
+
+    def test_invalidation_is_repeated_on_commit(self):
+        a, b = self.users[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.befriend(a, b)
+            # A read racing the write caches what it sees before the commit.
+            graph.friendships(a.id)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(graph.are_friends(a.id, b.id))
+
+    def test_friend_list_revalidates_until_something_changes(self):
+        a, b, c, _ = self.users
+        self.befriend(a, b)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {AuthToken.objects.create(user=a).id}"}
+        etag = self.client.get("/api/users/friends/", **auth)["ETag"]
+
+        unchanged = self.client.get("/api/users/friends/", HTTP_IF_NONE_MATCH=etag, **auth)
+        self.assertEqual(unchanged.status_code, 304)
+
+        self.befriend(c, a)
+        added = self.client.get("/api/users/friends/", HTTP_IF_NONE_MATCH=etag, **auth)
+        self.assertEqual(added.status_code, 200)
+        self.assertEqual(len(added.json()), 2)
+
+        b.display_name = "Bee"
+        b.save(update_fields=["display_name"])
+        renamed = self.client.get("/api/users/friends/", HTTP_IF_NONE_MATCH=added["ETag"], **auth)
+        self.assertEqual(renamed.status_code, 200)
+
+
+@override_settings(
+    RETENTION_DAYS={"auth_tokens": 180, "password_reset_codes": 1},
+    TOKEN_TOUCH_INTERVAL_SECONDS=3600,
+)
+class TokenRetentionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+
+    def use(self, token):
+        response = self.client.get("/api/users/friends/", HTTP_AUTHORIZATION=f"Bearer {token.id}")
+        self.assertEqual(response.status_code, 200)
+        token.refresh_from_db()
+        return token.last_used_at
+
+    def test_requests_touch_last_used_at_at_most_once_per_interval(self):
+        token = AuthToken.objects.create(user=self.user)
+        recent = timezone.now() - timedelta(minutes=10)
+        AuthToken.objects.filter(id=token.id).update(last_used_at=recent)
+        self.assertEqual(self.use(token), recent)
+
+        stale = timezone.now() - timedelta(days=3)
+        AuthToken.objects.filter(id=token.id).update(last_used_at=stale)
+        self.assertGreater(self.use(token), recent)
+
+    def test_idle_tokens_and_old_reset_codes_are_purged(self):
+        idle, active = AuthToken.objects.create(user=self.user), AuthToken.objects.create(user=self.user)
+        AuthToken.objects.filter(id=idle.id).update(last_used_at=timezone.now() - timedelta(days=200))
+        old, fresh = (PasswordResetCode.objects.create(user=self.user, code="123456") for _ in range(2))
+        PasswordResetCode.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(purge_idle_tokens(), 1)
+        self.assertEqual(purge_reset_codes(), 1)
+
+        self.assertEqual(list(AuthToken.objects.values_list("id", flat=True)), [active.id])
+        self.assertEqual(list(PasswordResetCode.objects.values_list("id", flat=True)), [fresh.id])
+
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, RETENTION_DAYS={"auth_tokens": 180})
+class LoginTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, password="pw", **extra):
+        return self.client.post(
+            "/api/users/login/",
+            {"email": "owner@example.com", "password": password, **extra},
+            content_type="application/json",
+        )
+
+    def test_same_device_gets_its_token_back(self):
+        first = self.login(device_id="phone")
+        second = self.login(device_id="phone")
+
+        self.assertEqual(first.json()["token"], second.json()["token"])
+        self.assertNotEqual(self.login(device_id="tablet").json()["token"], first.json()["token"])
+        self.assertNotEqual(self.login().json()["token"], self.login().json()["token"])
+        self.assertEqual(AuthToken.objects.count(), 4)
+
+    def test_idle_device_token_is_replaced(self):
+        old = self.login(device_id="phone").json()["token"]
+        AuthToken.objects.update(last_used_at=timezone.now() - timedelta(days=200))
+
+        new = self.login(device_id="phone").json()["token"]
+
+        self.assertNotEqual(new, old)
+        self.assertEqual([str(t) for t in AuthToken.objects.values_list("id", flat=True)], [new])
+
+    def test_device_token_lost_to_a_racing_login_is_created_again(self):
+        create = AuthToken.objects.create
+        calls = []
+
+        def race(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # The racing login's token is gone again before it can be read.
+                raise IntegrityError()
+            return create(**kwargs)
+
+        with mock.patch.object(AuthToken.objects, "create", side_effect=race):
+            token_id = issue_token(self.user, device_id="phone")
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(list(AuthToken.objects.values_list("id", flat=True)), [token_id])
+
+    def test_wrong_password_and_unknown_email_are_rejected(self):
+        self.assertEqual(self.login(password="nope").status_code, 401)
+        response = self.client.post(
+            "/api/users/login/",
+            {"email": "nobody@example.com", "password": "pw"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(AuthToken.objects.exists())
+
+    @override_settings(
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.PBKDF2PasswordHasher", *FAST_HASHERS]
+    )
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(id=self.user.id).update(password=make_password("pw", hasher="md5"))
+
+        self.assertEqual(self.login().status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(self.user.check_password("pw"))
+
+    def test_full_hashing_queue_answers_503(self):
+        hashing._pool()
+        full = threading.BoundedSemaphore(1)
+        full.acquire()
+        with mock.patch.object(hashing, "_slots", full):
+            response = self.login()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], str(hashing.RETRY_AFTER_SECONDS))
+
+
+class CountingBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError()
+
+
+@override_settings(RATE_LIMITS={"forgot_password_ip": (100, 60), "forgot_password_email": (100, 60)})
+class OutboundEmailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="owner", email="owner@example.com", password="pw", display_name="Owner"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def forgot(self, email):
+        response = self.client.post(
+            "/api/users/forgot-password/", {"email": email}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_reset_request_does_the_same_work_for_unknown_addresses(self):
+        with self.assertNumQueries(1):
+            known = self.forgot("owner@example.com")
+        with self.assertNumQueries(1):
+            unknown = self.forgot("nobody@example.com")
+
+        self.assertEqual(known.json(), unknown.json())
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+        self.assertFalse(PasswordResetCode.objects.exists())
+        self.assertEqual(outbox.outbox, [])
+
+    def test_worker_sends_reset_codes_and_skips_unknown_addresses(self):
+        self.forgot("owner@example.com")
+        self.forgot("nobody@example.com")
+
+        self.assertEqual(mail.process_due_emails(), 2)
+
+        code = PasswordResetCode.objects.get(user=self.user)
+        self.assertEqual(len(outbox.outbox), 1)
+        self.assertEqual(outbox.outbox[0].to, ["owner@example.com"])
+        self.assertIn(code.code, outbox.outbox[0].body)
+        self.assertEqual(
+            dict(OutboundEmail.objects.values_list("to", "status")),
+            {"owner@example.com": "SENT", "nobody@example.com": "SKIPPED"},
+        )
+        self.assertEqual(mail.process_due_emails(), 0)
+
+    @override_settings(EMAIL_BACKEND="users.tests.CountingBackend")
+    def test_a_batch_shares_one_connection(self):
+        for i in range(3):
+            mail.enqueue(f"friend{i}@example.com", "Hi", "Hello")
+        CountingBackend.opened = 0
+
+        self.assertEqual(mail.process_due_emails(), 3)
+
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(outbox.outbox), 3)
+
+    @override_settings(EMAIL_BACKEND="users.tests.CountingBackend")
+    def test_batch_with_nothing_to_send_opens_no_connection(self):
+        self.forgot("nobody@example.com")
+        CountingBackend.opened = 0
+
+        self.assertEqual(mail.process_due_emails(), 1)
+
+        self.assertEqual(CountingBackend.opened, 0)
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.Status.SKIPPED)
+
+    @override_settings(EMAIL_BACKEND="users.tests.FailingBackend")
+    def test_failed_sends_are_retried_then_given_up(self):
+        email = mail.enqueue("friend@example.com", "Hi", "Hello")
+        now = timezone.now()
+
+        mail.process_due_emails(now)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.PENDING, 1))
+        self.assertEqual(email.last_error, "ConnectionRefusedError")
+        self.assertEqual(email.next_attempt_at, now + timedelta(seconds=mail.RETRY_DELAYS[0]))
+        self.assertEqual(mail.process_due_emails(now), 0)
+
+        for delay in mail.RETRY_DELAYS:
+            now += timedelta(seconds=delay)
+            mail.process_due_emails(now)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(email.attempts, len(mail.RETRY_DELAYS) + 1)
+
+    @override_settings(RETENTION_DAYS={"outbound_emails": 7})
+    def test_finished_emails_are_purged(self):
+        sent = mail.enqueue("a@example.com", "Hi", "Hello")
+        pending = mail.enqueue("b@example.com", "Hi", "Hello")
+        OutboundEmail.objects.filter(id=sent.id).update(status=OutboundEmail.Status.SENT)
+        OutboundEmail.objects.update(created_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(purge_outbound_emails(), 1)
+        self.assertEqual(list(OutboundEmail.objects.values_list("id", flat=True)), [pending.id])